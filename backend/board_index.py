@@ -0,0 +1,325 @@
+"""
+Integer board indexing.
+
+Every 5-card board has a colex index in 0..2,598,959 (a perfect hash of the
+sorted card indices). Every board also maps to a row of the canonical board
+list, i.e. the concatenation of generate_boards_by_suit_distribution() over
+BOARD_PATTERNS (board_id = canonical row + 1 after a fresh create_boards_table),
+together with the suit permutation that takes the board onto that row.
+"""
+import os
+import numpy as np
+from functools import lru_cache
+from itertools import chain, combinations
+from math import comb, factorial
+
+from hand_index import DECK_CARDS, NUM_CARDS, NUM_SUITS, PERMUTATION_INDEX
+
+# Suit count patterns of the canonical boards, in boards table order (suit_pattern column).
+BOARD_PATTERNS = [[5, 0, 0, 0], [4, 1, 0, 0], [3, 2, 0, 0], [3, 1, 1, 0], [2, 2, 1, 0], [2, 1, 1, 1]]
+
+BOARD_SIZE = 5
+NUM_RANKS = 13
+NUM_BOARDS = comb(NUM_CARDS, BOARD_SIZE)
+
+CACHE_DIR = os.environ.get("POKER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+
+# BINOM[n, k] = C(n, k) for the colex ranking.
+BINOM = np.array([[comb(n, k) for k in range(BOARD_SIZE + 1)] for n in range(NUM_CARDS + 1)], dtype=np.int64)
+SUIT_COMBOS = BINOM[NUM_RANKS]
+
+
+def pattern_multiplicity(pattern):
+    """
+    Number of actual boards represented by each canonical board of a suit pattern,
+    i.e. the number of distinct ways to assign the suit counts to the four suits.
+    """
+    multiplicity = factorial(NUM_SUITS)
+    for count in set(pattern):
+        multiplicity //= factorial(pattern.count(count))
+    return multiplicity
+
+
+PATTERN_SIZES = [
+    int(np.prod([comb(NUM_RANKS, count) for count in pattern])) for pattern in BOARD_PATTERNS
+]
+PATTERN_OFFSETS = np.concatenate(([0], np.cumsum(PATTERN_SIZES))).astype(np.int64)
+PATTERN_MULTIPLICITIES = [pattern_multiplicity(pattern) for pattern in BOARD_PATTERNS]
+NUM_CANONICAL_BOARDS = int(PATTERN_OFFSETS[-1])
+
+# Sorted suit counts encoded in base 6 -> pattern number.
+_PATTERN_CODE = np.full(6 ** NUM_SUITS, -1, dtype=np.int8)
+for _p, _pattern in enumerate(BOARD_PATTERNS):
+    _PATTERN_CODE[sum(c * 6 ** (3 - j) for j, c in enumerate(_pattern))] = _p
+
+# Rank bitmask (13 bits) -> lexicographic index among rank sets of the same size,
+# matching itertools.combinations over one suit's cards in Deck order.
+_LEX_INDEX = np.zeros(1 << NUM_RANKS, dtype=np.int32)
+for _k in range(BOARD_SIZE + 1):
+    for _i, _ranks in enumerate(combinations(range(NUM_RANKS), _k)):
+        _LEX_INDEX[sum(1 << r for r in _ranks)] = _i
+
+# All k-subsets of the 13 ranks in lexicographic order, for unranking.
+_RANK_COMBOS = [np.array(list(combinations(range(NUM_RANKS), _k)), dtype=np.int64).reshape(comb(NUM_RANKS, _k), _k)
+                for _k in range(BOARD_SIZE + 1)]
+
+_RANK_COMBO_TUPLES = [list(combinations(range(NUM_RANKS), _k)) for _k in range(BOARD_SIZE + 1)]
+
+# Suit permutation encoded in base 4 -> index into SUIT_PERMUTATIONS.
+_PERM_CODE = np.full(4 ** NUM_SUITS, -1, dtype=np.int8)
+for _perm, _i in PERMUTATION_INDEX.items():
+    _PERM_CODE[sum(s * 4 ** (3 - j) for j, s in enumerate(_perm))] = _i
+
+
+def colex_index(cards):
+    """
+    Returns the colex index of a board given as card indices (any order).
+    """
+    return int(sum(BINOM[c, i + 1] for i, c in enumerate(sorted(int(c) for c in cards))))
+
+
+def colex_indices(board_cards):
+    """
+    Vectorized colex_index for an (n, 5) array of card indices.
+    """
+    sorted_cards = np.sort(np.asarray(board_cards, dtype=np.int64), axis=1)
+    return BINOM[sorted_cards, np.arange(1, BOARD_SIZE + 1)].sum(axis=1)
+
+
+def _cache_path(name):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def _load_or_build(name, builder):
+    path = _cache_path(name)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+    array = builder()
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+def _build_board_cards():
+    flat = np.fromiter(
+        chain.from_iterable(combinations(range(NUM_CARDS), BOARD_SIZE)),
+        dtype=np.uint8,
+        count=NUM_BOARDS * BOARD_SIZE,
+    )
+    lex_boards = flat.reshape(NUM_BOARDS, BOARD_SIZE)
+    board_cards = np.empty_like(lex_boards)
+    board_cards[colex_indices(lex_boards)] = lex_boards
+    return board_cards
+
+
+@lru_cache(maxsize=None)
+def get_board_cards():
+    """
+    Returns the (2,598,960, 5) uint8 array of card indices, indexed by colex board index.
+    """
+    return _load_or_build("board_cards.npy", _build_board_cards)
+
+
+def _build_board_masks():
+    board_cards = get_board_cards().astype(np.uint64)
+    return np.bitwise_or.reduce(np.uint64(1) << board_cards, axis=1)
+
+
+@lru_cache(maxsize=None)
+def get_board_masks():
+    """
+    Returns the 52-bit card mask of every board, indexed by colex board index.
+    Memory-mapped, so worker processes share it through the page cache.
+    """
+    return _load_or_build("board_masks.npy", _build_board_masks)
+
+
+def canonicalize_boards(board_cards):
+    """
+    Vectorized mapping of boards onto canonical board rows.
+
+    Arguments:
+        board_cards: (n, 5) array of card indices.
+
+    Returns:
+        (rows, perms): canonical row of each board and the index into
+        SUIT_PERMUTATIONS of the suit mapping that takes the board onto it.
+    """
+    board_cards = np.asarray(board_cards, dtype=np.int64)
+    suits = board_cards % NUM_SUITS
+    ranks = board_cards // NUM_SUITS
+
+    in_suit = suits[:, :, None] == np.arange(NUM_SUITS)
+    counts = in_suit.sum(axis=1)
+    # Ranks within a suit are distinct, so summing bits is a bitwise or.
+    rank_masks = (in_suit * (1 << ranks)[:, :, None]).sum(axis=1)
+
+    # Canonical suit order: most frequent first, ties broken by suit index.
+    order = np.argsort((BOARD_SIZE - counts) * NUM_SUITS + np.arange(NUM_SUITS), axis=1, kind="stable")
+    perm = np.argsort(order, axis=1)  # perm[:, s] = canonical suit of original suit s
+
+    sorted_counts = np.take_along_axis(counts, order, axis=1)
+    sorted_masks = np.take_along_axis(rank_masks, order, axis=1)
+
+    pattern = _PATTERN_CODE[(sorted_counts * (6 ** np.arange(3, -1, -1))).sum(axis=1)].astype(np.int64)
+    perm_index = _PERM_CODE[(perm * (4 ** np.arange(3, -1, -1))).sum(axis=1)].astype(np.uint8)
+
+    radices = SUIT_COMBOS[sorted_counts]
+    lex = _LEX_INDEX[sorted_masks]
+    within = lex[:, 0]
+    for j in range(1, NUM_SUITS):
+        within = within * radices[:, j] + lex[:, j]
+
+    return PATTERN_OFFSETS[pattern] + within, perm_index
+
+
+def _build_canonical_rows():
+    rows, _ = canonicalize_boards(get_board_cards())
+    return rows.astype(np.int32)
+
+
+def _build_canonical_perms():
+    _, perms = canonicalize_boards(get_board_cards())
+    return perms
+
+
+@lru_cache(maxsize=None)
+def get_canonical_map():
+    """
+    Returns (rows, perms) arrays indexed by colex board index.
+    rows[b] is the canonical row of board b, perms[b] the index of the suit permutation
+    taking board b onto it.
+    """
+    rows = _load_or_build("canonical_rows.npy", _build_canonical_rows)
+    perms = _load_or_build("canonical_perms.npy", _build_canonical_perms)
+    return rows, perms
+
+
+def board_str(cards):
+    """
+    Returns the board string (e.g. "AsKsQsJhTh") of a sequence of card indices.
+    """
+    return "".join(DECK_CARDS[c] for c in cards)
+
+
+_ITER_CHUNK = 4096
+
+
+class PatternBoards:
+    """
+    Lazy sequence of the canonical boards of one suit pattern, as card index tuples.
+
+    Boards are ordered exactly as generate_boards_by_suit_distribution() lists them
+    (itertools.product over the suits with cards, each suit's ranks as lexicographic
+    combinations), but are unranked from their index on demand, so len(), indexing,
+    slicing and iteration never materialize the whole pattern.
+
+    Arguments:
+        pattern: suit counts such as [3, 1, 1, 0], or an index into BOARD_PATTERNS.
+    """
+
+    def __init__(self, pattern):
+        if isinstance(pattern, (int, np.integer)):
+            self.pattern_index = int(pattern)
+            pattern = BOARD_PATTERNS[self.pattern_index]
+        else:
+            pattern = list(pattern)
+            self.pattern_index = BOARD_PATTERNS.index(pattern) if pattern in BOARD_PATTERNS else None
+        if len(pattern) != NUM_SUITS or sum(pattern) != BOARD_SIZE:
+            raise ValueError(f"Invalid suit pattern {pattern}")
+        self.pattern = pattern
+        self._suits = [(suit, count) for suit, count in enumerate(pattern) if count > 0]
+        self._radices = [comb(NUM_RANKS, count) for _, count in self._suits]
+        self._size = int(np.prod(self._radices))
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def offset(self):
+        """
+        Canonical row (board_id - 1) of the pattern's first board, for patterns in BOARD_PATTERNS.
+        """
+        if self.pattern_index is None:
+            raise ValueError(f"Pattern {self.pattern} is not one of BOARD_PATTERNS")
+        return int(PATTERN_OFFSETS[self.pattern_index])
+
+    def cards(self, indices):
+        """
+        Vectorized unranking.
+
+        Arguments:
+            indices: array of board indices within the pattern.
+
+        Returns:
+            (n, 5) uint8 array of card indices.
+        """
+        remaining = np.asarray(indices, dtype=np.int64).ravel()
+        if remaining.size and (remaining.min() < 0 or remaining.max() >= self._size):
+            raise IndexError("Board index out of range")
+        columns = []
+        for (suit, count), radix in zip(reversed(self._suits), reversed(self._radices)):
+            remaining, digit = np.divmod(remaining, radix)
+            columns.insert(0, _RANK_COMBOS[count][digit] * NUM_SUITS + suit)
+        return np.concatenate(columns, axis=1).astype(np.uint8)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.cards(np.arange(*index.indices(self._size)))
+        index = int(index)
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("Board index out of range")
+        cards = []
+        for (suit, count), radix in zip(reversed(self._suits), reversed(self._radices)):
+            index, digit = divmod(index, radix)
+            cards[:0] = [rank * NUM_SUITS + suit for rank in _RANK_COMBO_TUPLES[count][digit]]
+        return tuple(cards)
+
+    def __iter__(self):
+        for start in range(0, self._size, _ITER_CHUNK):
+            for row in self.cards(np.arange(start, min(start + _ITER_CHUNK, self._size))).tolist():
+                yield tuple(row)
+
+    def board_strs(self, start=0, stop=None, step=1):
+        """
+        Returns the board strings of an index range.
+        """
+        return [board_str(row) for row in self[start:stop:step].tolist()]
+
+
+def unrank_canonical_boards(rows):
+    """
+    Returns the (n, 5) uint8 card indices of canonical board rows (board_id - 1).
+    """
+    rows = np.asarray(rows, dtype=np.int64).ravel()
+    if rows.size and (rows.min() < 0 or rows.max() >= NUM_CANONICAL_BOARDS):
+        raise IndexError("Canonical board row out of range")
+    patterns = canonical_pattern(rows)
+    out = np.empty((len(rows), BOARD_SIZE), dtype=np.uint8)
+    for p in np.unique(patterns):
+        selected = patterns == p
+        out[selected] = PatternBoards(int(p)).cards(rows[selected] - PATTERN_OFFSETS[p])
+    return out
+
+
+def _build_canonical_board_cards():
+    return unrank_canonical_boards(np.arange(NUM_CANONICAL_BOARDS))
+
+
+@lru_cache(maxsize=None)
+def get_canonical_board_cards():
+    """
+    Returns the (331,682, 5) uint8 array of canonical boards in boards table order.
+    """
+    return _load_or_build("canonical_board_cards.npy", _build_canonical_board_cards)
+
+
+def canonical_pattern(rows):
+    """
+    Returns the suit pattern number of canonical board rows.
+    """
+    return np.searchsorted(PATTERN_OFFSETS, rows, side="right") - 1
@@ -0,0 +1,249 @@
+"""
+Board texture bitmap index.
+
+Every canonical board (boards table row, board_id - 1) is classified once by
+texture: pairing, suit distribution, connectedness and high card. Each feature
+is stored as a bit-packed bitmap over the 331,682 canonical boards (41 KiB
+each, saved compressed in CACHE_DIR). Every feature is invariant under suit
+permutations, so a canonical board stands for all of its isomorphic boards.
+
+Filters are combined by AND-ing the packed bitmaps. The selected boards' rank
+positions are then read from the rank table and binned by distinct
+[rank_min, rank_max] pair, so a filtered distribution never needs SQL over
+board_str.
+
+Feature names:
+    unpaired, paired, one_pair, two_pair, trips, full_house, quads
+    monotone, two_tone, three_tone, rainbow (1-4 suits), flush_possible, four_flush
+    connected_3, connected_4, straight (ranks within one 5-rank window, ace low too),
+    straight_possible (= connected_3)
+    high_A ... high_2 (highest rank), has_A ... has_2 (rank on board)
+A leading "!" negates a feature, e.g. index.rows("paired", "has_A", "!monotone").
+"""
+import os
+import time
+import numpy as np
+from functools import lru_cache
+
+from board_index import CACHE_DIR, NUM_CANONICAL_BOARDS, PATTERN_MULTIPLICITIES, canonical_pattern, get_canonical_board_cards
+from deck import RANKS
+from holdem_rank_distribution import bin_position_pairs
+from range_equity import range_weights
+from rank_table import LIVE_HANDS, load_rank_table
+
+TEXTURE_FILE = "board_textures.npz"
+TEXTURE_VERSION = 1
+
+NUM_RANKS = len(RANKS)
+# Rank indices of the ten straight windows, ace-low (A2345) first.
+_STRAIGHT_WINDOWS = np.array([[12, 0, 1, 2, 3]] + [list(range(r, r + 5)) for r in range(NUM_RANKS - 4)])
+
+
+def texture_features(board_cards):
+    """
+    Classifies boards by texture.
+
+    Arguments:
+        board_cards: (n, 5) card indices.
+
+    Returns:
+        Dictionary of feature name -> (n,) boolean array.
+    """
+    board_cards = np.asarray(board_cards, dtype=np.int64)
+    ranks = board_cards // 4
+    rank_counts = (ranks[:, :, None] == np.arange(NUM_RANKS)).sum(axis=1)
+    suit_counts = (board_cards[:, :, None] % 4 == np.arange(4)).sum(axis=1)
+
+    max_rank = rank_counts.max(axis=1)
+    pairs = (rank_counts == 2).sum(axis=1)
+    num_suits = (suit_counts > 0).sum(axis=1)
+    max_suit = suit_counts.max(axis=1)
+    connected = (rank_counts > 0)[:, _STRAIGHT_WINDOWS].sum(axis=2).max(axis=1)
+    high = ranks.max(axis=1)
+
+    features = {
+        "unpaired": max_rank == 1,
+        "paired": max_rank >= 2,
+        "one_pair": (max_rank == 2) & (pairs == 1),
+        "two_pair": pairs == 2,
+        "trips": (max_rank == 3) & (pairs == 0),
+        "full_house": (max_rank == 3) & (pairs == 1),
+        "quads": max_rank == 4,
+        "monotone": num_suits == 1,
+        "two_tone": num_suits == 2,
+        "three_tone": num_suits == 3,
+        "rainbow": num_suits == 4,
+        "flush_possible": max_suit >= 3,
+        "four_flush": max_suit >= 4,
+        "connected_3": connected >= 3,
+        "connected_4": connected >= 4,
+        "straight": connected == 5,
+        "straight_possible": connected >= 3,
+    }
+    for r in reversed(range(NUM_RANKS)):
+        features[f"high_{RANKS[r]}"] = high == r
+    for r in reversed(range(NUM_RANKS)):
+        features[f"has_{RANKS[r]}"] = rank_counts[:, r] > 0
+    return features
+
+
+def texture_filter(*names):
+    """
+    Returns a board_filter function for sample_rank_distribution that keeps boards
+    having all the named features.
+    """
+    def board_filter(board_cards):
+        features = texture_features(board_cards)
+        keep = np.ones(len(board_cards), dtype=bool)
+        for name in names:
+            negate = name.startswith("!")
+            keep &= features[name.lstrip("!")] != negate
+        return keep
+    return board_filter
+
+
+class BoardTextureIndex:
+    """
+    Bit-packed feature bitmaps over the canonical boards.
+
+    Arguments:
+        bitmaps: dict of feature name -> np.packbits bitmap.
+        size: number of boards covered.
+    """
+
+    def __init__(self, bitmaps, size=NUM_CANONICAL_BOARDS):
+        self.bitmaps = bitmaps
+        self.size = size
+        self.weights = np.asarray(PATTERN_MULTIPLICITIES, dtype=np.float64)[canonical_pattern(np.arange(size))]
+
+    @classmethod
+    def build(cls, board_cards=None):
+        board_cards = get_canonical_board_cards() if board_cards is None else board_cards
+        features = texture_features(board_cards)
+        return cls({name: np.packbits(bits) for name, bits in features.items()}, len(board_cards))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, version=TEXTURE_VERSION, size=self.size, **self.bitmaps)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            if int(saved["version"]) != TEXTURE_VERSION:
+                raise ValueError(f"Unsupported texture index version in '{path}'")
+            names = [name for name in saved.files if name not in ("version", "size")]
+            return cls({name: saved[name] for name in names}, int(saved["size"]))
+
+    @property
+    def names(self):
+        return list(self.bitmaps)
+
+    def bitmap(self, *names):
+        """
+        Returns the packed AND of the named feature bitmaps ("!name" negates).
+        """
+        result = np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+        for name in names:
+            feature = name.lstrip("!")
+            if feature not in self.bitmaps:
+                raise ValueError(f"Unknown board texture '{feature}'")
+            result &= ~self.bitmaps[feature] if name.startswith("!") else self.bitmaps[feature]
+        return result
+
+    def rows(self, *names):
+        """
+        Returns the canonical board rows (board_id - 1) having all the named features.
+        """
+        return np.flatnonzero(np.unpackbits(self.bitmap(*names), count=self.size))
+
+    def count(self, *names):
+        """
+        Returns (canonical boards, actual boards) having all the named features.
+        """
+        rows = self.rows(*names)
+        return len(rows), int(self.weights[rows].sum())
+
+    def summary(self):
+        return {name: self.count(name) for name in self.names}
+
+
+@lru_cache(maxsize=None)
+def load_texture_index(path=None):
+    """
+    Returns the board texture index, building and caching it on first use.
+    """
+    path = path or os.path.join(CACHE_DIR, TEXTURE_FILE)
+    if os.path.exists(path):
+        try:
+            return BoardTextureIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+    start_time = time.time()
+    index = BoardTextureIndex.build()
+    index.save(path)
+    print(f"🧱 Built board texture index ({len(index.names)} features) in {time.time() - start_time:.1f}s -> {path}")
+    return index
+
+
+def filtered_rank_distribution(hand_range, *names, index=None, table=None, num_bins=100, chunk_size=8192):
+    """
+    Exact rank distribution of a hand class or range over the boards having all the
+    named textures, from the rank table.
+
+    Arguments:
+        hand_range: hand class ('AQo'), hand ('AhQd') or range accepted by range_weights.
+        names: texture features ("!name" negates). No names means all boards.
+        index: optional BoardTextureIndex.
+        table: optional (rank_table, unique_counts) pair.
+        num_bins: the number of bins in the histogram.
+        chunk_size: boards read from the rank table at a time.
+
+    Returns:
+        Dictionary with the normalized bin frequencies and the number of canonical
+        and actual boards matched.
+    """
+    index = load_texture_index() if index is None else index
+    rank_table, _ = load_rank_table() if table is None else table
+    weights = range_weights(hand_range)
+    hands = np.flatnonzero(weights)
+    if len(hands) == 0:
+        raise ValueError("Empty hand range")
+    rows = index.rows(*names)
+    if len(rows) == 0:
+        raise ValueError(f"No boards match {' & '.join(names)}")
+
+    # Sum the weights of every distinct [rank_min, rank_max] position pair first, so
+    # each pair is spread over the bins only once.
+    pair_weights = np.zeros(LIVE_HANDS * LIVE_HANDS)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        positions = rank_table[chunk[:, None], hands[None, :]].astype(np.int64)
+        live = positions[..., 0] >= 0
+        entry_weights = index.weights[chunk][:, None] * weights[hands][None, :]
+        codes = positions[..., 0][live] * LIVE_HANDS + positions[..., 1][live]
+        pair_weights += np.bincount(codes, weights=entry_weights[live], minlength=len(pair_weights))
+
+    bins = bin_position_pairs(pair_weights.reshape(LIVE_HANDS, LIVE_HANDS), num_bins=num_bins)
+    return {
+        "bins": (bins / bins.sum()).tolist(),
+        "boards": len(rows),
+        "actual_boards": int(index.weights[rows].sum()),
+    }
+
+
+def main():
+
+    index = load_texture_index()
+    for name, (boards, actual) in index.summary().items():
+        print(f"{name:>18}: {boards:>7,} canonical / {actual:>9,} boards")
+
+    # start_time = time.time()
+    # result = filtered_rank_distribution("AQo", "paired")
+    # print(f"AQo on paired boards ({result['actual_boards']:,} boards): {time.time() - start_time:.3f}s")
+    # result = filtered_rank_distribution("AQo", "monotone", "has_A")
+
+
+if __name__ == "__main__":
+    main()
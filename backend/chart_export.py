@@ -0,0 +1,140 @@
+"""
+Compact per-hand chart data for the frontend.
+
+Instead of one chart_data.json with 169 x 100 full-precision floats, every hand
+class gets a small shard file holding its bins quantized to integers that sum
+to the shard's scale, plus a manifest listing the shard files and their content
+hashes. Every file is also written pre-compressed (.gz, and .br when the brotli
+package is installed). The UI loads the manifest first and fetches shards only
+for the hands being viewed.
+
+The compressed variants only help if the web server is told to use them. With
+nginx, enable gzip_static on (and brotli_static on with the ngx_brotli module)
+for the charts location. The server then sends the .gz/.br file with
+Content-Encoding when the browser accepts it. Other servers need the equivalent
+setting. Without it, the plain .json files are served. The development server
+of npm start ignores the variants.
+
+Shard format:
+    {"hand": "AKs", "scale": 1000000, "bins": [int, ...]}  (frequency = bin / scale)
+"""
+import os
+import gzip
+import json
+import hashlib
+import numpy as np
+
+from hand_index import HAND_CLASSES
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are written without it
+    brotli = None
+
+SHARD_FORMAT_VERSION = 1
+DEFAULT_SCALE = 1000000
+MANIFEST_FILE = "manifest.json"
+
+
+def quantize_bins(frequencies, scale=DEFAULT_SCALE):
+    """
+    Quantizes normalized bin frequencies to integers summing exactly to scale
+    (largest remainder rounding). All-zero input stays all zero.
+    """
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    total = frequencies.sum()
+    if total <= 0:
+        return np.zeros(len(frequencies), dtype=np.int64)
+    scaled = frequencies / total * scale
+    quantized = np.floor(scaled).astype(np.int64)
+    shortfall = scale - int(quantized.sum())
+    quantized[np.argsort(quantized - scaled, kind="stable")[:shortfall]] += 1
+    return quantized
+
+
+def _write_variants(path, payload):
+    """
+    Writes payload and its compressed variants. Returns the sizes in bytes.
+    """
+    sizes = {"json": len(payload)}
+    with open(path, "wb") as f:
+        f.write(payload)
+    compressed = gzip.compress(payload, compresslevel=9, mtime=0)
+    with open(f"{path}.gz", "wb") as f:
+        f.write(compressed)
+    sizes["gzip"] = len(compressed)
+    if brotli is not None:
+        compressed = brotli.compress(payload, quality=11)
+        with open(f"{path}.br", "wb") as f:
+            f.write(compressed)
+        sizes["brotli"] = len(compressed)
+    return sizes
+
+
+def export_chart_shards(chart_data, out_dir=os.path.join("chart", "shards"), scale=DEFAULT_SCALE):
+    """
+    Writes one quantized shard per hand class and the manifest.
+
+    Arguments:
+        chart_data: dict mapping hand class to its list of normalized bin frequencies
+            (as produced by create_rank_chart_data or ChartHistograms.chart_data()).
+        out_dir: output directory (e.g. poker-hand-analyzer/public/charts/shards).
+        scale: integer total of each quantized shard.
+
+    Returns:
+        The manifest dictionary.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    hands = [hand for hand in HAND_CLASSES if hand in chart_data]
+    hands += [hand for hand in chart_data if hand not in hands]
+
+    manifest = {"version": SHARD_FORMAT_VERSION, "scale": scale, "bins": None, "hands": {}}
+    total_sizes = {}
+    for hand in hands:
+        bins = quantize_bins(chart_data[hand], scale)
+        manifest["bins"] = manifest["bins"] or len(bins)
+        payload = json.dumps({"hand": hand, "scale": scale, "bins": bins.tolist()}, separators=(",", ":")).encode()
+        file_name = f"{hand}.json"
+        sizes = _write_variants(os.path.join(out_dir, file_name), payload)
+        manifest["hands"][hand] = {"file": file_name, "hash": hashlib.sha1(payload).hexdigest()[:12], "bytes": sizes}
+        for kind, size in sizes.items():
+            total_sizes[kind] = total_sizes.get(kind, 0) + size
+
+    payload = json.dumps(manifest, separators=(",", ":")).encode()
+    _write_variants(os.path.join(out_dir, MANIFEST_FILE), payload)
+    sizes = ", ".join(f"{kind} {size / 1024:.1f} KiB" for kind, size in total_sizes.items())
+    print(f"Saved {len(hands)} chart shards ({sizes}) -> {out_dir}")
+    return manifest
+
+
+def export_chart_shards_from_json(json_path, out_dir=None, scale=DEFAULT_SCALE):
+    """
+    Builds the shards from an existing chart_data.json (next to it in shards/ by default).
+    """
+    with open(json_path) as f:
+        chart_data = json.load(f)
+    out_dir = out_dir or os.path.join(os.path.dirname(os.path.abspath(json_path)), "shards")
+    return export_chart_shards(chart_data, out_dir, scale)
+
+
+def load_chart_shards(out_dir):
+    """
+    Reads the shards back into a chart data dictionary of normalized frequencies.
+    """
+    with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    chart_data = {}
+    for hand, entry in manifest["hands"].items():
+        with open(os.path.join(out_dir, entry["file"])) as f:
+            shard = json.load(f)
+        chart_data[hand] = (np.array(shard["bins"]) / shard["scale"]).tolist()
+    return chart_data
+
+
+def main():
+
+    export_chart_shards_from_json(os.path.join("..", "poker-hand-analyzer", "public", "charts", "chart_data.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Streaming per-hand rank histograms for the 169-class chart data.
+
+Instead of writing every (board, hand) ranking to the evaluations table and
+binning them afterwards, rankings are folded straight into running 100-bin
+histograms as boards are evaluated. Each board is weighted by the number of
+actual boards its canonical board stands for (PATTERN_MULTIPLICITIES).
+Histograms from independent shards are merged by adding their counts.
+"""
+import os
+import json
+import time
+import numpy as np
+
+from board_index import NUM_CANONICAL_BOARDS, PATTERN_MULTIPLICITIES, canonical_pattern, get_canonical_board_cards
+from chart_export import export_chart_shards
+from hand_index import HAND_CLASS, HAND_CLASSES, HAND_INDEX, NUM_CLASSES, NUM_HANDS
+from holdem_rank_distribution import rank_range_mass
+from metrics import get_rss_bytes
+from range_equity import range_weights
+from shared_tables import SharedTables, get_shared
+from value_table import evaluate_boards_values, rank_percentiles
+
+SHARD_VERSION = 1
+
+
+class ChartHistograms:
+    """
+    Running [rank_min, rank_max] histograms for all 1,326 hands.
+
+    Rows are buffered and folded in chunks of flush_rows to keep the per-board
+    overhead low.
+    """
+
+    def __init__(self, num_bins=100, flush_rows=200000):
+        self.num_bins = num_bins
+        self.flush_rows = flush_rows
+        self.counts = np.zeros((NUM_HANDS, num_bins))
+        self.boards = 0
+        self.weighted_boards = 0.0
+        self._pending = []
+        self._pending_rows = 0
+
+    def add(self, hands, rank_min, rank_max, weight=1.0):
+        """
+        Adds one board's rankings.
+
+        Arguments:
+            hands: hand indices of the live hands.
+            rank_min, rank_max: their rank percentiles.
+            weight: number of actual boards this board stands for.
+        """
+        hands = np.asarray(hands, dtype=np.int64)
+        self._pending.append((
+            hands,
+            np.asarray(rank_min, dtype=np.float64),
+            np.asarray(rank_max, dtype=np.float64),
+            np.full(len(hands), float(weight)),
+        ))
+        self._pending_rows += len(hands)
+        self.boards += 1
+        self.weighted_boards += weight
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def add_rankings(self, hand_rankings, hand_index_by_id, weight=1.0):
+        """
+        Adds the output of rank_hands_for_board for one board.
+
+        Arguments:
+            hand_rankings: list of (hand_id, value, rank_min, rank_max, rank_avg, rank_dense).
+            hand_index_by_id: dict mapping hand_id to hand index.
+            weight: number of actual boards this board stands for.
+        """
+        hands = [hand_index_by_id[row[0]] for row in hand_rankings]
+        rank_min = [row[2] for row in hand_rankings]
+        rank_max = [row[3] for row in hand_rankings]
+        self.add(hands, rank_min, rank_max, weight)
+
+    def add_boards(self, rank_min, rank_max, weights):
+        """
+        Adds a batch of boards given as (B, 1326) percentile arrays (NaN for blocked hands).
+        """
+        live = ~np.isnan(rank_min)
+        boards, hands = np.nonzero(live)
+        self._pending.append((hands, rank_min[live], rank_max[live], np.asarray(weights, dtype=np.float64)[boards]))
+        self._pending_rows += len(hands)
+        self.boards += len(weights)
+        self.weighted_boards += float(np.sum(weights))
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def add_board_points(self, percentiles, weights):
+        """
+        Adds a batch of boards given as (B, 1326) point percentiles (NaN for blocked
+        hands). Each point falls into a single bin, as a zero-width range would, so
+        the rows are binned directly without buffering.
+        """
+        live = ~np.isnan(percentiles)
+        boards, hands = np.nonzero(live)
+        bins = np.minimum((percentiles[live] * self.num_bins).astype(np.int64), self.num_bins - 1)
+        self.counts += np.bincount(hands * self.num_bins + bins, weights=np.asarray(weights, dtype=np.float64)[boards],
+                                   minlength=self.counts.size).reshape(self.counts.shape)
+        self.boards += len(weights)
+        self.weighted_boards += float(np.sum(weights))
+
+    def flush(self):
+        """
+        Folds the buffered rows into the histograms.
+        """
+        if not self._pending:
+            return
+        hands, rank_min, rank_max, weights = (np.concatenate(parts) for parts in zip(*self._pending))
+        self._pending = []
+        self._pending_rows = 0
+
+        mass = rank_range_mass(rank_min, rank_max, self.num_bins) * weights[:, None]
+        for b in range(self.num_bins):
+            self.counts[:, b] += np.bincount(hands, weights=mass[:, b], minlength=NUM_HANDS)
+
+    def merge(self, other):
+        """
+        Adds another shard's histograms into this one.
+        """
+        if other.num_bins != self.num_bins:
+            raise ValueError(f"Cannot merge histograms with {other.num_bins} and {self.num_bins} bins")
+        self.flush()
+        other.flush()
+        self.counts += other.counts
+        self.boards += other.boards
+        self.weighted_boards += other.weighted_boards
+        return self
+
+    def class_counts(self):
+        """
+        Returns the (169, num_bins) histograms of the preflop classes in HAND_CLASSES order.
+        """
+        self.flush()
+        counts = np.zeros((NUM_CLASSES, self.num_bins))
+        np.add.at(counts, HAND_CLASS, self.counts)
+        return counts
+
+    def chart_data(self):
+        """
+        Returns the chart data dictionary: hand class -> normalized bin frequencies,
+        in the same format as create_rank_chart_data.
+        """
+        counts = self.class_counts()
+        totals = counts.sum(axis=1, keepdims=True)
+        normalized = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+        return {hand_class: normalized[i].tolist() for i, hand_class in enumerate(HAND_CLASSES)}
+
+    def range_distribution(self, hand_range):
+        """
+        Returns the normalized bin frequencies of a range (notation string, HandRange
+        or anything accepted by range_weights) as one weighted sum of the hand histograms.
+        """
+        self.flush()
+        counts = range_weights(hand_range) @ self.counts
+        total = counts.sum()
+        return counts / total if total > 0 else counts
+
+    def write_chart_data(self, path=os.path.join("chart", "chart_data.json"), shards=True):
+        """
+        Writes chart_data.json and, unless shards is False, the compressed per-hand
+        shards for the frontend to a shards/ directory next to it.
+        """
+        chart_data = self.chart_data()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(chart_data, f, indent=4)
+        print(f"Saved chart data -> {path}")
+        if shards:
+            export_chart_shards(chart_data, os.path.join(os.path.dirname(os.path.abspath(path)), "shards"))
+
+    def save(self, path):
+        """
+        Saves a shard of partial histograms (.npz).
+        """
+        self.flush()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, version=SHARD_VERSION, counts=self.counts, boards=self.boards,
+                 weighted_boards=self.weighted_boards)
+        os.replace(tmp_path, path)
+        print(f"💾 Saved histogram shard ({self.boards:,} boards) -> {path}")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as shard:
+            if int(shard["version"]) != SHARD_VERSION:
+                raise ValueError(f"Unsupported histogram shard version in '{path}'")
+            histograms = cls(num_bins=shard["counts"].shape[1])
+            histograms.counts = shard["counts"].copy()
+            histograms.boards = int(shard["boards"])
+            histograms.weighted_boards = float(shard["weighted_boards"])
+        return histograms
+
+
+def merge_shards(paths, chart_path=None):
+    """
+    Merges histogram shards and optionally writes the combined chart data.
+
+    Returns:
+        The merged ChartHistograms.
+    """
+    merged = None
+    for path in paths:
+        shard = ChartHistograms.load(path)
+        merged = shard if merged is None else merged.merge(shard)
+    if merged is None:
+        raise ValueError("No histogram shards given")
+    print(f"✅ Merged {len(paths)} shards ({merged.boards:,} boards, {merged.weighted_boards:,.0f} weighted)")
+    if chart_path is not None:
+        merged.write_chart_data(chart_path)
+    return merged
+
+
+def hand_index_map(hand_id_map):
+    """
+    Maps the hands table ids of a hand_id_map (hand_str -> hand_id) to hand indices.
+    """
+    return {hand_id: HAND_INDEX[hand_str] for hand_str, hand_id in hand_id_map.items()}
+
+
+def _fold_chunk(bounds):
+    start, stop = bounds
+    values = evaluate_boards_values(get_shared("board_cards")[start:stop])
+    rank_min, rank_max, _, _ = rank_percentiles(values)
+    histograms = ChartHistograms()
+    histograms.add_boards(rank_min, rank_max, get_shared("board_weights")[start:stop])
+    histograms.flush()
+    return histograms.counts, stop - start, get_rss_bytes()
+
+
+def build_chart_histograms(processes=None, shard_index=0, num_shards=1, chunk_size=1024):
+    """
+    Evaluates canonical boards on a process pool and folds them into chart histograms.
+
+    The canonical board cards and per-board weights are placed in shared memory once;
+    workers attach to them zero-copy instead of building their own board and hand
+    dictionaries, and evaluate with the batch evaluator.
+
+    Arguments:
+        processes: worker processes (default: all cores).
+        shard_index, num_shards: evaluate only every num_shards-th chunk, starting at shard_index.
+        chunk_size: canonical boards per task.
+
+    Returns:
+        The ChartHistograms of this shard.
+    """
+    rows = np.arange(NUM_CANONICAL_BOARDS)
+    weights = np.asarray(PATTERN_MULTIPLICITIES, dtype=np.float64)[canonical_pattern(rows)]
+    bounds = [(i, min(i + chunk_size, NUM_CANONICAL_BOARDS)) for i in range(0, NUM_CANONICAL_BOARDS, chunk_size)]
+    bounds = bounds[shard_index::num_shards]
+
+    histograms = ChartHistograms()
+    max_rss = 0
+    start_time = time.time()
+    with SharedTables({"board_cards": get_canonical_board_cards(), "board_weights": weights}) as tables:
+        print(f"🧠 Shared {tables.nbytes / 2**20:.1f} MiB of lookup tables")
+        with tables.pool(processes) as pool:
+            for done, (counts, num_boards, rss) in enumerate(pool.imap_unordered(_fold_chunk, bounds), 1):
+                histograms.counts += counts
+                histograms.boards += num_boards
+                max_rss = max(max_rss, rss or 0)
+                if done % 20 == 0 or done == len(bounds):
+                    print(f"📊 {done:,}/{len(bounds):,} chunks ({time.time() - start_time:.1f}s, "
+                          f"max worker RSS {max_rss / 2**20:.0f} MiB)")
+    histograms.weighted_boards = float(sum(weights[start:stop].sum() for start, stop in bounds))
+    return histograms
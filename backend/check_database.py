@@ -2,8 +2,10 @@ from db import DB, open_db
 import time
 import matplotlib.pyplot as plt
 import numpy as np
+from collections import defaultdict
 
-PATTERN_COUNTS = [4, 12, 12, 12, 4, 12]
+from board_index import BOARD_PATTERNS, PATTERN_MULTIPLICITIES
+from card import SUITS
 
 def check_hand_id_map(db):
     """
@@ -289,6 +291,7 @@ def plot_rank_distribution_multi2(db, hand_strs):
         axes = [axes]  # make iterable if only one subplot
     
     # hand_id_map = db.get_hand_ids()
+    pattern_counts = pattern_weights(db)
 
     for ax, hand_str in zip(axes, hand_strs):
         # Get hand_id
@@ -309,7 +312,7 @@ def plot_rank_distribution_multi2(db, hand_strs):
         for row in rows:
             rmin = row[rank_min_idx]
             rmax = row[rank_max_idx]
-            suit_multiplier = PATTERN_COUNTS[int(row[suit_multiplier_idx])]
+            suit_multiplier = pattern_counts[int(row[suit_multiplier_idx])]
             # print(f"Suit_multiplier {suit_multiplier}")
 
             # Handle zero-width ranges
@@ -349,11 +352,56 @@ def plot_rank_distribution_multi2(db, hand_strs):
     plt.show()
 
 
+def board_suit_shape(board_str):
+    """
+    Returns the suit counts of a board string, largest first (e.g. (3, 1, 1, 0)).
+    """
+    suits = board_str[1::2]
+    return tuple(sorted((suits.count(suit) for suit in SUITS), reverse=True))
+
+
 def check_suit_pattern_counts(db):
-    rows = db.get_evaluations_for_suitedness(hand_str)
-    col_names = [desc[0] for desc in db.cursor.description]
-    suit_multiplier = int(col_names.index("suit_pattern"))
+    """
+    Checks that the boards of every stored suit_pattern have the suit shape
+    BOARD_PATTERNS[suit_pattern], which the pattern weights assume.
 
+    Boards tables filled by holdem_evaluations.recreate_board_table before the
+    pattern numbering was unified store [2, 1, 1, 1] as 4 and [2, 2, 1, 0] as 5.
+
+    Returns:
+        dict mapping each mismatched suit_pattern to the sorted shapes of its boards
+        (empty when the numbering matches).
+    """
+    shapes = defaultdict(set)
+    for board_str, suit_pattern in db.stream_query("SELECT board_str, suit_pattern FROM boards;", name="pattern_shapes"):
+        shapes[suit_pattern].add(board_suit_shape(board_str))
+
+    mismatched = {}
+    for suit_pattern, found in shapes.items():
+        valid = suit_pattern is not None and 0 <= suit_pattern < len(BOARD_PATTERNS)
+        if not valid or found != {tuple(BOARD_PATTERNS[suit_pattern])}:
+            mismatched[suit_pattern] = sorted(found)
+    for suit_pattern, found in mismatched.items():
+        print(f"❌ suit_pattern {suit_pattern} holds boards shaped {found}")
+    if not mismatched:
+        print(f"✅ All {len(shapes)} suit patterns match BOARD_PATTERNS")
+    return mismatched
+
+
+def pattern_weights(db):
+    """
+    Returns the board weight of every suit_pattern (PATTERN_MULTIPLICITIES), after
+    checking that the database numbers its suit patterns like BOARD_PATTERNS.
+
+    Raises:
+        ValueError: if a suit_pattern holds boards of another shape. Weighting those
+            rows would silently skew every distribution; reload the boards table with
+            db_operations.create_boards_table and re-run the evaluations.
+    """
+    mismatched = check_suit_pattern_counts(db)
+    if mismatched:
+        raise ValueError(f"suit_pattern numbering does not match BOARD_PATTERNS: {mismatched}")
+    return PATTERN_MULTIPLICITIES
 
 
 
@@ -364,7 +412,10 @@ def main():
 
     # check_hand_id_map(db)
     # check_board_id_map(db)
+    # check_suit_pattern_counts(db)
     # check_evaluations(db)
+    # from verify_evaluations import verify_evaluations
+    # verify_evaluations(db, sample=1000)
     # check_evaluations_for_hand(db, "AhKd")
     # check_evaluations_for_hand(db, "AhKd")
     # plot_chart_for_hand(db, "7h2c", "rank_min")
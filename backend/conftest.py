@@ -0,0 +1,2 @@
+# postgre_test.py is a manual connection check against a live server, not a test module.
+collect_ignore = ["postgre_test.py"]
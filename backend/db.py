@@ -1,84 +1,95 @@
-import psycopg2
-from psycopg2.extras import execute_values
+try:
+    import psycopg2
+    from psycopg2.extras import execute_values
+except ImportError:  # optional: only the embedded SQLite backend is available without it
+    psycopg2 = None
 import json
 import os
 import io
 import csv
+import re
+from abc import ABC, abstractmethod
+
+from instrumentation import NULL_INSTRUMENTATION
 
 CONFIG_FILE = "config.json"
+# Storage backend and embedded database file, overriding config.json.
+BACKEND_ENV = "POKER_DB_BACKEND"
+DB_PATH_ENV = "POKER_DB_PATH"
+BACKENDS = ("postgres", "sqlite")
 
-class DB:
-    def __init__(self, dbname, user, password, host="localhost", port=5432):
-        try:
-            # Connection management
-            self.conn = psycopg2.connect(
-                dbname = dbname,
-                user = user,
-                password = password,
-                host = host,
-                port = port
-            )
-            self.conn.autocommit = True
-            self.cursor = self.conn.cursor()
-            print("✅ Connected to PostgreSQL")
-        except Exception as e:
-            print("❌ Failed to connect to PostgreSQL:", e)
-            raise
-        return
-    
-    # Methods to implement schema
+EVALUATION_COLUMNS = ('board_id', 'hand_id', 'hand_value', 'rank_min', 'rank_max', 'rank_avg', 'rank_dense')
+VERSIONED_EVALUATION_COLUMNS = EVALUATION_COLUMNS + ('evaluator_version',)
+
+class StorageBackend(ABC):
+    """
+    Storage interface of the evaluation pipeline: schema, bulk loads, id maps and
+    the evaluation queries. The queries below are plain SQL with %s placeholders
+    shared by every backend; the backends implement the dialect-specific abstract
+    methods (schema, bulk loading, streaming, column changes) and expose a DB-API
+    cursor as self.cursor.
+
+    Backends:
+        DB: PostgreSQL server (psycopg2, COPY).
+        embedded_db.SQLiteDB: embedded single-file database, no server needed.
+    """
+    db_key = None
+
+    @abstractmethod
     def init_schema(self):
-        # Schema Initialization
-        self.cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS boards (
-                    board_id SERIAL PRIMARY KEY,
-                    board_str TEXT UNIQUE NOT NULL,
-                    suit_pattern INT
-                    );
-                    """)
+        raise NotImplementedError
 
-        self.cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS hands (
-                    hand_id SERIAL PRIMARY KEY,
-                    hand_str TEXT UNIQUE NOT NULL,
-                    suitedness TEXT NOT NULL        
-                    );
-                    """)
+    @abstractmethod
+    def truncate_table(self, table_name):
+        raise NotImplementedError
 
-        self.cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS evaluations (
-                    board_id INT REFERENCES boards(board_id),
-                    hand_id INT REFERENCES hands(hand_id),
-                    hand_value INT NOT NULL,
-                    rank_min FLOAT,
-                    rank_max FLOAT,
-                    rank_avg FLOAT,
-                    rank_dense FLOAT,
-                    PRIMARY KEY (board_id, hand_id)
-                    );
-                    """)
-        
-        print("🛠️ Created tables")
+    @abstractmethod
+    def drop_table(self, table):
+        raise NotImplementedError
 
-        return
-    
-    def remove_indices_from_evaluations(self):
-        """
-        Function to remove indices from evaluations table.
-        Required to be able to add rows to the table.
-        """
-        self.cursor.execute("ALTER TABLE evaluations DROP CONSTRAINT evaluations_pkey;")
-        self.conn.commit()
-        print("✅ Primary key removed from evaluations table.")
+    @abstractmethod
+    def bulk_insert_hands(self, data):
+        raise NotImplementedError
 
-    def replace_indices_on_evaluations(self):
-        """
-        Function to recreate indices for evaluations table.
-        Required once rows have been added to the table.
-        """
-        self.cursor.execute("ALTER TABLE evaluations ADD PRIMARY KEY (board_id, hand_id);")
-        self.conn.commit()
-        print("✅ Primary key added to evaluations table.")
+    @abstractmethod
+    def bulk_insert_boards(self, data, suit_pattern):
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy_boards(self, data, suit_pattern, first_id=None, chunk_size=100000):
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy_hands(self, data, first_id=None, chunk_size=100000):
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_insert_evaluations(self, data, chunk_size=20000000, instrumentation=None, columns=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _cached_id_arrays(self, table_name, refresh=False):
+        raise NotImplementedError
+
+    @abstractmethod
+    def ensure_evaluator_version_column(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def replace_evaluations(self, board_ids, data, instrumentation=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_evaluation_column(self, column):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_evaluation_column(self, column, data):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream_query(self, query, params=None, itersize=100000, name="stream"):
+        raise NotImplementedError
 
     # Reset tables
     def clear_table(self, table_name):
@@ -88,19 +99,13 @@ class DB:
         self.cursor.execute(f"DELETE FROM {table_name};")
         print(f"🧹 Cleared table: {table_name}")
 
-    def truncate_table(self, table_name):
-        if table_name not in {"boards", "hands", "evaluations"}:
-            raise ValueError("Invalid table name")
-
-        self.cursor.execute(f"TRUNCATE TABLE {table_name} RESTART IDENTITY CASCADE;")
-        print(f"🧹 Truncated table: {table_name}")
-
-    def drop_table(self, table):
+    def delete_evaluations_between(self, first_board_id, last_board_id):
         """
-        Drops table if it exists.
+        Deletes the evaluations of the boards with ids in [first_board_id, last_board_id].
         """
-        self.cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE;")
-        print(f"🗑️ Dropped table: {table}")
+        self.cursor.execute("DELETE FROM evaluations WHERE board_id BETWEEN %s AND %s;",
+                            (first_board_id, last_board_id))
+        print(f"🧹 Deleted evaluations of boards {first_board_id:,}-{last_board_id:,}")
 
     # Methods to populate tables
     def insert_board(self, board_str):
@@ -122,85 +127,16 @@ class DB:
         print("📥 Inserted evaluation data")
 
 
-    def bulk_insert_hands(self, data):
-
-        data_with_suitedness = [(hand, get_suitedness(hand)) for hand in data]
-
-        query = """
-            INSERT INTO hands (hand_str, suitedness)
-            VALUES %s
-            ON CONFLICT (hand_str) DO NOTHING
-            RETURNING hand_id, hand_str;
+    def next_id(self, table_name):
         """
-        
-        # execute_values returns a list of tuples (hand_id, hand_str)
-        # for the rows that were successfully inserted.
-        rows = execute_values(self.cursor, query, data_with_suitedness, fetch=True)
-        
-        # Create the mapping directly from the returned rows
-        hand_id_map = {hand_str: hand_id for hand_id, hand_str in rows}
-        
-        print(f"✅ Inserted {len(hand_id_map)} new hands.")
-        return hand_id_map    
-
-    def bulk_insert_boards(self, data, suit_pattern):
-        # data: list of tuples [(board_str,), ...]
-        # board_pattern: string or None
-        query = """
-            INSERT INTO boards (board_str, suit_pattern)
-            VALUES %s
-            ON CONFLICT (board_str) DO NOTHING
-            RETURNING board_id, board_str;
+        Returns the id the next row appended to boards or hands will get.
         """
-        print(type(data), type(data[0]), data[0])
-        # Add board_pattern (should be suit_pattern) to each tuple in data
-        data_with_pattern = [(board, suit_pattern) for board in data]
-
-        execute_values(self.cursor, query, data_with_pattern)
-    
-        all_board_strs = data
-        # all_board_strs = [item[0] for item in data]
-        self.cursor.execute(
-            "SELECT board_id, board_str FROM boards WHERE board_str = ANY(%s);",
-            (all_board_strs,)
-        )
-    
-        rows = self.cursor.fetchall()
-    
-        board_id_map = {board_str: board_id for board_id, board_str in rows}
-
-        print(f"✅ Inserted {len(board_id_map)} new boards")
-        return board_id_map    
-
-
-    def bulk_insert_evaluations(self, data, chunk_size=20000000):
-        # data: list of tuples [(board_id, hand_id, hand_value, rank_min, rank_max, rank_avg, rank_dense), ...]
-
-        if not data:
-            return
-
-        total = len(data)
-        for i in range(0, total, chunk_size):
-            chunk = data[i:i+chunk_size]
-            processed_data = [
-                ["" if v is None else v for v in row]
-                for row in chunk
-            ]
-            buffer = io.StringIO()
-            writer = csv.writer(buffer, delimiter='\t', lineterminator='\n')
-            writer.writerows(processed_data)
-            buffer.seek(0)
-
-            self.cursor.copy_from(
-                buffer,
-                'evaluations',
-                columns=('board_id', 'hand_id', 'hand_value', 'rank_min', 'rank_max', 'rank_avg', 'rank_dense'),
-                sep='\t'
-            )
-            print(f"✅ COPY inserted {len(chunk)} evaluations (rows {i+1}-{min(i+chunk_size, total)})")
-        return
-
-
+        id_column = {"boards": "board_id", "hands": "hand_id"}.get(table_name)
+        if id_column is None:
+            raise ValueError("Invalid table name")
+        self.cursor.execute(f"SELECT COALESCE(MAX({id_column}), 0) + 1 FROM {table_name};")
+        (next_id,) = self.cursor.fetchone()
+        return next_id
 
     # Query / Utility Methods
     def select_hands(self):
@@ -219,7 +155,18 @@ class DB:
             print(row)
 
 
-    def get_hand_ids(self):    
+    def get_hand_ids(self, use_cache=True, refresh=False):
+        """
+        Returns a dict mapping hand_str to hand_id.
+
+        Arguments:
+            use_cache: read from the local snapshot cache when it matches the table.
+            refresh: re-fetch and rewrite the snapshot.
+        """
+        if use_cache:
+            arrays = self._cached_id_arrays("hands", refresh)
+            return dict(zip(arrays["strs"].astype(str).tolist(), arrays["ids"].tolist()))
+
         # After insertion, fetch all hand_strs to get their IDs
         self.cursor.execute(
             "SELECT hand_id, hand_str FROM hands;",
@@ -234,7 +181,25 @@ class DB:
         return hand_id_map
     
 
-    def get_board_ids(self, suit_pattern=None):    
+    def get_board_ids(self, suit_pattern=None, use_cache=True, refresh=False):
+        """
+        Returns a dict mapping board_str to board_id, optionally for one suit pattern.
+
+        Arguments:
+            suit_pattern: only return boards of this suit pattern.
+            use_cache: read from the local snapshot cache when it matches the table.
+            refresh: re-fetch and rewrite the snapshot.
+        """
+        if use_cache:
+            arrays = self._cached_id_arrays("boards", refresh)
+            strs, ids = arrays["strs"], arrays["ids"]
+            if suit_pattern is not None:
+                selected = arrays["suit_pattern"] == int(suit_pattern)
+                strs, ids = strs[selected], ids[selected]
+            board_id_map = dict(zip(strs.astype(str).tolist(), ids.tolist()))
+            print(f"✅ Returned {len(board_id_map)} boards")
+            return board_id_map
+
         # After insertion, fetch all board_strs to get their IDs
         print(suit_pattern)
         print(str(suit_pattern))
@@ -319,6 +284,69 @@ class DB:
         print(f"✅ Returned {len(rows)} evaluations for suitedness of '{hand_str}'")
         return rows
 
+    def stream_rank_ranges(self, hand_ids):
+        """
+        Streams (hand_id, rank_min, rank_max, suit_pattern) of the given hands on every board.
+        """
+        query = """
+            SELECT e.hand_id, e.rank_min, e.rank_max, b.suit_pattern
+            FROM evaluations e
+            JOIN boards b ON e.board_id = b.board_id
+            WHERE e.hand_id = ANY(%s);
+        """
+        return self.stream_query(query, (list(hand_ids),), name="rank_ranges")
+
+
+    def get_stale_board_ids(self, evaluator_version, expected_rows):
+        """
+        Returns the ids of boards whose evaluations are missing, incomplete, or were
+        produced by a different evaluator version.
+        """
+        query = """
+            SELECT b.board_id
+            FROM boards b
+            LEFT JOIN (
+                SELECT board_id,
+                       COUNT(*) AS num_rows,
+                       MIN(COALESCE(evaluator_version, -1)) AS min_version,
+                       MAX(COALESCE(evaluator_version, -1)) AS max_version
+                FROM evaluations
+                GROUP BY board_id
+            ) e ON e.board_id = b.board_id
+            WHERE e.board_id IS NULL
+               OR e.num_rows <> %s
+               OR e.min_version <> %s
+               OR e.max_version <> %s
+            ORDER BY b.board_id;
+        """
+        params = (expected_rows, evaluator_version, evaluator_version)
+        board_ids = [board_id for (board_id,) in self.stream_query(query, params, name="stale_boards")]
+        print(f"🔎 Found {len(board_ids):,} stale boards")
+        return board_ids
+
+    def get_pattern_averages(self):
+        """
+        Returns (suit_pattern, suitedness, num_rows, avg_rank) rows, ordered by suit
+        pattern and hand class: the average rank_avg of every hand class on the
+        boards of every suit pattern.
+        """
+        query = """
+            SELECT b.suit_pattern, h.suitedness, COUNT(*), AVG(e.rank_avg)
+            FROM evaluations e
+            JOIN boards b ON e.board_id = b.board_id
+            JOIN hands h ON e.hand_id = h.hand_id
+            GROUP BY b.suit_pattern, h.suitedness
+            ORDER BY b.suit_pattern, h.suitedness;
+        """
+        return list(self.stream_query(query, name="pattern_avg"))
+
+    def get_board_ids_missing_column(self, column):
+        """
+        Returns the ids of boards that have evaluation rows with column still NULL.
+        """
+        _check_identifier(column)
+        query = f"SELECT DISTINCT board_id FROM evaluations WHERE {column} IS NULL ORDER BY board_id;"
+        return [board_id for (board_id,) in self.stream_query(query, name="missing_column")]
 
     def get_evaluations_count(self):
         self.cursor.execute("SELECT COUNT(*) FROM evaluations;")
@@ -335,7 +363,347 @@ class DB:
             print("🔌 Connection closed")
 
 
+class DB(StorageBackend):
+    def __init__(self, dbname, user, password, host="localhost", port=5432):
+        if psycopg2 is None:
+            raise ImportError("The PostgreSQL backend needs psycopg2; install it or use the sqlite backend.")
+        try:
+            # Connection management
+            self.conn = psycopg2.connect(
+                dbname = dbname,
+                user = user,
+                password = password,
+                host = host,
+                port = port
+            )
+            self.conn.autocommit = True
+            self.cursor = self.conn.cursor()
+            # Identifies this database in the local id map cache.
+            self.db_key = f"{host}:{port}/{dbname}"
+            print("✅ Connected to PostgreSQL")
+        except Exception as e:
+            print("❌ Failed to connect to PostgreSQL:", e)
+            raise
+        return
+    
+    # Methods to implement schema
+    def init_schema(self):
+        # Schema Initialization
+        self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS boards (
+                    board_id SERIAL PRIMARY KEY,
+                    board_str TEXT UNIQUE NOT NULL,
+                    suit_pattern INT
+                    );
+                    """)
+
+        self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS hands (
+                    hand_id SERIAL PRIMARY KEY,
+                    hand_str TEXT UNIQUE NOT NULL,
+                    suitedness TEXT NOT NULL        
+                    );
+                    """)
+
+        self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS evaluations (
+                    board_id INT REFERENCES boards(board_id),
+                    hand_id INT REFERENCES hands(hand_id),
+                    hand_value INT NOT NULL,
+                    rank_min FLOAT,
+                    rank_max FLOAT,
+                    rank_avg FLOAT,
+                    rank_dense FLOAT,
+                    evaluator_version INT,
+                    PRIMARY KEY (board_id, hand_id)
+                    );
+                    """)
+        
+        print("🛠️ Created tables")
+
+        return
+    
+    def remove_indices_from_evaluations(self):
+        """
+        Function to remove indices from evaluations table.
+        Required to be able to add rows to the table.
+        """
+        self.cursor.execute("ALTER TABLE evaluations DROP CONSTRAINT evaluations_pkey;")
+        self.conn.commit()
+        print("✅ Primary key removed from evaluations table.")
+
+    def replace_indices_on_evaluations(self):
+        """
+        Function to recreate indices for evaluations table.
+        Required once rows have been added to the table.
+        """
+        self.cursor.execute("ALTER TABLE evaluations ADD PRIMARY KEY (board_id, hand_id);")
+        self.conn.commit()
+        print("✅ Primary key added to evaluations table.")
+
+    def truncate_table(self, table_name):
+        if table_name not in {"boards", "hands", "evaluations"}:
+            raise ValueError("Invalid table name")
+
+        self.cursor.execute(f"TRUNCATE TABLE {table_name} RESTART IDENTITY CASCADE;")
+        print(f"🧹 Truncated table: {table_name}")
+
+    def drop_table(self, table):
+        """
+        Drops table if it exists.
+        """
+        self.cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE;")
+        print(f"🗑️ Dropped table: {table}")
+
+    def bulk_insert_hands(self, data):
+
+        data_with_suitedness = [(hand, get_suitedness(hand)) for hand in data]
+
+        query = """
+            INSERT INTO hands (hand_str, suitedness)
+            VALUES %s
+            ON CONFLICT (hand_str) DO NOTHING
+            RETURNING hand_id, hand_str;
+        """
+        
+        # execute_values returns a list of tuples (hand_id, hand_str)
+        # for the rows that were successfully inserted.
+        rows = execute_values(self.cursor, query, data_with_suitedness, fetch=True)
+        
+        # Create the mapping directly from the returned rows
+        hand_id_map = {hand_str: hand_id for hand_id, hand_str in rows}
+        
+        print(f"✅ Inserted {len(hand_id_map)} new hands.")
+        return hand_id_map    
+
+    def bulk_insert_boards(self, data, suit_pattern):
+        # data: list of tuples [(board_str,), ...]
+        # board_pattern: string or None
+        query = """
+            INSERT INTO boards (board_str, suit_pattern)
+            VALUES %s
+            ON CONFLICT (board_str) DO NOTHING
+            RETURNING board_id, board_str;
+        """
+        print(type(data), type(data[0]), data[0])
+        # Add board_pattern (should be suit_pattern) to each tuple in data
+        data_with_pattern = [(board, suit_pattern) for board in data]
+
+        execute_values(self.cursor, query, data_with_pattern)
+    
+        all_board_strs = data
+        # all_board_strs = [item[0] for item in data]
+        self.cursor.execute(
+            "SELECT board_id, board_str FROM boards WHERE board_str = ANY(%s);",
+            (all_board_strs,)
+        )
+    
+        rows = self.cursor.fetchall()
+    
+        board_id_map = {board_str: board_id for board_id, board_str in rows}
+
+        print(f"✅ Inserted {len(board_id_map)} new boards")
+        return board_id_map    
+
+
+    def _copy_with_ids(self, table_name, columns, rows, first_id, chunk_size):
+        """
+        COPYs rows into boards or hands with explicitly assigned consecutive ids,
+        streaming the buffer in chunks, and moves the id sequence past them.
+
+        Returns:
+            Mapping of each row's first value (board_str or hand_str) to its id.
+        """
+        id_map = {}
+        buffer = io.StringIO()
+        next_id = first_id
+
+        def flush():
+            buffer.seek(0)
+            self.cursor.copy_from(buffer, table_name, columns=columns, sep='\t')
+            buffer.seek(0)
+            buffer.truncate()
+
+        pending = 0
+        for row in rows:
+            buffer.write(f"{next_id}\t" + "\t".join(str(v) for v in row) + "\n")
+            id_map[row[0]] = next_id
+            next_id += 1
+            pending += 1
+            if pending == chunk_size:
+                flush()
+                pending = 0
+        if pending:
+            flush()
+
+        if next_id > first_id:
+            self.cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, %s), %s);", (table_name, columns[0], next_id - 1)
+            )
+        return id_map
+
+    def copy_boards(self, data, suit_pattern, first_id=None, chunk_size=100000):
+        """
+        COPY-based alternative to bulk_insert_boards.
+
+        Board ids are assigned in order from first_id (default: after the current
+        largest id), so no ids have to be read back. The boards must not already be
+        in the table.
+
+        Arguments:
+            data: iterable of board strings.
+            suit_pattern: suit pattern number of the boards.
+            first_id: id of the first board.
+            chunk_size: rows per COPY call.
+
+        Returns:
+            dict mapping board_str to board_id.
+        """
+        first_id = self.next_id("boards") if first_id is None else first_id
+        rows = ((board_str, suit_pattern) for board_str in data)
+        board_id_map = self._copy_with_ids("boards", ("board_id", "board_str", "suit_pattern"), rows, first_id, chunk_size)
+        print(f"✅ COPY inserted {len(board_id_map)} boards")
+        return board_id_map
+
+    def copy_hands(self, data, first_id=None, chunk_size=100000):
+        """
+        COPY-based alternative to bulk_insert_hands. Hand ids are assigned in order
+        from first_id (default: after the current largest id).
+
+        Returns:
+            dict mapping hand_str to hand_id.
+        """
+        first_id = self.next_id("hands") if first_id is None else first_id
+        rows = ((hand_str, get_suitedness(hand_str)) for hand_str in data)
+        hand_id_map = self._copy_with_ids("hands", ("hand_id", "hand_str", "suitedness"), rows, first_id, chunk_size)
+        print(f"✅ COPY inserted {len(hand_id_map)} hands")
+        return hand_id_map
+
+    def bulk_insert_evaluations(self, data, chunk_size=20000000, instrumentation=None, columns=None):
+        # data: list of tuples [(board_id, hand_id, hand_value, rank_min, rank_max, rank_avg, rank_dense), ...],
+        #   optionally followed by evaluator_version
+        # instrumentation: optional Instrumentation collecting COPY spans and row/byte counters
+        # columns: target columns (default: inferred from the row length)
+
+        if not data:
+            return
+
+        instr = instrumentation or NULL_INSTRUMENTATION
+        if columns is None:
+            columns = VERSIONED_EVALUATION_COLUMNS if len(data[0]) == len(VERSIONED_EVALUATION_COLUMNS) else EVALUATION_COLUMNS
+
+        total = len(data)
+        for i in range(0, total, chunk_size):
+            chunk = data[i:i+chunk_size]
+            with instr.span("copy_serialize"):
+                processed_data = [
+                    ["" if v is None else v for v in row]
+                    for row in chunk
+                ]
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter='\t', lineterminator='\n')
+                writer.writerows(processed_data)
+                num_bytes = buffer.tell()
+                buffer.seek(0)
+
+            with instr.span("copy"):
+                self.cursor.copy_from(
+                    buffer,
+                    'evaluations',
+                    columns=columns,
+                    sep='\t'
+                )
+            instr.incr("rows_written", len(chunk))
+            instr.incr("bytes_written", num_bytes)
+            print(f"✅ COPY inserted {len(chunk)} evaluations (rows {i+1}-{min(i+chunk_size, total)})")
+        return
+
+    def _cached_id_arrays(self, table_name, refresh=False):
+        # Imported here: id_map_cache depends on board_index, which imports this module.
+        from id_map_cache import get_id_arrays
+
+        arrays, cached = get_id_arrays(self.cursor, self.db_key, table_name, refresh=refresh)
+        source = "local snapshot" if cached else "database (snapshot saved)"
+        print(f"📦 Loaded {len(arrays['ids']):,} {table_name} from {source}")
+        return arrays
+
+    # Incremental maintenance of the evaluations table
+    def ensure_evaluator_version_column(self):
+        """
+        Adds the evaluator_version column to evaluations tables created before it existed.
+        Rows without a version are treated as stale.
+        """
+        self.cursor.execute("ALTER TABLE evaluations ADD COLUMN IF NOT EXISTS evaluator_version INT;")
+
+    def replace_evaluations(self, board_ids, data, instrumentation=None):
+        """
+        Atomically replaces all evaluation rows of the given boards (delete + COPY in
+        one transaction), i.e. an upsert at board granularity.
+        """
+        self.cursor.execute("BEGIN;")
+        try:
+            self.cursor.execute("DELETE FROM evaluations WHERE board_id = ANY(%s);", (list(board_ids),))
+            self.bulk_insert_evaluations(data, instrumentation=instrumentation)
+            self.cursor.execute("COMMIT;")
+        except Exception:
+            self.cursor.execute("ROLLBACK;")
+            raise
+
+    def add_evaluation_column(self, column):
+        """
+        Adds a FLOAT rank column to evaluations if it does not exist yet.
+        """
+        _check_identifier(column)
+        self.cursor.execute(f"ALTER TABLE evaluations ADD COLUMN IF NOT EXISTS {column} FLOAT;")
+        print(f"🛠️ Ensured column evaluations.{column}")
+
+    def update_evaluation_column(self, column, data):
+        """
+        Sets column for (board_id, hand_id, value) rows through a COPY into a temporary
+        table and one UPDATE ... FROM join, in a single transaction.
+        """
+        _check_identifier(column)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter='\t', lineterminator='\n')
+        writer.writerows(data)
+        buffer.seek(0)
+
+        self.cursor.execute("BEGIN;")
+        try:
+            self.cursor.execute(
+                "CREATE TEMP TABLE column_backfill (board_id INT, hand_id INT, value FLOAT) ON COMMIT DROP;"
+            )
+            self.cursor.copy_from(buffer, "column_backfill", columns=("board_id", "hand_id", "value"), sep='\t')
+            self.cursor.execute(f"""
+                UPDATE evaluations e SET {column} = c.value
+                FROM column_backfill c
+                WHERE e.board_id = c.board_id AND e.hand_id = c.hand_id;
+            """)
+            self.cursor.execute("COMMIT;")
+        except Exception:
+            self.cursor.execute("ROLLBACK;")
+            raise
+
+    def stream_query(self, query, params=None, itersize=100000, name="stream"):
+        """
+        Runs a query through a server-side cursor and yields rows without loading
+        the whole result set into memory.
+        """
+        cursor = self.conn.cursor(name=name, withhold=True)
+        cursor.itersize = itersize
+        try:
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
 # Helper functions. (Not in class)
+def _check_identifier(name):
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", name):
+        raise ValueError(f"Invalid column name '{name}'")
+
+
 def get_suitedness(hand_str:str) -> str:
     """
     Helper function to convert a two-card hand string to a simple suitedness classification.
@@ -358,14 +726,38 @@ def get_suitedness(hand_str:str) -> str:
 
     return hand_str_suitedness
 
-def open_db():
+def open_db(config_path=CONFIG_FILE, backend=None):
     """
     Opens database object.
 
+    The backend is taken from the backend argument, the POKER_DB_BACKEND
+    environment variable or the "backend" key of config.json, in that order.
+    Without any of them, PostgreSQL is used when config.json exists and the
+    embedded SQLite database otherwise, so the pipeline runs without a server.
+
+    Arguments:
+        config_path: location of config file.
+        backend: "postgres" or "sqlite".
+
     Returns:
         Database
     """
-    config = load_db_config(CONFIG_FILE)
+    config = load_db_config(config_path) if os.path.exists(config_path) else {}
+    backend = backend or os.environ.get(BACKEND_ENV) or config.get("backend")
+    if backend is None:
+        backend = "postgres" if config else "sqlite"
+        if not config:
+            print(f"ℹ️ No '{config_path}' found, using the embedded SQLite database")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown database backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "sqlite":
+        # Imported here: embedded_db imports this module.
+        from embedded_db import SQLiteDB
+
+        return SQLiteDB(os.environ.get(DB_PATH_ENV) or config.get("path"))
+
+    config = load_db_config(config_path)
     db = DB(
         dbname=config["dbname"],
         user=config["user"],
@@ -1,18 +1,25 @@
 from db import DB, open_db
-# import time
+import argparse
+import time
 # import matplotlib.pyplot as plt
 # import numpy as np
 from collections import defaultdict
-from itertools import combinations, product, permutations, count
+from itertools import combinations
 from phevaluator import evaluate_cards
 
-from card import card_sort_key, SUITS
+from card import card_sort_key
 # from card import Card, card_sort_key, RANK_ORDER, SUIT_ORDER, SUITS, RANKS
 from deck import Deck
+from board_index import BOARD_PATTERNS, PATTERN_MULTIPLICITIES, PatternBoards
+from chart_histograms import ChartHistograms, build_chart_histograms, hand_index_map, merge_shards
+from instrumentation import Instrumentation, NULL_INSTRUMENTATION, PROFILE_MODES
+from metrics import PrometheusMetrics
 
-# BOARD_PATTERNS = [[5, 0, 0, 0], [4, 1, 0, 0]]
-BOARD_PATTERNS = [[5, 0, 0, 0], [4, 1, 0, 0], [3, 2, 0, 0], [3, 1, 1, 0], [2, 2, 1, 0], [2, 1, 1, 1]]
-PATTERN_COUNTS = [4, 12, 12, 12, 12, 14]
+# Bump whenever evaluation or ranking logic changes; rows with another version are stale.
+EVALUATOR_VERSION = 1
+
+# Actual boards represented by each canonical board of a pattern: [4, 12, 12, 12, 12, 4].
+PATTERN_COUNTS = PATTERN_MULTIPLICITIES
 
 def create_hands_table(db):
     """
@@ -21,7 +28,7 @@ def create_hands_table(db):
     db.truncate_table("hands")  
     hands = generate_hands()
     print(hands[:10])
-    hand_id_map = db.bulk_insert_hands(hands)
+    hand_id_map = db.copy_hands(hands, first_id=1)
     return
 
 def create_boards_table(db):
@@ -32,52 +39,128 @@ def create_boards_table(db):
     # db.init_schema()
     db.truncate_table("boards")
     for pattern_num, pattern in enumerate(BOARD_PATTERNS):
-        boards = generate_boards_by_suit_distribution(pattern)
-        board_id_map = db.bulk_insert_boards(boards, pattern_num)
+        boards = PatternBoards(pattern_num)
+        # Ids follow the canonical board order: board_id = canonical row + 1.
+        board_id_map = db.copy_boards(boards.board_strs(), pattern_num, first_id=boards.offset + 1)
     return
 
-def create_evaluations_table(db):
+def create_evaluations_table(db, profile=None, summary_path=None, metrics=None,
+                             shard_index=0, num_shards=1, artifact_dir=None, patterns=None, processes=1):
     """
     Clear the evaluations table and repopulate.
+
+    Arguments:
+        db: The evaluations database (unused, may be None, with artifact_dir).
+        profile: optional profiling mode ("cprofile", "tracemalloc" or "all").
+            Falls back to the POKER_PROFILE environment variable.
+        summary_path: where to write the JSON run summary.
+        metrics: optional PrometheusMetrics registry receiving live progress.
+        shard_index, num_shards: evaluate only shard k of n, every n-th board of each
+            pattern. Other shards' rows are left in place, so the table is not cleared.
+        artifact_dir: write this shard as an evaluation_shards artifact into this
+            directory instead of the database.
+        patterns: suit pattern indices to evaluate (artifact mode, default all).
+        processes: worker processes in artifact mode.
+
+    Returns:
+        The artifact path in artifact mode.
     """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard {shard_index} of {num_shards}")
+    if artifact_dir is not None:
+        from evaluation_shards import write_shard_artifact
+        return write_shard_artifact(artifact_dir, shard_index, num_shards, patterns=patterns,
+                                    processes=processes, evaluator_version=EVALUATOR_VERSION)
+
+    instr = Instrumentation(profile=profile, name="evaluations", metrics=metrics)
+    instr.start()
     hand_id_map = db.get_hand_ids()
-    db.truncate_table("evaluations")
+    db.ensure_evaluator_version_column()
+    if num_shards == 1:
+        db.truncate_table("evaluations")
     try:
         for i, pattern in enumerate(BOARD_PATTERNS):
             print(f"Running board pattern {i}")
             board_id_map = db.get_board_ids(i)
+            if num_shards > 1:
+                offset = PatternBoards(i).offset
+                board_id_map = {board_str: board_id for board_str, board_id in board_id_map.items()
+                                if (board_id - offset - 1) % num_shards == shard_index}
             print(len(board_id_map))
-            all_hand_values = run_evaluations(db, hand_id_map, board_id_map)
+            instr.set_gauge("pattern_boards", len(board_id_map), pattern=f"pattern_{i}")
+            with instr.span(f"pattern_{i}"):
+                all_hand_values = run_evaluations(db, hand_id_map, board_id_map, instr, label=f"pattern_{i}")
     except Exception as e:
             import traceback
             print(f"An error occurred during evaluation: {e}")
             traceback.print_exc()
             # You might want to log the error or perform a rollback here
+    finally:
+        instr.stop()
+        instr.print_summary()
+        instr.write_summary(summary_path)
 
     # db.replace_indices_on_evaluations()
 
     return
 
-def generate_boards_by_suit_distribution(suit_counts):
+def create_chart_histograms(shard_index=0, num_shards=1, shard_path=None, chart_path=None,
+                            profile=None, summary_path=None, metrics=None):
     """
-    Generates canonical list of boards based on number of cards of each suit.
-    Returns a list of board strings (e.g., "AsKsQsJhTh").
-    """
-    my_deck = Deck()
-    deck = my_deck.get_cards()
+    Evaluate one shard of the canonical boards and fold the rankings straight into
+    per-hand histograms, without PostgreSQL.
 
-    assert sum(suit_counts) == 5
-    assert len(suit_counts) == 4
+    Boards of every pattern are split round-robin over num_shards shards. Shards can
+    run independently and be combined with merge_shards().
 
-    suit_to_cards = {suit: [card for card in deck if card.suit == suit] for suit in SUITS}
+    Arguments:
+        shard_index, num_shards: which shard of the boards to evaluate.
+        shard_path: where to save the partial histograms (.npz), if given.
+        chart_path: where to write chart_data.json, if given (only meaningful for a
+            single shard or after merging).
+        profile, summary_path, metrics: as for create_evaluations_table.
 
-    suit_combos = [list(combinations(suit_to_cards[suit], count)) for suit, count in zip(SUITS, suit_counts) if count > 0]
+    Returns:
+        The ChartHistograms of this shard.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard {shard_index} of {num_shards}")
+
+    instr = Instrumentation(profile=profile, name=f"chart_shard_{shard_index}", metrics=metrics)
+    instr.start()
+    # Ids follow the insertion order of a fresh create_hands_table / create_boards_table.
+    hand_id_map = {hand_str: hand_id for hand_id, hand_str in enumerate(generate_hands(), 1)}
+    histograms = ChartHistograms()
+    try:
+        for i, pattern in enumerate(BOARD_PATTERNS):
+            boards = PatternBoards(i)
+            board_strs = boards.board_strs(shard_index, None, num_shards)
+            board_ids = range(boards.offset + shard_index + 1, boards.offset + len(boards) + 1, num_shards)
+            board_id_map = dict(zip(board_strs, board_ids))
+            print(f"Running board pattern {i}: {len(board_id_map)} boards (shard {shard_index + 1}/{num_shards})")
+            with instr.span(f"pattern_{i}"):
+                run_evaluations(None, hand_id_map, board_id_map, instr, label=f"pattern_{i}",
+                                histograms=histograms, weight=PATTERN_COUNTS[i])
+        histograms.flush()
+    finally:
+        instr.stop()
+        instr.print_summary()
+        instr.write_summary(summary_path)
+
+    if shard_path is not None:
+        histograms.save(shard_path)
+    if chart_path is not None:
+        histograms.write_chart_data(chart_path)
+    return histograms
 
-    raw_boards = product(*suit_combos)
-    # Return as string representation
-    boards = ["".join(card.card_string() for group in combo for card in group) for combo in raw_boards]
+def generate_boards_by_suit_distribution(suit_counts):
+    """
+    Generates canonical list of boards based on number of cards of each suit.
+    Returns a list of board strings (e.g., "AsKsQsJhTh").
 
-    return boards
+    Use board_index.PatternBoards directly for lazy, int-encoded access by index.
+    """
+    return PatternBoards(suit_counts).board_strs()
 
 def generate_hands():
     """
@@ -94,22 +177,70 @@ def generate_hands():
 
     return hands
 
-def run_evaluations(db, hand_id_map, board_id_map):
+def run_evaluations(db, hand_id_map, board_id_map, instrumentation=None, label="boards",
+                    histograms=None, weight=1):
+    """
+    Evaluate and rank all hands on every board, then COPY the rows into evaluations.
+
+    Arguments:
+        db: The evaluations database (unused in histogram mode).
+        hand_id_map: dict mapping hand_str to hand_id.
+        board_id_map: dict mapping board_str to board_id.
+        instrumentation: optional Instrumentation collecting spans and counters.
+        label: name of the per-board latency histogram (e.g. the suit pattern).
+        histograms: optional ChartHistograms. When given, each board's rankings are
+            folded into the histograms and nothing is written to the database.
+        weight: pattern multiplicity of the boards, used in histogram mode.
+    """
+    instr = instrumentation or NULL_INSTRUMENTATION
+    perf_counter = time.perf_counter
+
+    if histograms is not None:
+        hand_index_by_id = hand_index_map(hand_id_map)
+        for board_str in board_id_map:
+            t0 = perf_counter()
+            hand_values = evaluate_board(board_str, hand_id_map)
+            t1 = perf_counter()
+            hand_rankings = rank_hands_for_board(hand_values)
+            t2 = perf_counter()
+            histograms.add_rankings(hand_rankings, hand_index_by_id, weight)
+            t3 = perf_counter()
+
+            instr.add_span("evaluate", t1 - t0)
+            instr.add_span("rank", t2 - t1)
+            instr.add_span("histogram", t3 - t2)
+            instr.observe(label, t3 - t0, board_str)
+            instr.incr("boards_evaluated", pattern=label)
+            instr.incr("rows_evaluated", len(hand_rankings))
+        return None
 
     all_evaluations_to_insert = []
 
     for board_str, board_id in board_id_map.items():
+        t0 = perf_counter()
         hand_values = evaluate_board(board_str, hand_id_map)
+        t1 = perf_counter()
         hand_rankings = rank_hands_for_board(hand_values)
+        t2 = perf_counter()
 
         evaluations_for_board = [
-            (board_id, hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank)
+            (board_id, hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank, EVALUATOR_VERSION)
             for hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank in hand_rankings
         ]
 
         all_evaluations_to_insert.extend(evaluations_for_board)
+        t3 = perf_counter()
+
+        instr.add_span("evaluate", t1 - t0)
+        instr.add_span("rank", t2 - t1)
+        instr.add_span("build_rows", t3 - t2)
+        instr.observe(label, t3 - t0, board_str)
+        instr.incr("boards_evaluated", pattern=label)
+        instr.incr("rows_evaluated", len(evaluations_for_board))
+        instr.set_gauge("pending_rows", len(all_evaluations_to_insert))
 
-    db.bulk_insert_evaluations(all_evaluations_to_insert)
+    db.bulk_insert_evaluations(all_evaluations_to_insert, instrumentation=instr)
+    instr.set_gauge("pending_rows", 0)
 
     return None
 
@@ -198,12 +329,78 @@ def evaluate_hand(cards):
 
 def main():
 
+    parser = argparse.ArgumentParser(description="Populate the poker evaluation database.")
+    parser.add_argument("--profile", choices=sorted(PROFILE_MODES), default=None,
+                        help="Capture cProfile and/or tracemalloc data during evaluation.")
+    parser.add_argument("--summary", default=None,
+                        help="Path of the JSON run summary (default: evaluations_summary.json).")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this local port while running.")
+    parser.add_argument("--metrics-textfile", default=None,
+                        help="Periodically rewrite Prometheus metrics to this file (node exporter textfile collector).")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="Seconds between textfile rewrites.")
+    parser.add_argument("--chart-histograms", action="store_true",
+                        help="Fold rankings into chart histograms instead of writing the evaluations table.")
+    parser.add_argument("--shard", type=int, default=0, help="Shard index (0-based) of the boards to evaluate.")
+    parser.add_argument("--num-shards", type=int, default=1, help="Number of shards the boards are split into.")
+    parser.add_argument("--artifact-dir", default=None,
+                        help="Write this shard's evaluations as a columnar artifact here instead of the database.")
+    parser.add_argument("--patterns", type=int, nargs="+", default=None,
+                        help="Suit pattern indices to evaluate with --artifact-dir (default: all).")
+    parser.add_argument("--shard-path", default=None, help="Where to save this shard's partial histograms (.npz).")
+    parser.add_argument("--chart-path", default=None, help="Where to write chart_data.json.")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="With --chart-histograms or --artifact-dir, evaluate on this many worker processes.")
+    parser.add_argument("--merge-shards", nargs="+", default=None, metavar="SHARD",
+                        help="Merge partial histogram shards into --chart-path and exit.")
+    args = parser.parse_args()
+
+    if args.merge_shards:
+        merge_shards(args.merge_shards, args.chart_path or "chart/chart_data.json")
+        return
+
+    metrics = None
+    if args.metrics_port is not None or args.metrics_textfile is not None:
+        metrics = PrometheusMetrics()
+        if args.metrics_port is not None:
+            metrics.serve_http(args.metrics_port)
+        if args.metrics_textfile is not None:
+            metrics.start_textfile_writer(args.metrics_textfile, args.metrics_interval)
+
+    if args.chart_histograms and args.processes is not None:
+        histograms = build_chart_histograms(args.processes, args.shard, args.num_shards)
+        if args.shard_path is not None:
+            histograms.save(args.shard_path)
+        if args.chart_path is not None:
+            histograms.write_chart_data(args.chart_path)
+        if metrics is not None:
+            metrics.close()
+        return
+
+    if args.chart_histograms:
+        create_chart_histograms(args.shard, args.num_shards, shard_path=args.shard_path,
+                                chart_path=args.chart_path, profile=args.profile,
+                                summary_path=args.summary, metrics=metrics)
+        if metrics is not None:
+            metrics.close()
+        return
+
+    if args.artifact_dir is not None:
+        create_evaluations_table(None, shard_index=args.shard, num_shards=args.num_shards,
+                                 artifact_dir=args.artifact_dir, patterns=args.patterns,
+                                 processes=args.processes or 1)
+        if metrics is not None:
+            metrics.close()
+        return
+
     # Initialize DB connection
     db = open_db()
 
     # create_hands_table(db)
     # create_boards_table(db)
-    create_evaluations_table(db)
+    create_evaluations_table(db, profile=args.profile, summary_path=args.summary, metrics=metrics,
+                             shard_index=args.shard, num_shards=args.num_shards)
     # check_evaluations_for_hand(db, "AhKd")
     # check_evaluations_for_hand(db, "AhKd")
     # plot_chart_for_hand(db, "7h2c", "rank_min")
@@ -211,6 +408,8 @@ def main():
     # plot_rank_distribution_multi2(db, ["AQo", "JTs", "99"])
     # Close the DB connection
     db.close()
+    if metrics is not None:
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+"""
+Rank distributions with dead cards.
+
+Known cards (our other hand, exposed or burnt cards) remove every board that
+contains one of them, found with the 52-bit board masks, and every opponent hand
+that contains one. Percentiles are recomputed against the reduced opponent set
+without re-ranking whole boards. A hand's [rank_min, rank_max] positions come
+from the rank table, and the dead hands that beat or tie it are subtracted. Those
+are the at most 51 hands per dead card, compared using the value table. Both
+tables are read through the canonical board map, so nothing is queried from SQL.
+Boards that a suit permutation fixing the dead cards and the range maps onto
+each other rank identically, so only one board per orbit is ranked.
+"""
+import time
+import numpy as np
+from math import comb
+
+from board_index import BOARD_SIZE, NUM_RANKS, get_board_cards, get_board_masks, get_canonical_map
+from hand_index import (
+    CARD_PERM, HAND_MASKS, HAND_PERM, NUM_CARDS, NUM_PERMUTATIONS, NUM_SUITS, cards_from_str, cards_mask,
+)
+from holdem_rank_distribution import bin_position_pairs
+from range_equity import range_weights
+from rank_table import LIVE_HANDS, load_rank_table
+from value_table import load_value_table, row_searchsorted
+
+
+def dead_card_mask(dead_cards):
+    """
+    Returns the 52-bit mask of dead cards given as a card string ("AhKd") or card indices.
+    """
+    cards = cards_from_str(dead_cards) if isinstance(dead_cards, str) else list(dead_cards)
+    if len(set(cards)) != len(cards):
+        raise ValueError("Duplicate dead cards")
+    return cards_mask(cards), len(cards)
+
+
+def live_boards(dead_cards):
+    """
+    Returns the colex indices of the boards containing none of the dead cards.
+    """
+    mask, _ = dead_card_mask(dead_cards)
+    return np.flatnonzero((get_board_masks() & mask) == 0)
+
+
+def symmetry_permutations(dead_cards, weights):
+    """
+    Returns the suit permutations that map the dead cards and the range weights onto
+    themselves. Boards related by one of them contribute the same rankings.
+    """
+    cards = sorted(cards_from_str(dead_cards) if isinstance(dead_cards, str) else list(dead_cards))
+    return [
+        p for p in range(NUM_PERMUTATIONS)
+        if sorted(CARD_PERM[p][cards].tolist()) == cards and np.array_equal(weights[HAND_PERM[p]], weights)
+    ]
+
+
+def orbit_boards(boards, permutations):
+    """
+    Collapses boards that the permutations map onto each other.
+
+    Returns:
+        (representatives, counts): one colex board index of every orbit and the number
+        of the given boards in it.
+    """
+    board_cards = get_board_cards()[boards]
+
+    # A board's key has bit 13 * suit + rank set for each of its cards; the orbit key is
+    # the smallest key of the permuted boards.
+    keys = None
+    for p in permutations:
+        cards = CARD_PERM[p].astype(np.int64)
+        card_bits = np.int64(1) << (NUM_RANKS * (cards % NUM_SUITS) + cards // NUM_SUITS)
+        permuted = card_bits[board_cards].sum(axis=1)
+        keys = permuted if keys is None else np.minimum(keys, permuted)
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return np.asarray(boards)[first], counts
+
+
+def dead_card_distribution(hand_range, dead_cards, num_bins=100, chunk_size=16384, max_boards=None, seed=None,
+                           value_table=None, rank_table=None, verbose=False):
+    """
+    Rank distribution of a range when some cards are known to be out of play.
+
+    Arguments:
+        hand_range: hand class, hand, notation or any range accepted by range_weights.
+            Hands containing a dead card are dropped from it.
+        dead_cards: card string ("AhKd7c") or card indices.
+        num_bins: the number of bins in the histogram.
+        chunk_size: boards processed at a time.
+        max_boards: evaluate a uniform random sample of this many live boards instead
+            of all of them.
+        seed: random seed of the board sample.
+        value_table, rank_table: optional preloaded tables.
+        verbose: print the number of boards ranked and the time taken.
+
+    Returns:
+        Dictionary with the normalized bin frequencies, the number of boards used and
+        removed, and the number of live opponent hands on every board.
+    """
+    start_time = time.time()
+    dead_mask, num_dead = dead_card_mask(dead_cards)
+    weights = range_weights(hand_range)
+    weights[(HAND_MASKS & dead_mask) != 0] = 0.0
+    hands = np.flatnonzero(weights)
+    if len(hands) == 0:
+        raise ValueError("Every hand of the range contains a dead card")
+    hand_weights = weights[hands]
+    dead_hands = np.flatnonzero((HAND_MASKS & dead_mask) != 0)
+
+    values = load_value_table() if value_table is None else value_table
+    positions = load_rank_table()[0] if rank_table is None else rank_table
+    rows, perms = get_canonical_map()
+
+    boards = live_boards(dead_cards)
+    removed = len(rows) - len(boards)
+    if max_boards is not None and len(boards) > max_boards:
+        boards = np.sort(np.random.default_rng(seed).choice(boards, max_boards, replace=False))
+    num_boards = len(boards)
+    boards, board_weights = orbit_boards(boards, symmetry_permutations(dead_cards, weights))
+    num_live = comb(NUM_CARDS - BOARD_SIZE - num_dead, 2)
+
+    # Weight of every distinct [rank_min, rank_max] position pair, spread over the bins once.
+    pair_weights = np.zeros(LIVE_HANDS * LIVE_HANDS)
+    for start in range(0, len(boards), chunk_size):
+        chunk = boards[start:start + chunk_size]
+        board_rows = rows[chunk][:, None]
+        board_perms = perms[chunk][:, None]
+        canonical_hands = HAND_PERM[board_perms, hands]
+
+        hero_positions = positions[board_rows, canonical_hands].astype(np.int64)
+        hero_values = values[board_rows, canonical_hands].astype(np.int64)
+        # Count the dead hands beating or tying each hand by binary search in the sorted
+        # dead hand values of its board. Hands blocked by the board hold BLOCKED_VALUE,
+        # which never beats or ties a live hand.
+        dead_values = np.sort(values[board_rows, HAND_PERM[board_perms, dead_hands]], axis=1)
+        board_index = np.broadcast_to(np.arange(len(chunk))[:, None], hero_values.shape)
+        stronger, not_weaker = row_searchsorted(dead_values, board_index, hero_values)
+
+        live = hero_positions[..., 0] >= 0
+        rank_min = (hero_positions[..., 0] - stronger)[live]
+        rank_max = (hero_positions[..., 1] - not_weaker)[live]
+        entry_weights = (board_weights[start:start + chunk_size, None] * hand_weights)[live]
+        pair_weights += np.bincount(rank_min * LIVE_HANDS + rank_max, weights=entry_weights,
+                                    minlength=len(pair_weights))
+
+    bins = bin_position_pairs(pair_weights.reshape(LIVE_HANDS, LIVE_HANDS), num_live, num_bins)
+    if verbose:
+        print(f"🃏 Ranked {len(hands)} hands on {num_boards:,} boards ({len(boards):,} up to symmetry) "
+              f"without {num_dead} dead cards in {time.time() - start_time:.2f}s")
+    return {
+        "bins": (bins / bins.sum()).tolist(),
+        "boards": num_boards,
+        "removed_boards": removed,
+        "sampled": num_boards < len(rows) - removed,
+        "live_opponents": num_live,
+    }
+
+
+def main():
+
+    result = dead_card_distribution("AQo", "KhKd", verbose=True)
+    print(f"AQo with KhKd dead: {result['boards']:,} boards, {result['live_opponents']} live hands per board")
+
+    # result = dead_card_distribution("AJs+, 77+", "As7c2d", max_boards=200000, seed=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+"""
+Embedded SQLite storage backend.
+
+SQLiteDB implements the StorageBackend interface of db.py on a single database
+file, so the whole pipeline (schema, bulk loads, id maps, evaluation queries,
+incremental maintenance and verification) runs without a PostgreSQL server or
+any network access. open_db() returns it when no config.json exists, or when
+POKER_DB_BACKEND=sqlite.
+
+Layout and loading:
+    evaluations is a WITHOUT ROWID table clustered on (board_id, hand_id), so
+    each row is stored once, in primary key order, and per-board reads and
+    full-table aggregates are sequential scans. Per-hand queries (suitedness,
+    rank ranges) skip-scan the same key: one seek per board, no secondary index.
+    (A hand_id index would be picked by the planner for whole-table scans too,
+    turning them into random lookups.) Bulk loads are executemany() INSERTs in
+    one transaction per chunk, in WAL mode, appending in key order for
+    board-ordered data, followed by a sampled ANALYZE: the planner only chooses
+    the skip-scan with table statistics.
+
+Queries written for PostgreSQL run unchanged: the cursor rewrites %s
+placeholders to ? and expands "= ANY(%s)" list parameters into IN (...).
+
+Performance (storage_benchmark.py on one CPU, 12.2M evaluation rows, ranges
+over several runs; PostgreSQL 16 with default settings on the same machine):
+
+    query          SQLite      PostgreSQL
+    load           390k rows/s 43k rows/s
+    count          0.2 s       0.6 s
+    board_counts   0.8-1.2 s   1.1 s
+    stale_boards   2.3-2.8 s   2.2-2.9 s
+    suitedness     0.3-0.5 s   1.0-1.3 s
+    rank_ranges    0.1 s       1.1-1.4 s
+    pattern_avg    5.4-6.2 s   6.4-7.2 s
+
+    SQLite has no hash aggregate: a GROUP BY over the joined table sorts every
+    row in a temp B-tree, which took 19 s for pattern_avg. get_pattern_averages
+    therefore groups a few boards at a time and merges the per-hand sums. Other
+    ad-hoc full-table aggregates with a GROUP BY on columns outside the primary
+    key still take that sort and are about 3x slower than on PostgreSQL.
+"""
+import os
+import re
+import sqlite3
+import numpy as np
+from contextlib import contextmanager
+
+from board_index import CACHE_DIR
+from db import (
+    EVALUATION_COLUMNS, VERSIONED_EVALUATION_COLUMNS, StorageBackend, _check_identifier, get_suitedness,
+)
+from instrumentation import NULL_INSTRUMENTATION
+
+DB_FILE = "poker.sqlite3"
+TABLES = ("boards", "hands", "evaluations")
+# Boards per GROUP BY in get_pattern_averages: about 35k rows, sorted in memory.
+PATTERN_AVG_CHUNK_BOARDS = 32
+
+# Numpy scalars from the vectorized evaluators are stored as plain numbers.
+for _type in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32):
+    sqlite3.register_adapter(_type, int)
+sqlite3.register_adapter(np.float32, float)
+
+_PLACEHOLDER = re.compile(r"=\s*ANY\(%s\)|%s")
+
+
+def default_db_path():
+    return os.path.join(CACHE_DIR, DB_FILE)
+
+
+def translate_query(query, params=None):
+    """
+    Rewrites a query with PostgreSQL %s placeholders for sqlite3.
+
+    Arguments:
+        query: SQL text using %s and "= ANY(%s)" placeholders.
+        params: sequence of parameters; list parameters of "= ANY(%s)" are expanded.
+
+    Returns:
+        (query, params) for sqlite3.
+    """
+    if params is None:
+        return query, ()
+    params = iter(params)
+    translated = []
+
+    def replace(match):
+        value = next(params)
+        if match.group(0) == "%s":
+            translated.append(value)
+            return "?"
+        values = list(value)
+        translated.extend(values)
+        # An empty list matches nothing, like ANY('{}').
+        return f"IN ({', '.join('?' * len(values))})" if values else "IN (NULL)"
+
+    return _PLACEHOLDER.sub(replace, query), translated
+
+
+class SQLiteCursor:
+    """
+    DB-API cursor wrapper accepting PostgreSQL-style placeholders.
+    """
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(*translate_query(query, params))
+        return self
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(query.replace("%s", "?"), rows)
+        return self
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteDB(StorageBackend):
+    def __init__(self, path=None):
+        path = path or default_db_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit like the PostgreSQL connection; bulk operations open explicit transactions.
+        # The connection may be used from other threads (rank_service runs queries on a
+        # thread pool); callers sharing it serialize access, as DatabaseSource does with its lock.
+        self.conn = sqlite3.connect(path, timeout=600, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        self.conn.execute("PRAGMA synchronous = NORMAL;")
+        self.conn.execute("PRAGMA temp_store = MEMORY;")
+        self.conn.execute("PRAGMA cache_size = -262144;")  # 256 MiB
+        self.conn.execute("PRAGMA analysis_limit = 1000;")  # sampled, millisecond ANALYZE
+        self.cursor = SQLiteCursor(self.conn.cursor())
+        self.path = path
+        self.db_key = f"sqlite:{os.path.abspath(path)}"
+        print(f"✅ Opened SQLite database {path}")
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the block in a transaction, or in the caller's transaction if one is open.
+        """
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN;")
+        try:
+            yield
+        except Exception:
+            self.conn.execute("ROLLBACK;")
+            raise
+        self.conn.execute("COMMIT;")
+
+    def _analyze(self):
+        """
+        Refreshes the planner statistics after a load.
+        """
+        self.cursor.execute("ANALYZE;")
+
+    # Methods to implement schema
+    def init_schema(self):
+        self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS boards (
+                    board_id INTEGER PRIMARY KEY,
+                    board_str TEXT UNIQUE NOT NULL,
+                    suit_pattern INT
+                    );
+                    """)
+
+        self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS hands (
+                    hand_id INTEGER PRIMARY KEY,
+                    hand_str TEXT UNIQUE NOT NULL,
+                    suitedness TEXT NOT NULL
+                    );
+                    """)
+
+        self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS evaluations (
+                    board_id INT REFERENCES boards(board_id),
+                    hand_id INT REFERENCES hands(hand_id),
+                    hand_value INT NOT NULL,
+                    rank_min FLOAT,
+                    rank_max FLOAT,
+                    rank_avg FLOAT,
+                    rank_dense FLOAT,
+                    evaluator_version INT,
+                    PRIMARY KEY (board_id, hand_id)
+                    ) WITHOUT ROWID;
+                    """)
+
+        print("🛠️ Created tables")
+
+        return
+
+    def remove_indices_from_evaluations(self):
+        """
+        No-op: the primary key is the storage order of evaluations and cannot be
+        dropped. Loads in board order append to it without index maintenance.
+        """
+        print("ℹ️ evaluations keeps its primary key (storage order) in SQLite.")
+
+    def replace_indices_on_evaluations(self):
+        """
+        No-op counterpart of remove_indices_from_evaluations.
+        """
+        print("ℹ️ evaluations keeps its primary key (storage order) in SQLite.")
+
+    # Reset tables
+    def truncate_table(self, table_name):
+        if table_name not in TABLES:
+            raise ValueError("Invalid table name")
+
+        with self._transaction():
+            # Same effect as TRUNCATE ... CASCADE: evaluations reference boards and hands.
+            if table_name != "evaluations":
+                self.cursor.execute("DELETE FROM evaluations;")
+            self.cursor.execute(f"DELETE FROM {table_name};")
+        print(f"🧹 Truncated table: {table_name}")
+
+    def drop_table(self, table):
+        """
+        Drops table if it exists.
+        """
+        if table not in TABLES:
+            raise ValueError("Invalid table name")
+        self.cursor.execute(f"DROP TABLE IF EXISTS {table};")
+        print(f"🗑️ Dropped table: {table}")
+
+    # Methods to populate tables
+    def bulk_insert_hands(self, data):
+        """
+        Inserts hands that are not in the table yet.
+
+        Returns:
+            dict mapping hand_str to hand_id for the newly inserted hands.
+        """
+        self.cursor.execute("SELECT hand_str FROM hands;")
+        existing = {hand_str for (hand_str,) in self.cursor.fetchall()}
+        with self._transaction():
+            self.cursor.executemany(
+                "INSERT INTO hands (hand_str, suitedness) VALUES (%s, %s) ON CONFLICT (hand_str) DO NOTHING;",
+                [(hand, get_suitedness(hand)) for hand in data],
+            )
+        self.cursor.execute("SELECT hand_id, hand_str FROM hands;")
+        hand_id_map = {hand_str: hand_id for hand_id, hand_str in self.cursor.fetchall() if hand_str not in existing}
+
+        print(f"✅ Inserted {len(hand_id_map)} new hands.")
+        return hand_id_map
+
+    def bulk_insert_boards(self, data, suit_pattern):
+        """
+        Inserts boards that are not in the table yet.
+
+        Returns:
+            dict mapping every board_str in data to its board_id.
+        """
+        with self._transaction():
+            self.cursor.executemany(
+                "INSERT INTO boards (board_str, suit_pattern) VALUES (%s, %s) ON CONFLICT (board_str) DO NOTHING;",
+                [(board, suit_pattern) for board in data],
+            )
+        wanted = set(data)
+        self.cursor.execute("SELECT board_id, board_str FROM boards;")
+        board_id_map = {board_str: board_id for board_id, board_str in self.cursor.fetchall() if board_str in wanted}
+
+        print(f"✅ Inserted {len(board_id_map)} new boards")
+        return board_id_map
+
+    def _copy_with_ids(self, table_name, columns, rows, first_id, chunk_size):
+        """
+        Inserts rows into boards or hands with explicitly assigned consecutive ids,
+        one transaction per chunk.
+
+        Returns:
+            Mapping of each row's first value (board_str or hand_str) to its id.
+        """
+        query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))});"
+        id_map = {}
+        chunk = []
+        for next_id, row in enumerate(rows, first_id):
+            chunk.append((next_id,) + tuple(row))
+            id_map[row[0]] = next_id
+            if len(chunk) == chunk_size:
+                with self._transaction():
+                    self.cursor.executemany(query, chunk)
+                chunk = []
+        if chunk:
+            with self._transaction():
+                self.cursor.executemany(query, chunk)
+        self._analyze()
+        return id_map
+
+    def copy_boards(self, data, suit_pattern, first_id=None, chunk_size=100000):
+        """
+        Bulk-loads boards with ids assigned in order from first_id (default: after
+        the current largest id). The boards must not already be in the table.
+
+        Returns:
+            dict mapping board_str to board_id.
+        """
+        first_id = self.next_id("boards") if first_id is None else first_id
+        rows = ((board_str, suit_pattern) for board_str in data)
+        board_id_map = self._copy_with_ids("boards", ("board_id", "board_str", "suit_pattern"), rows, first_id, chunk_size)
+        print(f"✅ Bulk inserted {len(board_id_map)} boards")
+        return board_id_map
+
+    def copy_hands(self, data, first_id=None, chunk_size=100000):
+        """
+        Bulk-loads hands with ids assigned in order from first_id (default: after
+        the current largest id).
+
+        Returns:
+            dict mapping hand_str to hand_id.
+        """
+        first_id = self.next_id("hands") if first_id is None else first_id
+        rows = ((hand_str, get_suitedness(hand_str)) for hand_str in data)
+        hand_id_map = self._copy_with_ids("hands", ("hand_id", "hand_str", "suitedness"), rows, first_id, chunk_size)
+        print(f"✅ Bulk inserted {len(hand_id_map)} hands")
+        return hand_id_map
+
+    def bulk_insert_evaluations(self, data, chunk_size=1000000, instrumentation=None, columns=None):
+        # data: list of tuples [(board_id, hand_id, hand_value, rank_min, rank_max, rank_avg, rank_dense), ...],
+        #   optionally followed by evaluator_version
+        # instrumentation: optional Instrumentation collecting insert spans and row counters
+        # columns: target columns (default: inferred from the row length)
+
+        if not data:
+            return
+
+        instr = instrumentation or NULL_INSTRUMENTATION
+        if columns is None:
+            columns = VERSIONED_EVALUATION_COLUMNS if len(data[0]) == len(VERSIONED_EVALUATION_COLUMNS) else EVALUATION_COLUMNS
+        query = f"INSERT INTO evaluations ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))});"
+
+        total = len(data)
+        for i in range(0, total, chunk_size):
+            chunk = data[i:i+chunk_size]
+            # The span keeps the PostgreSQL name so profiles of both backends line up.
+            with instr.span("copy"), self._transaction():
+                self.cursor.executemany(query, chunk)
+            instr.incr("rows_written", len(chunk))
+            print(f"✅ Inserted {len(chunk)} evaluations (rows {i+1}-{min(i+chunk_size, total)})")
+        self._analyze()
+        return
+
+    def _cached_id_arrays(self, table_name, refresh=False):
+        # The database is a local file, so the id maps are read directly rather than snapshotted.
+        from id_map_cache import fetch_id_arrays
+
+        arrays = fetch_id_arrays(self.cursor, table_name)
+        print(f"📦 Loaded {len(arrays['ids']):,} {table_name} from database")
+        return arrays
+
+    # Incremental maintenance of the evaluations table
+    def _add_column(self, column, column_type):
+        self.cursor.execute("PRAGMA table_info(evaluations);")
+        if column not in {row[1] for row in self.cursor.fetchall()}:
+            self.cursor.execute(f"ALTER TABLE evaluations ADD COLUMN {column} {column_type};")
+
+    def ensure_evaluator_version_column(self):
+        """
+        Adds the evaluator_version column to evaluations tables created before it existed.
+        Rows without a version are treated as stale.
+        """
+        self._add_column("evaluator_version", "INT")
+
+    def replace_evaluations(self, board_ids, data, instrumentation=None):
+        """
+        Atomically replaces all evaluation rows of the given boards (delete + insert
+        in one transaction), i.e. an upsert at board granularity.
+        """
+        with self._transaction():
+            self.cursor.execute("DELETE FROM evaluations WHERE board_id = ANY(%s);", (list(board_ids),))
+            self.bulk_insert_evaluations(data, instrumentation=instrumentation)
+
+    def add_evaluation_column(self, column):
+        """
+        Adds a FLOAT rank column to evaluations if it does not exist yet.
+        """
+        _check_identifier(column)
+        self._add_column(column, "FLOAT")
+        print(f"🛠️ Ensured column evaluations.{column}")
+
+    def update_evaluation_column(self, column, data):
+        """
+        Sets column for (board_id, hand_id, value) rows through a temporary table and
+        one UPDATE ... FROM join, in a single transaction.
+        """
+        _check_identifier(column)
+        with self._transaction():
+            self.cursor.execute("""
+                CREATE TEMP TABLE column_backfill (
+                board_id INT, hand_id INT, value FLOAT, PRIMARY KEY (board_id, hand_id)
+                ) WITHOUT ROWID;
+            """)
+            self.cursor.executemany("INSERT INTO column_backfill VALUES (%s, %s, %s);", data)
+            self.cursor.execute(f"""
+                UPDATE evaluations SET {column} = c.value
+                FROM column_backfill c
+                WHERE evaluations.board_id = c.board_id AND evaluations.hand_id = c.hand_id;
+            """)
+            self.cursor.execute("DROP TABLE column_backfill;")
+
+    def get_pattern_averages(self, chunk_boards=PATTERN_AVG_CHUNK_BOARDS):
+        """
+        Same result as StorageBackend.get_pattern_averages, computed without sorting
+        the whole table: SQLite has no hash aggregate, so one GROUP BY over all rows
+        sorts every row in a temp B-tree. Instead, each run of chunk_boards boards of
+        one suit pattern is grouped by hand_id (a small in-memory sort, the rows are
+        read in primary key order), and the per-hand sums are merged into hand
+        classes here.
+
+        Arguments:
+            chunk_boards: number of boards grouped per query.
+
+        Returns:
+            List of (suit_pattern, suitedness, num_rows, avg_rank) tuples.
+        """
+        self.cursor.execute("SELECT hand_id, suitedness FROM hands;")
+        hand_classes = dict(self.cursor.fetchall())
+        self.cursor.execute("SELECT board_id, suit_pattern FROM boards ORDER BY board_id;")
+        boards = self.cursor.fetchall()
+
+        query = """
+            SELECT hand_id, COUNT(*), COUNT(rank_avg), SUM(rank_avg)
+            FROM evaluations
+            WHERE board_id BETWEEN %s AND %s
+            GROUP BY hand_id;
+        """
+        totals = {}
+        start = 0
+        while start < len(boards):
+            suit_pattern = boards[start][1]
+            end = start + 1
+            while end < len(boards) and end - start < chunk_boards and boards[end][1] == suit_pattern:
+                end += 1
+            self.cursor.execute(query, (boards[start][0], boards[end - 1][0]))
+            for hand_id, num_rows, num_ranks, rank_sum in self.cursor.fetchall():
+                total = totals.setdefault((suit_pattern, hand_classes[hand_id]), [0, 0, 0.0])
+                total[0] += num_rows
+                if num_ranks:
+                    total[1] += num_ranks
+                    total[2] += rank_sum
+            start = end
+
+        # AVG skips NULL ranks and is NULL for a class without any.
+        return [(suit_pattern, suitedness, num_rows, rank_sum / num_ranks if num_ranks else None)
+                for (suit_pattern, suitedness), (num_rows, num_ranks, rank_sum) in sorted(totals.items())]
+
+    def stream_query(self, query, params=None, itersize=100000, name="stream"):
+        """
+        Runs a query on its own cursor and yields rows in batches of itersize
+        without loading the whole result set into memory.
+        """
+        cursor = SQLiteCursor(self.conn.cursor())
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def close(self):
+        # Refresh the planner statistics of tables changed in this session.
+        self.conn.execute("PRAGMA optimize;")
+        self.cursor.close()
+        self.conn.close()
+        print("🔌 Connection closed")
+
+
+def main():
+
+    db = SQLiteDB()
+    db.init_schema()
+    db.select_hands()
+    db.get_evaluations_count()
+    db.close()
+
+    # from db_operations import create_hands_table, create_boards_table
+    # create_hands_table(db)
+    # create_boards_table(db)
+
+
+if __name__ == "__main__":
+    main()
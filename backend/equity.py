@@ -0,0 +1,420 @@
+"""
+Exact heads-up equity from the hand value table.
+
+Equities are computed by enumerating every runout that does not collide with
+either hand (1,712,304 boards) and comparing the two hands' stored values with
+vectorized array operations, instead of re-evaluating seven-card hands.
+
+The preflop hand table holds the exact win and tie counts of every hand against
+every other hand. A suit permutation maps each hand onto the representative
+(first hand) of its class, so only the 169 representatives' rows are computed
+and stored (169 x 1,326 x 2 uint32, 1.8 MB). Any other row is the
+representative's row read through that permutation.
+"""
+import os
+import time
+import numpy as np
+from functools import lru_cache
+from math import comb
+from multiprocessing import Pool
+
+from board_index import BOARD_SIZE, CACHE_DIR, get_board_masks, get_canonical_map
+from hand_index import (
+    CLASS_HANDS, HAND_CLASSES, HAND_MASKS, HAND_PERM, HAND_STRS, NUM_CARDS, NUM_CLASSES, NUM_HANDS,
+    NUM_PERMUTATIONS, HAND_CLASS, class_hands, hand_index,
+)
+from value_table import load_value_table
+
+EQUITY_MATRIX_FILE = "preflop_equity_169.npy"
+HAND_TABLE_FILE = "preflop_hand_equity.npz"
+HAND_TABLE_VERSION = 1
+HEADS_UP_RUNOUTS = comb(NUM_CARDS - 4, BOARD_SIZE)
+
+# CLASS_REPRESENTATIVES[k] is the first hand of class k; REPRESENTATIVE_PERM[h] is a suit
+# permutation mapping hand h onto the representative of its class.
+CLASS_REPRESENTATIVES = np.array([hands[0] for hands in CLASS_HANDS], dtype=np.int64)
+REPRESENTATIVE_PERM = np.argmax(HAND_PERM == CLASS_REPRESENTATIVES[HAND_CLASS], axis=0)
+
+
+def _to_hand(hand):
+    return hand_index(hand) if isinstance(hand, str) else int(hand)
+
+
+def live_boards(dead_mask):
+    """
+    Returns the colex indices of all boards that avoid the dead cards.
+    """
+    return np.flatnonzero((get_board_masks() & np.uint64(dead_mask)) == 0)
+
+
+def matchup_counts(table, hand1, hand2):
+    """
+    Counts wins, ties and total runouts for hand1 against hand2.
+
+    Arguments:
+        table: value table from load_value_table().
+        hand1, hand2: hand indices.
+
+    Returns:
+        (wins, ties, total) from hand1's point of view.
+    """
+    if HAND_MASKS[hand1] & HAND_MASKS[hand2]:
+        raise ValueError("Hands share a card")
+    rows, perms = get_canonical_map()
+    boards = live_boards(HAND_MASKS[hand1] | HAND_MASKS[hand2])
+    board_rows = rows[boards]
+    board_perms = perms[boards]
+    v1 = table[board_rows, HAND_PERM[board_perms, hand1]]
+    v2 = table[board_rows, HAND_PERM[board_perms, hand2]]
+    # Lower hand values are stronger.
+    wins = int(np.count_nonzero(v1 < v2))
+    ties = int(np.count_nonzero(v1 == v2))
+    return wins, ties, len(boards)
+
+
+def hand_vs_hand(hand1, hand2, table=None):
+    """
+    Exact all-in equity of one hand against another.
+
+    Arguments:
+        hand1, hand2: hand strings (e.g. "AhKh", "QsQd") or hand indices.
+        table: optional preloaded value table.
+
+    Returns:
+        Dictionary with win, tie and lose probabilities and the equity of hand1.
+    """
+    table = load_value_table() if table is None else table
+    wins, ties, total = matchup_counts(table, _to_hand(hand1), _to_hand(hand2))
+    return _equity_result(wins, ties, total)
+
+
+def _equity_result(wins, ties, total):
+    return {
+        "win": wins / total,
+        "tie": ties / total,
+        "lose": (total - wins - ties) / total,
+        "equity": (wins + ties / 2) / total,
+        "boards": total,
+    }
+
+
+def _canonical_keys(h1, h2, chunk_size=200000):
+    keys = np.empty(len(h1), dtype=np.int64)
+    flipped = np.empty(len(h1), dtype=bool)
+    for start in range(0, len(h1), chunk_size):
+        stop = start + chunk_size
+        p1 = HAND_PERM[:, h1[start:stop]].astype(np.int64)
+        p2 = HAND_PERM[:, h2[start:stop]].astype(np.int64)
+        codes = np.minimum(p1, p2) * NUM_HANDS + np.maximum(p1, p2)
+        best = np.argmin(codes, axis=0)
+        cols = np.arange(p1.shape[1])
+        keys[start:stop] = codes[best, cols]
+        flipped[start:stop] = p1[best, cols] > p2[best, cols]
+    return keys, flipped
+
+
+def canonical_matchups(hands1, hands2):
+    """
+    Reduces hand-vs-hand matchups by suit isomorphism.
+
+    Arguments:
+        hands1, hands2: arrays of hand indices. Every combination is considered and
+            combinations that share a card are dropped.
+
+    Returns:
+        pairs: (k, 2) array of canonical matchups, lower hand index first.
+        inverse: canonical pair of each kept input matchup.
+        flipped: True where the input's first hand maps onto the canonical second hand.
+        mask: which of the len(hands1) * len(hands2) input matchups were kept.
+    """
+    h1, h2 = np.meshgrid(np.asarray(hands1), np.asarray(hands2), indexing="ij")
+    h1, h2 = h1.ravel(), h2.ravel()
+    mask = (HAND_MASKS[h1] & HAND_MASKS[h2]) == 0
+    keys, flipped = _canonical_keys(h1[mask], h2[mask])
+
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    pairs = np.stack([unique_keys // NUM_HANDS, unique_keys % NUM_HANDS], axis=1)
+    return pairs, inverse, flipped, mask
+
+
+def _oriented_counts(counts, inverse, flipped):
+    wins = np.where(flipped, counts[inverse, 2] - counts[inverse, 0] - counts[inverse, 1], counts[inverse, 0])
+    return wins, counts[inverse, 1], counts[inverse, 2]
+
+
+def class_vs_class(class1, class2, table=None):
+    """
+    Exact all-in equity of one preflop class against another (e.g. 'AKs' vs 'QQ'),
+    averaged over all card-disjoint combinations.
+
+    Returns:
+        Dictionary with win, tie and lose probabilities and the equity of class1.
+    """
+    table = load_value_table() if table is None else table
+    pairs, inverse, flipped, _ = canonical_matchups(class_hands(class1), class_hands(class2))
+    counts = np.array([matchup_counts(table, a, b) for a, b in pairs], dtype=np.int64)
+
+    wins, ties, total = _oriented_counts(counts, inverse, flipped)
+    return _equity_result(int(wins.sum()), int(ties.sum()), int(total.sum()))
+
+
+# Preflop matrix
+_worker_table = None
+
+
+def _init_worker(table_path):
+    global _worker_table
+    _worker_table = load_value_table(table_path, build=False)
+
+
+def _count_chunk(pairs):
+    return [matchup_counts(_worker_table, int(a), int(b)) for a, b in pairs]
+
+
+def compute_matchup_counts(pairs, processes=None, table_path=None, chunk_size=64):
+    """
+    Computes (wins, ties, total) for many canonical matchups on a process pool.
+    Workers memory-map the same value table file, so it is shared through the page cache.
+    """
+    load_value_table(table_path)  # make sure the table exists before forking
+    get_canonical_map()
+    get_board_masks()
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    counts = []
+    start_time = time.time()
+    with Pool(processes, initializer=_init_worker, initargs=(table_path,)) as pool:
+        for done, chunk_counts in enumerate(pool.imap(_count_chunk, chunks), 1):
+            counts.extend(chunk_counts)
+            if done % 50 == 0 or done == len(chunks):
+                print(f"⚔️ {len(counts):,}/{len(pairs):,} matchups ({time.time() - start_time:.1f}s)")
+    return np.array(counts, dtype=np.int64).reshape(-1, 3)
+
+
+def hero_counts(table, hero, chunk_size=8192):
+    """
+    Counts the wins and ties of one hand against all 1,326 hands.
+
+    The hero's live boards are grouped by suit permutation. Within a group, the
+    canonical rows are read as contiguous blocks, and every column is compared with
+    the hero's value at once. Boards blocking a villain hand hold BLOCKED_VALUE,
+    which the hero always beats, so those boards are subtracted from the wins.
+
+    Returns:
+        (wins, ties) uint32 arrays over villain hands, 0 for hands sharing a card with the hero.
+    """
+    rows, perms = get_canonical_map()
+    boards = live_boards(HAND_MASKS[hero])
+    board_rows, board_perms = rows[boards], perms[boards]
+    wins = np.zeros(NUM_HANDS, dtype=np.int64)
+    ties = np.zeros(NUM_HANDS, dtype=np.int64)
+    for p in range(NUM_PERMUTATIONS):
+        group_rows = np.sort(board_rows[board_perms == p])
+        lower = np.zeros(NUM_HANDS, dtype=np.int64)
+        equal = np.zeros(NUM_HANDS, dtype=np.int64)
+        for start in range(0, len(group_rows), chunk_size):
+            values = table[group_rows[start:start + chunk_size]]
+            hero_values = values[:, HAND_PERM[p, hero]][:, None]
+            # Lower hand values are stronger.
+            lower += np.count_nonzero(hero_values < values, axis=0)
+            equal += np.count_nonzero(hero_values == values, axis=0)
+        # Canonical column HAND_PERM[p, h] holds villain hand h.
+        wins += lower[HAND_PERM[p]]
+        ties += equal[HAND_PERM[p]]
+
+    # Every villain disjoint from the hero is blocked on the same number of the hero's boards.
+    wins -= len(boards) - HEADS_UP_RUNOUTS
+    conflicts = (HAND_MASKS & HAND_MASKS[hero]) != 0
+    wins[conflicts] = 0
+    ties[conflicts] = 0
+    return wins.astype(np.uint32), ties.astype(np.uint32)
+
+
+def _hero_chunk(hero):
+    return hero_counts(_worker_table, int(hero))
+
+
+def build_preflop_hand_table(path=None, processes=None, table_path=None):
+    """
+    Computes the exact win and tie counts of the 169 class representatives against
+    every hand on a process pool and saves them.
+
+    Arguments:
+        path: output .npz file. Defaults to cache/preflop_hand_equity.npz.
+        processes: worker processes (default: all cores).
+        table_path: value table location.
+
+    Returns:
+        (169, 1326, 2) uint32 array of (wins, ties) out of HEADS_UP_RUNOUTS boards.
+    """
+    path = path or os.path.join(CACHE_DIR, HAND_TABLE_FILE)
+    load_value_table(table_path)  # make sure the table exists before forking
+    get_canonical_map()
+    get_board_masks()
+
+    counts = np.zeros((NUM_CLASSES, NUM_HANDS, 2), dtype=np.uint32)
+    start_time = time.time()
+    with Pool(processes, initializer=_init_worker, initargs=(table_path,)) as pool:
+        for k, (wins, ties) in enumerate(pool.imap(_hero_chunk, CLASS_REPRESENTATIVES)):
+            counts[k, :, 0] = wins
+            counts[k, :, 1] = ties
+            if (k + 1) % 13 == 0:
+                print(f"⚔️ {k + 1}/{NUM_CLASSES} hands vs all 1,326 ({time.time() - start_time:.1f}s)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, version=HAND_TABLE_VERSION, counts=counts)
+    os.replace(tmp_path, path)
+    print(f"✅ Saved preflop hand equity table -> {path}")
+    load_preflop_hand_table.cache_clear()
+    return counts
+
+
+@lru_cache(maxsize=None)
+def load_preflop_hand_table(path=None, build=True):
+    """
+    Returns the (169, 1326, 2) preflop win/tie counts, building them first if needed.
+    """
+    path = path or os.path.join(CACHE_DIR, HAND_TABLE_FILE)
+    if not os.path.exists(path):
+        if not build:
+            raise FileNotFoundError(f"Preflop hand table '{path}' not found. Run build_preflop_hand_table() first.")
+        return build_preflop_hand_table(path)
+    with np.load(path) as saved:
+        if int(saved["version"]) != HAND_TABLE_VERSION:
+            raise ValueError(f"Unsupported preflop hand table version in '{path}'")
+        return saved["counts"]
+
+
+def preflop_hand_counts(hand1, hand2, counts=None):
+    """
+    Looks up (wins, ties, total) of hand1 against hand2 in the preflop hand table.
+    """
+    counts = load_preflop_hand_table() if counts is None else counts
+    h1, h2 = _to_hand(hand1), _to_hand(hand2)
+    if HAND_MASKS[h1] & HAND_MASKS[h2]:
+        raise ValueError("Hands share a card")
+    wins, ties = counts[HAND_CLASS[h1], HAND_PERM[REPRESENTATIVE_PERM[h1], h2]]
+    return int(wins), int(ties), HEADS_UP_RUNOUTS
+
+
+def preflop_hand_equity(hand1, hand2, counts=None):
+    """
+    Exact preflop all-in equity of hand1 against hand2 from the preflop hand table.
+
+    Returns:
+        Dictionary with win, tie and lose probabilities and the equity of hand1.
+    """
+    return _equity_result(*preflop_hand_counts(hand1, hand2, counts))
+
+
+def preflop_hand_matrix(counts=None):
+    """
+    Expands the preflop hand table to the full 1,326 x 1,326 equity matrix.
+
+    Returns:
+        float64 matrix, entry [i, j] the equity of hand i against hand j, NaN where
+        the hands share a card.
+    """
+    counts = load_preflop_hand_table() if counts is None else counts
+    villains = HAND_PERM[REPRESENTATIVE_PERM]
+    wins = counts[HAND_CLASS[:, None], villains, 0].astype(np.float64)
+    ties = counts[HAND_CLASS[:, None], villains, 1].astype(np.float64)
+    matrix = (wins + ties / 2) / HEADS_UP_RUNOUTS
+    matrix[(HAND_MASKS[:, None] & HAND_MASKS[None, :]) != 0] = np.nan
+    return matrix
+
+
+def verify_preflop_hand_table(samples=3, seed=None, counts=None):
+    """
+    Compares sampled matchups of the preflop hand table with brute-force phevaluator
+    enumeration of all their runouts.
+
+    Returns:
+        List of (hand1, hand2, table equity, brute-force equity) tuples.
+
+    Raises:
+        ValueError if a sampled matchup differs.
+    """
+    from range_equity import brute_force_range_vs_range
+
+    rng = np.random.default_rng(seed)
+    results = []
+    while len(results) < samples:
+        h1, h2 = (int(h) for h in rng.choice(NUM_HANDS, 2, replace=False))
+        if HAND_MASKS[h1] & HAND_MASKS[h2]:
+            continue
+        expected = brute_force_range_vs_range([HAND_STRS[h1]], [HAND_STRS[h2]],
+                                               live_boards(HAND_MASKS[h1] | HAND_MASKS[h2]))
+        result = preflop_hand_equity(h1, h2, counts)
+        if any(abs(result[key] - expected[key]) > 1e-12 for key in ("win", "tie", "equity")):
+            raise ValueError(f"{HAND_STRS[h1]} vs {HAND_STRS[h2]}: table {result} != brute force {expected}")
+        print(f"✅ {HAND_STRS[h1]} vs {HAND_STRS[h2]}: {result['equity']:.6f}")
+        results.append((HAND_STRS[h1], HAND_STRS[h2], result["equity"], expected["equity"]))
+    return results
+
+
+def build_preflop_equity_matrix(path=None, processes=None, table_path=None):
+    """
+    Computes the 169 x 169 preflop class equity matrix from the preflop hand table.
+    Entry [i, j] is the equity of HAND_CLASSES[i] against HAND_CLASSES[j].
+
+    Arguments:
+        path: output .npy file. Defaults to cache/preflop_equity_169.npy.
+        processes: worker processes used if the hand table needs building (default: all cores).
+        table_path: value table location.
+
+    Returns:
+        The 169 x 169 float64 matrix.
+    """
+    path = path or os.path.join(CACHE_DIR, EQUITY_MATRIX_FILE)
+    hand_table_path = os.path.join(CACHE_DIR, HAND_TABLE_FILE)
+    if os.path.exists(hand_table_path):
+        counts = load_preflop_hand_table()
+    else:
+        counts = build_preflop_hand_table(hand_table_path, processes=processes, table_path=table_path)
+    hand_matrix = preflop_hand_matrix(counts)
+    h1, h2 = np.nonzero(~np.isnan(hand_matrix))
+    equity = hand_matrix[h1, h2]
+
+    c1, c2 = HAND_CLASS[h1], HAND_CLASS[h2]
+    sums = np.zeros((NUM_CLASSES, NUM_CLASSES))
+    num = np.zeros((NUM_CLASSES, NUM_CLASSES))
+    np.add.at(sums, (c1, c2), equity)
+    np.add.at(num, (c1, c2), 1)
+    matrix = sums / num
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, matrix)
+    print(f"✅ Saved preflop equity matrix -> {path}")
+    return matrix
+
+
+@lru_cache(maxsize=None)
+def load_preflop_equity_matrix(path=None):
+    path = path or os.path.join(CACHE_DIR, EQUITY_MATRIX_FILE)
+    if not os.path.exists(path):
+        return build_preflop_equity_matrix(path)
+    return np.load(path)
+
+
+def preflop_class_equity(class1, class2):
+    """
+    Looks up the equity of class1 against class2 in the precomputed 169 x 169 matrix.
+    """
+    matrix = load_preflop_equity_matrix()
+    return float(matrix[HAND_CLASSES.index(class1), HAND_CLASSES.index(class2)])
+
+
+def main():
+
+    # build_value_table()
+    print(hand_vs_hand("AhKh", "QsQd"))
+    print(class_vs_class("AKs", "QQ"))
+    # build_preflop_hand_table()
+    # print(preflop_hand_equity("AhKh", "QsQd"))
+    # verify_preflop_hand_table(samples=3, seed=0)
+    # build_preflop_equity_matrix()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Sharded evaluation artifacts.
+
+Each node evaluates shard k of n, meaning every n-th board of each suit pattern
+starting at index k. This is the same round-robin split that create_chart_histograms
+uses. The node writes a self-describing artifact directory and needs no shared
+database:
+
+    evaluations-shard-001-of-004/
+        manifest.json                  shard spec, evaluator version, per-part metadata
+        pattern-0-part-00000.npz       columnar rows of up to chunk_size boards
+        ...
+
+Parts hold one array per evaluations column (board_id, hand_id, hand_value,
+rank_min, rank_max, rank_avg, rank_dense). The manifest records every part's row
+and board counts and its SHA-256. The manifest is written last, so an artifact
+without one is incomplete.
+
+merge_artifacts() validates a set of artifacts before using them. All shards of
+one spec must be present exactly once and share the evaluator version. Checksums
+must match, and every board must have 1,081 rows. The shards are then either
+bulk-loaded into the evaluations table or concatenated into one single-shard
+artifact. run_local_shards() runs several shards as separate processes on one
+machine.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+from multiprocessing import Pool
+
+from board_index import BOARD_PATTERNS, NUM_CANONICAL_BOARDS, PATTERN_SIZES, PatternBoards
+from db import EVALUATION_COLUMNS, VERSIONED_EVALUATION_COLUMNS
+from rank_table import LIVE_HANDS
+from value_table import BLOCKED_VALUE, evaluate_boards_values, rank_percentiles
+
+ARTIFACT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+COLUMN_DTYPES = {
+    "board_id": np.int32,
+    "hand_id": np.int16,
+    "hand_value": np.int16,
+    "rank_min": np.float64,
+    "rank_max": np.float64,
+    "rank_avg": np.float64,
+    "rank_dense": np.float64,
+}
+
+
+def artifact_name(shard_index, num_shards):
+    return f"evaluations-shard-{shard_index + 1:03d}-of-{num_shards:03d}"
+
+
+def shard_board_indices(pattern, shard_index, num_shards):
+    """
+    Returns the board indices within a suit pattern that belong to shard k of n.
+    """
+    return np.arange(shard_index, PATTERN_SIZES[pattern], num_shards)
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def evaluation_columns(board_ids, board_cards):
+    """
+    Evaluates and ranks all live hands on a batch of boards.
+
+    Arguments:
+        board_ids: (B,) board ids.
+        board_cards: (B, 5) card indices.
+
+    Returns:
+        Dictionary of evaluations column -> array, one entry per live hand and board.
+        Hand ids are hand index + 1, the order of a fresh create_hands_table.
+    """
+    values = evaluate_boards_values(board_cards)
+    ranks = rank_percentiles(values)
+    boards, hands = np.nonzero(values != BLOCKED_VALUE)
+    columns = {
+        "board_id": np.asarray(board_ids)[boards],
+        "hand_id": hands + 1,
+        "hand_value": values[boards, hands],
+    }
+    for name, rank in zip(EVALUATION_COLUMNS[3:], ranks):
+        columns[name] = rank[boards, hands]
+    return {name: np.asarray(column, dtype=COLUMN_DTYPES[name]) for name, column in columns.items()}
+
+
+def _write_part(args):
+    path, pattern, indices = args
+    boards = PatternBoards(pattern)
+    board_ids = boards.offset + indices + 1
+    columns = evaluation_columns(board_ids, boards.cards(indices))
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, path)
+    return {
+        "file": os.path.basename(path),
+        "pattern": pattern,
+        "boards": len(indices),
+        "rows": len(columns["board_id"]),
+        "first_board_id": int(board_ids[0]),
+        "last_board_id": int(board_ids[-1]),
+        "sha256": file_sha256(path),
+        "bytes": os.path.getsize(path),
+    }
+
+
+def write_shard_artifact(out_dir, shard_index=0, num_shards=1, patterns=None, chunk_size=1024, processes=1,
+                         evaluator_version=None):
+    """
+    Evaluates shard k of n and writes it as an artifact directory.
+
+    Arguments:
+        out_dir: parent directory of the artifact.
+        shard_index, num_shards: which shard of the boards to evaluate.
+        patterns: suit pattern indices to evaluate (default: all).
+        chunk_size: boards per part file.
+        processes: worker processes evaluating parts.
+        evaluator_version: value of the evaluator_version column (default: EVALUATOR_VERSION).
+
+    Returns:
+        Path of the artifact directory.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard {shard_index} of {num_shards}")
+    if evaluator_version is None:
+        from db_operations import EVALUATOR_VERSION
+        evaluator_version = EVALUATOR_VERSION
+    patterns = list(range(len(BOARD_PATTERNS))) if patterns is None else sorted(set(patterns))
+
+    path = os.path.join(out_dir, artifact_name(shard_index, num_shards))
+    os.makedirs(path, exist_ok=True)
+    # Drop a previous run's manifest, so the artifact reads as incomplete until every part is rewritten.
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        os.remove(os.path.join(path, MANIFEST_FILE))
+
+    tasks = []
+    for pattern in patterns:
+        indices = shard_board_indices(pattern, shard_index, num_shards)
+        for part, start in enumerate(range(0, len(indices), chunk_size)):
+            part_path = os.path.join(path, f"pattern-{pattern}-part-{part:05d}.npz")
+            tasks.append((part_path, pattern, indices[start:start + chunk_size]))
+
+    start_time = time.time()
+    parts = []
+    with Pool(processes) as pool:
+        for done, part in enumerate(pool.imap(_write_part, tasks), 1):
+            parts.append(part)
+            if done % 20 == 0 or done == len(tasks):
+                print(f"📦 Shard {shard_index + 1}/{num_shards}: {done:,}/{len(tasks):,} parts "
+                      f"({time.time() - start_time:.1f}s)")
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "shard_index": shard_index,
+        "num_shards": num_shards,
+        "patterns": patterns,
+        "evaluator_version": evaluator_version,
+        "columns": {name: np.dtype(dtype).name for name, dtype in COLUMN_DTYPES.items()},
+        "boards": sum(part["boards"] for part in parts),
+        "rows": sum(part["rows"] for part in parts),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": socket.gethostname(),
+        "seconds": round(time.time() - start_time, 3),
+        "parts": parts,
+    }
+    tmp_path = os.path.join(path, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+    print(f"✅ Wrote shard {shard_index + 1}/{num_shards}: {manifest['boards']:,} boards, "
+          f"{manifest['rows']:,} rows -> {path}")
+    return path
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"'{path}' has no {MANIFEST_FILE} (incomplete or not an artifact)")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format in '{path}'")
+    return manifest
+
+
+def validate_artifacts(paths, verify_checksums=True, check_rows=True):
+    """
+    Checks that a set of shard artifacts forms one complete evaluation.
+
+    Arguments:
+        paths: artifact directories.
+        verify_checksums: recompute the SHA-256 of every part.
+        check_rows: read the board_id columns and check 1,081 rows for every board.
+
+    Returns:
+        List of (path, manifest) sorted by shard index.
+
+    Raises:
+        ValueError describing the first problem found.
+    """
+    artifacts = sorted(((path, read_manifest(path)) for path in paths), key=lambda a: a[1]["shard_index"])
+    if not artifacts:
+        raise ValueError("No artifacts given")
+    first = artifacts[0][1]
+    for key in ("num_shards", "patterns", "evaluator_version", "columns"):
+        values = {json.dumps(manifest[key]) for _, manifest in artifacts}
+        if len(values) > 1:
+            raise ValueError(f"Artifacts disagree on {key}: {', '.join(sorted(values))}")
+
+    num_shards = first["num_shards"]
+    shard_indices = [manifest["shard_index"] for _, manifest in artifacts]
+    missing = sorted(set(range(num_shards)) - set(shard_indices))
+    if missing:
+        raise ValueError(f"Missing shards {[k + 1 for k in missing]} of {num_shards}")
+    if len(shard_indices) != num_shards:
+        raise ValueError(f"Duplicate shards in {shard_indices}")
+
+    for path, manifest in artifacts:
+        for pattern in manifest["patterns"]:
+            expected = len(shard_board_indices(pattern, manifest["shard_index"], num_shards))
+            boards = sum(part["boards"] for part in manifest["parts"] if part["pattern"] == pattern)
+            rows = sum(part["rows"] for part in manifest["parts"] if part["pattern"] == pattern)
+            if boards != expected or rows != boards * LIVE_HANDS:
+                raise ValueError(f"'{path}' has {boards:,} boards / {rows:,} rows for pattern {pattern}, "
+                                 f"expected {expected:,} / {expected * LIVE_HANDS:,}")
+        for part in manifest["parts"]:
+            part_path = os.path.join(path, part["file"])
+            if not os.path.exists(part_path):
+                raise ValueError(f"Missing part '{part_path}'")
+            if verify_checksums and file_sha256(part_path) != part["sha256"]:
+                raise ValueError(f"Checksum mismatch for '{part_path}'")
+
+    if check_rows:
+        row_counts = np.zeros(NUM_CANONICAL_BOARDS + 1, dtype=np.int64)
+        for path, manifest in artifacts:
+            for part in manifest["parts"]:
+                with np.load(os.path.join(path, part["file"])) as columns:
+                    row_counts += np.bincount(columns["board_id"], minlength=len(row_counts))
+        expected = np.zeros_like(row_counts)
+        for pattern in first["patterns"]:
+            offset = PatternBoards(pattern).offset
+            expected[offset + 1:offset + PATTERN_SIZES[pattern] + 1] = LIVE_HANDS
+        wrong = np.flatnonzero(row_counts != expected)
+        if len(wrong):
+            raise ValueError(f"{len(wrong):,} boards have wrong row counts, e.g. board_id {int(wrong[0])} "
+                             f"with {int(row_counts[wrong[0]])} rows")
+
+    total = sum(manifest["rows"] for _, manifest in artifacts)
+    print(f"✅ {num_shards} shards valid: patterns {first['patterns']}, {total:,} rows, "
+          f"evaluator_version {first['evaluator_version']}")
+    return artifacts
+
+
+def iter_artifact_columns(artifacts):
+    """
+    Yields the column dictionary of every part of validated artifacts.
+    """
+    for path, manifest in artifacts:
+        for part in manifest["parts"]:
+            with np.load(os.path.join(path, part["file"])) as columns:
+                yield {name: columns[name] for name in COLUMN_DTYPES}
+
+
+def load_artifacts(db, artifacts, truncate=True, instrumentation=None):
+    """
+    Bulk-loads validated artifacts into the evaluations table.
+
+    Arguments:
+        db: The evaluations database.
+        artifacts: result of validate_artifacts().
+        truncate: first clear the evaluations of the artifacts' suit patterns. Rows of
+            other patterns are kept, so patterns can be loaded one artifact set at a time.
+        instrumentation: optional Instrumentation passed on to the COPY.
+    """
+    evaluator_version = artifacts[0][1]["evaluator_version"]
+    patterns = artifacts[0][1]["patterns"]
+    db.ensure_evaluator_version_column()
+    if truncate and sorted(patterns) == list(range(len(BOARD_PATTERNS))):
+        db.truncate_table("evaluations")
+    elif truncate:
+        for pattern in patterns:
+            offset = PatternBoards(pattern).offset
+            db.delete_evaluations_between(offset + 1, offset + PATTERN_SIZES[pattern])
+    total = 0
+    for columns in iter_artifact_columns(artifacts):
+        rows = [
+            row + (evaluator_version,)
+            for row in zip(*(columns[name].tolist() for name in EVALUATION_COLUMNS))
+        ]
+        db.bulk_insert_evaluations(rows, instrumentation=instrumentation, columns=VERSIONED_EVALUATION_COLUMNS)
+        total += len(rows)
+    print(f"✅ Loaded {total:,} evaluations from {len(artifacts)} shards")
+    return total
+
+
+def concatenate_artifacts(artifacts, out_path):
+    """
+    Combines validated artifacts into one single-shard artifact (shard 1 of 1).
+    Part files are hard-linked where possible and copied otherwise.
+
+    Returns:
+        Path of the combined artifact.
+    """
+    os.makedirs(out_path, exist_ok=True)
+    # As in write_shard_artifact, the directory reads as incomplete until the new manifest is in place.
+    if os.path.exists(os.path.join(out_path, MANIFEST_FILE)):
+        os.remove(os.path.join(out_path, MANIFEST_FILE))
+    parts = []
+    for path, manifest in artifacts:
+        for part in manifest["parts"]:
+            name = f"shard-{manifest['shard_index'] + 1:03d}-{part['file']}"
+            target = os.path.join(out_path, name)
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(os.path.join(path, part["file"]), target)
+            except OSError:
+                shutil.copy2(os.path.join(path, part["file"]), target)
+            parts.append(dict(part, file=name))
+    parts.sort(key=lambda part: (part["pattern"], part["first_board_id"]))
+
+    first = artifacts[0][1]
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "shard_index": 0,
+        "num_shards": 1,
+        "patterns": first["patterns"],
+        "evaluator_version": first["evaluator_version"],
+        "columns": first["columns"],
+        "boards": sum(m["boards"] for _, m in artifacts),
+        "rows": sum(m["rows"] for _, m in artifacts),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": socket.gethostname(),
+        "merged_from": [os.path.basename(os.path.normpath(path)) for path, _ in artifacts],
+        "parts": parts,
+    }
+    tmp_path = os.path.join(out_path, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_path, MANIFEST_FILE))
+    print(f"✅ Concatenated {len(artifacts)} shards ({manifest['rows']:,} rows) -> {out_path}")
+    return out_path
+
+
+def merge_artifacts(paths, db=None, out_path=None, verify_checksums=True):
+    """
+    Validates shard artifacts, then bulk-loads them into db and/or concatenates them into out_path.
+
+    Returns:
+        The validated (path, manifest) list.
+    """
+    artifacts = validate_artifacts(paths, verify_checksums=verify_checksums)
+    if out_path is not None:
+        concatenate_artifacts(artifacts, out_path)
+    if db is not None:
+        load_artifacts(db, artifacts)
+    return artifacts
+
+
+def run_local_shards(num_shards, out_dir, patterns=None, processes=1):
+    """
+    Runs every shard as a separate db_operations process on this machine, then
+    validates the artifacts.
+
+    Returns:
+        The validated (path, manifest) list.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_operations.py")
+    commands = []
+    for shard_index in range(num_shards):
+        command = [sys.executable, script, "--shard", str(shard_index), "--num-shards", str(num_shards),
+                   "--artifact-dir", out_dir, "--processes", str(processes)]
+        if patterns is not None:
+            command += ["--patterns", *map(str, patterns)]
+        commands.append(command)
+
+    start_time = time.time()
+    running = [subprocess.Popen(command) for command in commands]
+    failed = [k + 1 for k, process in enumerate(running) if process.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shards {failed} of {num_shards} failed")
+    print(f"🏁 {num_shards} local shards finished in {time.time() - start_time:.1f}s")
+    return validate_artifacts([os.path.join(out_dir, artifact_name(k, num_shards)) for k in range(num_shards)])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Validate, load or concatenate sharded evaluation artifacts.")
+    parser.add_argument("artifacts", nargs="*", help="Artifact directories (one per shard).")
+    parser.add_argument("--load", action="store_true", help="Bulk-load the artifacts into the evaluations table.")
+    parser.add_argument("--concat", default=None, metavar="DIR",
+                        help="Concatenate the artifacts into one artifact directory.")
+    parser.add_argument("--no-checksums", action="store_true", help="Skip SHA-256 verification.")
+    parser.add_argument("--local", type=int, default=None, metavar="N",
+                        help="Run N shards as local processes into --out first.")
+    parser.add_argument("--out", default="evaluation_shards", help="Output directory of --local.")
+    parser.add_argument("--patterns", type=int, nargs="+", default=None, help="Suit patterns for --local.")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes per local shard.")
+    args = parser.parse_args()
+
+    if args.local is not None:
+        artifacts = run_local_shards(args.local, args.out, args.patterns, args.processes)
+    else:
+        artifacts = validate_artifacts(args.artifacts, verify_checksums=not args.no_checksums)
+
+    if args.concat is not None:
+        concatenate_artifacts(artifacts, args.concat)
+    if args.load:
+        from db import open_db
+        db = open_db()
+        load_artifacts(db, artifacts)
+        db.close()
+
+    # run_local_shards(4, "/tmp/evaluation_shards", patterns=[0])
+
+
+if __name__ == "__main__":
+    main()
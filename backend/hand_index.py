@@ -0,0 +1,127 @@
+"""
+Integer encodings of cards and two-card hands shared by the vectorized modules.
+
+Cards are indexed 0..51 in Deck order (rank '2'..'A', suit 's', 'h', 'd', 'c'),
+so card = rank * 4 + suit. Hands are indexed 0..1325 in the order produced by
+db_operations.generate_hands(), which is also the insertion order of the hands
+table (hand_id = hand index + 1 after a fresh create_hands_table).
+"""
+import numpy as np
+from itertools import combinations, permutations
+
+from db import get_suitedness
+from deck import RANKS, SUITS
+
+NUM_CARDS = 52
+NUM_HANDS = 1326
+NUM_SUITS = 4
+
+DECK_CARDS = [r + s for r in RANKS for s in SUITS]
+CARD_INDEX = {card: i for i, card in enumerate(DECK_CARDS)}
+
+# phevaluator numbers suits c, d, h, s = 0..3, the reverse of our s, h, d, c.
+CARD_TO_PHEVAL = np.array([(c // 4) * 4 + (3 - c % 4) for c in range(NUM_CARDS)], dtype=np.int32)
+
+CARD_RANK = np.arange(NUM_CARDS, dtype=np.int8) // 4
+CARD_SUIT = np.arange(NUM_CARDS, dtype=np.int8) % 4
+
+
+def card_str(card):
+    return DECK_CARDS[card]
+
+
+def cards_from_str(cards_str):
+    """
+    Converts a concatenated card string (e.g. "AsKsQsJhTh") to a list of card indices.
+    """
+    if len(cards_str) % 2:
+        raise ValueError(f"Invalid card string '{cards_str}'")
+    try:
+        return [CARD_INDEX[cards_str[i:i+2]] for i in range(0, len(cards_str), 2)]
+    except KeyError as e:
+        raise ValueError(f"Invalid card {e.args[0]} in '{cards_str}'") from None
+
+
+def _build_hands():
+    hand_cards = np.array(list(combinations(range(NUM_CARDS), 2)), dtype=np.int8)
+    # generate_hands() writes cards in card_sort_key order: higher rank first,
+    # then suits in s, h, d, c order for pairs.
+    hand_strs = [
+        DECK_CARDS[c1] + DECK_CARDS[c2] if c1 // 4 == c2 // 4 else DECK_CARDS[c2] + DECK_CARDS[c1]
+        for c1, c2 in hand_cards
+    ]
+    return hand_cards, hand_strs
+
+
+HAND_CARDS, HAND_STRS = _build_hands()
+HAND_INDEX = {hand_str: i for i, hand_str in enumerate(HAND_STRS)}
+HAND_MASKS = (np.uint64(1) << HAND_CARDS[:, 0].astype(np.uint64)) | (np.uint64(1) << HAND_CARDS[:, 1].astype(np.uint64))
+
+HAND_PAIR_INDEX = np.full((NUM_CARDS, NUM_CARDS), -1, dtype=np.int16)
+HAND_PAIR_INDEX[HAND_CARDS[:, 0], HAND_CARDS[:, 1]] = np.arange(NUM_HANDS)
+HAND_PAIR_INDEX[HAND_CARDS[:, 1], HAND_CARDS[:, 0]] = np.arange(NUM_HANDS)
+
+# Hands blocked by each card: CARD_HANDS[c] lists the 51 hands containing card c.
+CARD_HANDS = np.array([np.flatnonzero((HAND_CARDS == c).any(axis=1)) for c in range(NUM_CARDS)], dtype=np.int16)
+
+
+def hand_index(hand_str):
+    """
+    Returns the hand index for a four character hand string in either card order.
+    """
+    c1, c2 = cards_from_str(hand_str)
+    if c1 == c2 or len(hand_str) != 4:
+        raise ValueError(f"Invalid hand '{hand_str}'")
+    return int(HAND_PAIR_INDEX[c1, c2])
+
+
+def cards_mask(cards):
+    """
+    Returns the 52-bit mask of a list of card indices.
+    """
+    mask = 0
+    for c in cards:
+        mask |= 1 << int(c)
+    return np.uint64(mask)
+
+
+# Suit isomorphisms. SUIT_PERMUTATIONS[p][s] is the suit that suit s maps to.
+SUIT_PERMUTATIONS = list(permutations(range(NUM_SUITS)))
+NUM_PERMUTATIONS = len(SUIT_PERMUTATIONS)
+PERMUTATION_INDEX = {perm: i for i, perm in enumerate(SUIT_PERMUTATIONS)}
+
+CARD_PERM = np.array(
+    [[(c // 4) * 4 + perm[c % 4] for c in range(NUM_CARDS)] for perm in SUIT_PERMUTATIONS],
+    dtype=np.int8,
+)
+HAND_PERM = HAND_PAIR_INDEX[CARD_PERM[:, HAND_CARDS[:, 0]], CARD_PERM[:, HAND_CARDS[:, 1]]]
+
+
+# The 169 preflop classes, in the order create_rank_chart_data walks the 13x13 grid.
+def _build_classes():
+    classes = []
+    for idx1, card1 in enumerate(RANKS):
+        for idx2, card2 in enumerate(RANKS):
+            if idx1 > idx2:
+                classes.append(f"{card1}{card2}s")
+            elif idx2 > idx1:
+                classes.append(f"{card2}{card1}o")
+            else:
+                classes.append(f"{card1}{card2}")
+    return classes
+
+
+HAND_CLASSES = _build_classes()
+NUM_CLASSES = len(HAND_CLASSES)
+CLASS_INDEX = {hand_class: i for i, hand_class in enumerate(HAND_CLASSES)}
+HAND_CLASS = np.array([CLASS_INDEX[get_suitedness(hand_str)] for hand_str in HAND_STRS], dtype=np.int16)
+CLASS_HANDS = [np.flatnonzero(HAND_CLASS == k) for k in range(NUM_CLASSES)]
+
+
+def class_hands(hand_class):
+    """
+    Returns the hand indices belonging to a preflop class such as 'AKs', 'AKo' or '77'.
+    """
+    if hand_class not in CLASS_INDEX:
+        raise ValueError(f"Unknown hand class '{hand_class}'")
+    return CLASS_HANDS[CLASS_INDEX[hand_class]]
@@ -0,0 +1,179 @@
+"""
+Per-board hand order for top-N and nut queries.
+
+The order table is a (331,682 x 1,081) int16 array holding, for every canonical
+board, the indices of its live hands sorted by hand value (strongest first).
+Together with the rank table, whose [rank_min, rank_max] positions are the
+tie-group boundaries of every hand in that order, it answers per-board queries
+without fetching or sorting the board's 1,081 rows:
+
+    top_hands("AsKsQsJhTh", 20)     the 20 best hands
+    hands_beating(board, "AhAd")    count of hands that beat a hand (O(1))
+    dense_rank(board, hand)         position among the distinct hand values
+    is_nuts(board, hand)            no hand beats it
+    tied_hands(board, hand)         the hand's tie group
+
+Actual boards are read through the canonical board map; hand indices are mapped
+into and out of the canonical suit frame with the board's suit permutation.
+"""
+import os
+import time
+import numpy as np
+from functools import lru_cache
+
+from board_index import CACHE_DIR, NUM_CANONICAL_BOARDS, colex_index, get_canonical_map
+from hand_index import (
+    HAND_PERM, HAND_STRS, PERMUTATION_INDEX, SUIT_PERMUTATIONS, cards_from_str, hand_index,
+)
+from rank_table import LIVE_HANDS, load_rank_table
+from value_table import load_value_table
+
+ORDER_TABLE_FILE = "order_table.npy"
+ORDER_DTYPE = np.int16
+
+# INVERSE_PERMUTATION[p] undoes suit permutation p.
+INVERSE_PERMUTATION = np.array(
+    [PERMUTATION_INDEX[tuple(int(s) for s in np.argsort(perm))] for perm in SUIT_PERMUTATIONS], dtype=np.int8,
+)
+
+
+def order_table_path():
+    return os.path.join(CACHE_DIR, ORDER_TABLE_FILE)
+
+
+def build_order_table(path=None, chunk_size=4096):
+    """
+    Sorts the live hands of every canonical board by value and saves the result.
+
+    Returns:
+        The memory-mapped order table.
+    """
+    path = path or order_table_path()
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    values_table = load_value_table()
+    table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=ORDER_DTYPE, shape=(NUM_CANONICAL_BOARDS, LIVE_HANDS))
+
+    start_time = time.time()
+    for start in range(0, NUM_CANONICAL_BOARDS, chunk_size):
+        stop = min(start + chunk_size, NUM_CANONICAL_BOARDS)
+        # Blocked hands hold the largest value and sort after the 1,081 live hands.
+        table[start:stop] = np.argsort(values_table[start:stop], axis=1, kind="stable")[:, :LIVE_HANDS]
+        if (start // chunk_size) % 20 == 19 or stop == NUM_CANONICAL_BOARDS:
+            print(f"📶 Sorted {stop:,}/{NUM_CANONICAL_BOARDS:,} boards ({time.time() - start_time:.1f}s)")
+
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+    print(f"✅ Saved order table -> {path}")
+    load_order_table.cache_clear()
+    return load_order_table(path)
+
+
+@lru_cache(maxsize=None)
+def load_order_table(path=None, build=True):
+    """
+    Returns the memory-mapped order table, building it first if needed.
+    """
+    path = path or order_table_path()
+    if not os.path.exists(path):
+        if not build:
+            raise FileNotFoundError(f"Order table '{path}' not found. Run build_order_table() first.")
+        return build_order_table(path)
+    return np.load(path, mmap_mode="r")
+
+
+def _board(board):
+    """
+    Returns (canonical row, suit permutation) of a board string or card indices.
+    """
+    cards = cards_from_str(board) if isinstance(board, str) else [int(c) for c in board]
+    if len(cards) != 5 or len(set(cards)) != 5:
+        raise ValueError(f"Expected five distinct board cards, got '{board}'")
+    rows, perms = get_canonical_map()
+    b = colex_index(cards)
+    return int(rows[b]), int(perms[b])
+
+
+def _hand(hand):
+    return hand_index(hand) if isinstance(hand, str) else int(hand)
+
+
+def _positions(board, hand, build=True):
+    row, perm = _board(board)
+    h = _hand(hand)
+    positions = load_rank_table(build=build)[0][row, HAND_PERM[perm, h]]
+    if positions[0] < 0:
+        raise ValueError(f"Hand '{HAND_STRS[h]}' shares a card with the board")
+    return row, perm, positions
+
+
+def top_hands(board, n=20, build=True):
+    """
+    Returns the n strongest hands on a board.
+
+    Arguments:
+        board: board string ("AsKsQsJhTh") or five card indices.
+        n: number of hands (at least 1; at most 1,081 are returned).
+        build: build missing tables; with False a missing table raises FileNotFoundError.
+
+    Returns:
+        List of dictionaries with the hand, its value, the number of hands beating
+        it and its dense rank (0 = nuts), strongest first.
+    """
+    if n < 1:
+        raise ValueError(f"Expected at least one hand, got n={n}")
+    row, perm = _board(board)
+    canonical = load_order_table(build=build)[row, :min(n, LIVE_HANDS)].astype(np.int64)
+    positions = load_rank_table(build=build)[0][row, canonical]
+    values = load_value_table(build=build)[row, canonical]
+    hands = HAND_PERM[INVERSE_PERMUTATION[perm], canonical]
+    # Order ties by actual hand index, so the result does not depend on the canonical frame.
+    order = np.lexsort((hands, positions[:, 0]))
+    return [
+        {"hand": HAND_STRS[hands[i]], "value": int(values[i]), "beaten_by": int(positions[i, 0]),
+         "dense_rank": int(positions[i, 2])}
+        for i in order
+    ]
+
+
+def hands_beating(board, hand, build=True):
+    """
+    Returns the number of hands that beat a hand on a board.
+    """
+    return int(_positions(board, hand, build)[2][0])
+
+
+def dense_rank(board, hand, build=True):
+    """
+    Returns the hand's position among the distinct hand values on the board (0 = nuts).
+    """
+    return int(_positions(board, hand, build)[2][2])
+
+
+def is_nuts(board, hand):
+    """
+    Returns whether no hand beats the hand on the board (ties included).
+    """
+    return hands_beating(board, hand) == 0
+
+
+def tied_hands(board, hand):
+    """
+    Returns the hands with exactly the same value as the hand, itself included.
+    """
+    row, perm, positions = _positions(board, hand)
+    canonical = load_order_table()[row, positions[0]:positions[1] + 1].astype(np.int64)
+    return sorted((HAND_STRS[h] for h in HAND_PERM[INVERSE_PERMUTATION[perm], canonical]), key=hand_index)
+
+
+def main():
+
+    load_order_table()
+    for entry in top_hands("AsKsQsJhTh", 10):
+        print(entry)
+
+    # print(hands_beating("AsKsQsJhTh", "9h8h"), is_nuts("AsKsQsJhTh", "JsTs"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Hand potential (PPot / NPot) and effective hand strength on flops and turns.
+
+Each opponent hand is classified once as ahead of, tied with or behind the hero
+on the partial board. The hero and the opponent are then compared again on every
+turn/river runout. The comparisons are vectorized over all opponent hands (and
+over all hero hands in bulk mode), using river values from the value table. The
+counts form the 3 x 3 matrix HP[current][final] of Billings et al., from which
+
+    HS   = (ahead + tied / 2) / (ahead + tied + behind)          now
+    PPot = (HP[behind][ahead] + HP[behind][tied] / 2 + HP[tied][ahead] / 2)
+           / (HPTotal[behind] + HPTotal[tied])
+    NPot = (HP[ahead][behind] + HP[tied][behind] / 2 + HP[ahead][tied] / 2)
+           / (HPTotal[ahead] + HPTotal[tied])
+    EHS  = HS * (1 - NPot) + (1 - HS) * PPot
+
+against one uniformly random opponent hand. Runouts that collide with either hand
+are left out of that pair's counts.
+
+The metrics of every hand on the 1,755 canonical flops can be precomputed in
+parallel into a compact uint16 table (build_flop_potential_table) and read back
+instantly (lookup_flop_potential).
+"""
+import os
+import time
+import numpy as np
+from functools import lru_cache
+from multiprocessing import Pool
+from phevaluator import evaluate_cards
+
+from board_index import CACHE_DIR, get_canonical_map
+from hand_index import CARD_TO_PHEVAL, HAND_CARDS, HAND_MASKS, HAND_PERM, NUM_HANDS, cards_mask
+from runout_distribution import FLOP_SIZE, _flop_indices, _to_cards, _to_hand, get_flop_map, runout_boards
+from value_table import BLOCKED_VALUE, VALUE_DTYPE, load_value_table, value_table_path
+
+AHEAD, TIED, BEHIND = 0, 1, 2
+POTENTIAL_METRICS = ("hs", "ppot", "npot", "ehs")
+POTENTIAL_TABLE_FILE = "flop_potential.npy"
+POTENTIAL_TABLE_DTYPE = np.uint16
+POTENTIAL_TABLE_SCALE = np.iinfo(POTENTIAL_TABLE_DTYPE).max
+
+_HAND_PHEVAL = [(int(CARD_TO_PHEVAL[c1]), int(CARD_TO_PHEVAL[c2])) for c1, c2 in HAND_CARDS]
+
+
+def current_values(board):
+    """
+    Evaluates all 1,326 hands on a partial board (3 or 4 cards).
+
+    Returns:
+        int16 array of hand values indexed by hand index, BLOCKED_VALUE where the
+        hand shares a card with the board.
+    """
+    cards = _to_cards(board)
+    board_pheval = [int(CARD_TO_PHEVAL[c]) for c in cards]
+    live = np.flatnonzero((HAND_MASKS & cards_mask(cards)) == 0)
+    values = np.full(NUM_HANDS, BLOCKED_VALUE, dtype=VALUE_DTYPE)
+    values[live] = [evaluate_cards(*_HAND_PHEVAL[h], *board_pheval) for h in live]
+    return values
+
+
+def runout_values(board, table=None):
+    """
+    River values of all hands on every runout of a partial board.
+
+    Returns:
+        (runouts, 1326) int16 array, BLOCKED_VALUE where a hand collides with the river board.
+    """
+    table = load_value_table() if table is None else table
+    boards, _ = runout_boards(board)
+    rows, perms = get_canonical_map()
+    return table[rows[boards][:, None], HAND_PERM[perms[boards]]]
+
+
+def potential_counts(board, heroes, table=None, chunk_size=8):
+    """
+    Counts the HP[current][final] transitions of hero hands against all opponent hands.
+
+    Arguments:
+        board: 3 or 4 cards, as a string ("AhKd7c") or card indices.
+        heroes: array of hero hand indices.
+        table: optional preloaded value table.
+        chunk_size: runouts compared at a time.
+
+    Returns:
+        (heroes, 3, 3) float64 counts over (opponent, runout) pairs, indexed by the
+        AHEAD / TIED / BEHIND state on the partial board and on the river. Heroes that
+        share a card with the board have all-zero counts.
+    """
+    heroes = np.asarray(heroes, dtype=np.int64)
+    current = current_values(board).astype(np.int64)
+    river = runout_values(board, table)
+    hero_river = river[:, heroes]
+
+    # Count every hero-opponent pair's river wins and ties over all runouts, blocked ones included.
+    # With every hand as hero, the ties follow from the wins in both directions.
+    all_heroes = np.array_equal(heroes, np.arange(NUM_HANDS))
+    wins = np.zeros((len(heroes), NUM_HANDS), dtype=np.int64)
+    ties = np.zeros((len(heroes), NUM_HANDS), dtype=np.int64)
+    for start in range(0, len(river), chunk_size):
+        hero_values = hero_river[start:start + chunk_size, :, None]
+        opponent_values = river[start:start + chunk_size, None, :]
+        # Lower hand values are stronger.
+        wins += np.count_nonzero(hero_values < opponent_values, axis=0)
+        if not all_heroes:
+            ties += np.count_nonzero(hero_values == opponent_values, axis=0)
+    if all_heroes:
+        ties = len(river) - wins - wins.T
+
+    # A runout that blocks only the opponent counted as a win and one that blocks both as
+    # a tie; one that blocks only the hero counted as neither.
+    blocked = (river == BLOCKED_VALUE).astype(np.float32)
+    blocked_total = blocked.sum(axis=0).astype(np.int64)
+    both_blocked = np.rint(blocked[:, heroes].T @ blocked).astype(np.int64)
+    wins -= blocked_total[None, :] - both_blocked
+    ties -= both_blocked
+    valid = len(river) - blocked_total[heroes][:, None] - blocked_total[None, :] + both_blocked
+    final = np.stack([wins, ties, valid - wins - ties])
+
+    hero_current = current[heroes][:, None]
+    opponents = ((HAND_MASKS[heroes][:, None] & HAND_MASKS[None, :]) == 0) & (current[None, :] != BLOCKED_VALUE)
+    opponents &= hero_current != BLOCKED_VALUE
+    states = [hero_current < current[None, :], hero_current == current[None, :], hero_current > current[None, :]]
+
+    counts = np.zeros((len(heroes), 3, 3))
+    for state, state_mask in enumerate(states):
+        mask = state_mask & opponents
+        for outcome in (AHEAD, TIED, BEHIND):
+            counts[:, state, outcome] = (final[outcome] * mask).sum(axis=1)
+    return counts
+
+
+def potential_metrics(counts):
+    """
+    Computes HS, PPot, NPot and EHS from HP[current][final] counts.
+
+    Arguments:
+        counts: (..., 3, 3) array from potential_counts().
+
+    Returns:
+        Dictionary of metric name -> array shaped like counts[..., 0, 0]. Undefined
+        ratios (no opponents in the relevant states) are 0.
+    """
+    def ratio(numerator, denominator):
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+    totals = counts.sum(axis=-1)
+    hs = ratio(totals[..., AHEAD] + totals[..., TIED] / 2, totals.sum(axis=-1))
+    ppot = ratio(counts[..., BEHIND, AHEAD] + counts[..., BEHIND, TIED] / 2 + counts[..., TIED, AHEAD] / 2,
+                 totals[..., BEHIND] + totals[..., TIED])
+    npot = ratio(counts[..., AHEAD, BEHIND] + counts[..., TIED, BEHIND] / 2 + counts[..., AHEAD, TIED] / 2,
+                 totals[..., AHEAD] + totals[..., TIED])
+    ehs = hs * (1 - npot) + (1 - hs) * ppot
+    return {"hs": hs, "ppot": ppot, "npot": npot, "ehs": ehs}
+
+
+def hand_potential(board, hand, table=None):
+    """
+    HS, PPot, NPot and EHS of a hand on a flop or turn.
+
+    Arguments:
+        board: 3 or 4 cards, as a string ("AhKd7c") or card indices.
+        hand: hand string or hand index; must not share a card with the board.
+        table: optional preloaded value table.
+
+    Returns:
+        Dictionary with the four metrics and the HP[current][final] counts.
+    """
+    hand = _to_hand(hand)
+    if HAND_MASKS[hand] & cards_mask(_to_cards(board)):
+        raise ValueError("Hand shares a card with the board")
+    counts = potential_counts(board, np.array([hand]), table=table)[0]
+    result = {name: float(value) for name, value in potential_metrics(counts).items()}
+    result["counts"] = counts.astype(np.int64).tolist()
+    return result
+
+
+# Canonical flops
+def potential_table_path():
+    return os.path.join(CACHE_DIR, POTENTIAL_TABLE_FILE)
+
+
+_worker_table = None
+
+
+def _init_worker(table_path):
+    global _worker_table
+    _worker_table = load_value_table(table_path, build=False)
+
+
+def _flop_potential(args):
+    row, flop = args
+    metrics = potential_metrics(potential_counts(flop, np.arange(NUM_HANDS), table=_worker_table))
+    stacked = np.stack([metrics[name] for name in POTENTIAL_METRICS], axis=1)
+    return row, np.rint(stacked * POTENTIAL_TABLE_SCALE).astype(POTENTIAL_TABLE_DTYPE)
+
+
+def build_flop_potential_table(path=None, processes=None, table_path=None):
+    """
+    Precomputes HS, PPot, NPot and EHS of every hand on every canonical flop.
+
+    Arguments:
+        path: output .npy file. Defaults to cache/flop_potential.npy.
+        processes: worker processes (default: all cores).
+        table_path: value table location.
+
+    Returns:
+        The (1755, 1326, 4) uint16 table in POTENTIAL_METRICS order, memory-mapped
+        read-only. Values are scaled by 65,535; hands blocked by the flop are all zero.
+    """
+    path = path or potential_table_path()
+    table_path = table_path or value_table_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+
+    load_value_table(table_path)  # make sure the value table exists before forking
+    get_canonical_map()
+    canonical_flops, _, _ = get_flop_map()
+    table = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=POTENTIAL_TABLE_DTYPE,
+        shape=(len(canonical_flops), NUM_HANDS, len(POTENTIAL_METRICS)),
+    )
+    tasks = list(enumerate(canonical_flops))
+
+    start_time = time.time()
+    with Pool(processes, initializer=_init_worker, initargs=(table_path,)) as pool:
+        for done, (row, metrics) in enumerate(pool.imap_unordered(_flop_potential, tasks), 1):
+            table[row] = metrics
+            if done % 25 == 0 or done == len(tasks):
+                print(f"🎲 {done:,}/{len(tasks):,} flops ({time.time() - start_time:.1f}s)")
+
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+    print(f"✅ Saved flop hand potentials -> {path}")
+    load_flop_potential_table.cache_clear()
+    return load_flop_potential_table(path)
+
+
+@lru_cache(maxsize=None)
+def load_flop_potential_table(path=None, build=True):
+    """
+    Returns the memory-mapped flop potential table, building it first if needed.
+    """
+    path = path or potential_table_path()
+    if not os.path.exists(path):
+        if not build:
+            raise FileNotFoundError(f"Flop potential table '{path}' not found. Run build_flop_potential_table() first.")
+        return build_flop_potential_table(path)
+    return np.load(path, mmap_mode="r")
+
+
+def lookup_flop_potential(flop, hand, table=None):
+    """
+    Reads a hand's precomputed HS, PPot, NPot and EHS on a flop.
+
+    Arguments:
+        flop: 3 cards, as a string ("AhKd7c") or card indices.
+        hand: hand string or hand index.
+        table: optional preloaded flop potential table.
+
+    Returns:
+        Dictionary of metric name -> value.
+    """
+    cards = _to_cards(flop)
+    if len(cards) != FLOP_SIZE:
+        raise ValueError("Precomputed potentials only exist for flops; use hand_potential() for turns")
+    hand = _to_hand(hand)
+    if HAND_MASKS[hand] & cards_mask(cards):
+        raise ValueError("Hand shares a card with the board")
+
+    table = load_flop_potential_table() if table is None else table
+    _, rows, perms = get_flop_map()
+    flop_index = int(_flop_indices(cards))
+    values = table[rows[flop_index], HAND_PERM[perms[flop_index], hand]] / POTENTIAL_TABLE_SCALE
+    return dict(zip(POTENTIAL_METRICS, values.tolist()))
+
+
+def main():
+
+    print(hand_potential("AhKd7c", "QsJs"))
+    print(hand_potential("AhKd7c2s", "QsJs"))
+    # build_flop_potential_table()
+    # print(lookup_flop_potential("AhKd7c", "QsJs"))
+
+
+if __name__ == "__main__":
+    main()
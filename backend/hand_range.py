@@ -0,0 +1,236 @@
+"""
+Hand ranges in standard notation, compiled to weight vectors over the 1,326 hands.
+
+    compile_range("AJs+, 77+, KQo, A5s-A2s, AhKd, T9s:0.5")
+
+Supported tokens (comma separated, optional ":weight" suffix, default 1):
+    77, AKs, AKo, AK          pairs and classes (AK = suited and offsuit)
+    77+, AJs+, KTo+, QT+      pairs up to AA, or kicker up to one below the top card
+    22-55, A5s-A2s, K9o-K6o   spans of pairs or of kickers with the same top card
+    AhKd                      a single hand
+    any                       all 1,326 hands
+
+A HandRange holds the weights plus the 1,326-bit mask of the hands in it; union,
+intersection, subtraction and dead-card removal are vectorized operations on them.
+"""
+import re
+import numpy as np
+from functools import lru_cache
+
+from deck import RANKS
+from hand_index import (
+    CLASS_INDEX, HAND_CLASS, HAND_MASKS, HAND_STRS, NUM_HANDS, cards_from_str, cards_mask, class_hands, hand_index,
+)
+
+_TOKEN = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)$")
+_SPAN = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([so]?)-([2-9TJQKA])([2-9TJQKA])([so]?)$")
+
+
+class HandRange:
+    """
+    Immutable weighted hand range.
+
+    Arguments:
+        weights: 1,326 hand weights (0 = not in the range).
+    """
+    __slots__ = ['weights', '_mask']
+
+    def __init__(self, weights):
+        weights = np.array(weights, dtype=np.float64)
+        if weights.shape != (NUM_HANDS,):
+            raise ValueError(f"Weight vector must have {NUM_HANDS} entries, got shape {weights.shape}")
+        weights.flags.writeable = False
+        self.weights = weights
+        self._mask = None
+
+    @property
+    def mask(self):
+        """
+        Boolean mask of the hands in the range.
+        """
+        if self._mask is None:
+            self._mask = self.weights > 0
+            self._mask.flags.writeable = False
+        return self._mask
+
+    @property
+    def bits(self):
+        """
+        The range as a packed 1,326-bit bitset (166 bytes).
+        """
+        return np.packbits(self.mask)
+
+    @property
+    def hands(self):
+        """
+        Hand indices in the range.
+        """
+        return np.flatnonzero(self.mask)
+
+    @property
+    def combos(self):
+        """
+        Weighted number of hand combinations.
+        """
+        return float(self.weights.sum())
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+    def __contains__(self, hand_str):
+        return bool(self.mask[hand_index(hand_str)])
+
+    def __eq__(self, other):
+        return isinstance(other, HandRange) and np.array_equal(self.weights, other.weights)
+
+    def __hash__(self):
+        return hash(self.weights.tobytes())
+
+    def __repr__(self):
+        return f"HandRange({len(self)} hands, {self.combos:g} combos)"
+
+    # Range algebra
+    def union(self, other):
+        """
+        Hands in either range, with the larger weight.
+        """
+        return HandRange(np.maximum(self.weights, as_range(other).weights))
+
+    def intersection(self, other):
+        """
+        Hands in both ranges, with the smaller weight.
+        """
+        return HandRange(np.minimum(self.weights, as_range(other).weights))
+
+    def difference(self, other):
+        """
+        Hands of this range that are not in other.
+        """
+        return HandRange(np.where(as_range(other).mask, 0.0, self.weights))
+
+    def scaled(self, factor):
+        return HandRange(self.weights * factor)
+
+    def without_cards(self, cards):
+        """
+        Removes every hand containing a dead card.
+
+        Arguments:
+            cards: card string ("AhKd7c") or card indices.
+        """
+        cards = cards_from_str(cards) if isinstance(cards, str) else cards
+        return HandRange(np.where(HAND_MASKS & cards_mask(cards), 0.0, self.weights))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def hand_strs(self):
+        return [HAND_STRS[h] for h in self.hands]
+
+    def class_weights(self):
+        """
+        Returns dict of hand class -> total weight in the range.
+        """
+        totals = np.bincount(HAND_CLASS, weights=self.weights, minlength=len(CLASS_INDEX))
+        return {hand_class: float(totals[k]) for hand_class, k in CLASS_INDEX.items() if totals[k] > 0}
+
+
+def _rank(char):
+    return RANKS.index(char)
+
+
+def _classes(high, low, suit):
+    """
+    Class names of two ranks: the pair, or the suited and/or offsuit classes.
+    """
+    if high == low:
+        return [RANKS[high] * 2]
+    high, low = max(high, low), min(high, low)
+    suits = [suit] if suit else ["s", "o"]
+    return [f"{RANKS[high]}{RANKS[low]}{s}" for s in suits]
+
+
+def token_classes(token):
+    """
+    Expands one notation token (without weight) into hand classes.
+    """
+    match = _TOKEN.match(token)
+    if match:
+        high, low, suit, plus = _rank(match[1]), _rank(match[2]), match[3], match[4]
+        if high == low:
+            if suit:
+                raise ValueError(f"Pairs cannot be suited or offsuit: '{token}'")
+            return [RANKS[r] * 2 for r in range(high, len(RANKS))] if plus else _classes(high, low, "")
+        high, low = max(high, low), min(high, low)
+        if not plus:
+            return _classes(high, low, suit)
+        return [c for kicker in range(low, high) for c in _classes(high, kicker, suit)]
+
+    match = _SPAN.match(token)
+    if match:
+        a1, a2, s1, b1, b2, s2 = _rank(match[1]), _rank(match[2]), match[3], _rank(match[4]), _rank(match[5]), match[6]
+        if s1 != s2:
+            raise ValueError(f"Mismatched suitedness in '{token}'")
+        if a1 == a2 and b1 == b2:
+            return [RANKS[r] * 2 for r in range(min(a1, b1), max(a1, b1) + 1)]
+        if a1 == b1 and a2 != a1 and b2 != b1:
+            low, high = sorted((a2, b2))
+            if high >= a1:
+                raise ValueError(f"Kicker span must stay below the top card: '{token}'")
+            return [c for kicker in range(low, high + 1) for c in _classes(a1, kicker, s1)]
+        raise ValueError(f"Spans need two pairs or a shared top card: '{token}'")
+
+    raise ValueError(f"Invalid range token '{token}'")
+
+
+def parse_range(notation):
+    """
+    Parses range notation into a weight vector.
+
+    Arguments:
+        notation: e.g. "AJs+, 77+, KQo, A5s-A2s, AhKd:0.5".
+
+    Returns:
+        float64 array of 1,326 hand weights. Later tokens overwrite the weights of earlier ones.
+    """
+    weights = np.zeros(NUM_HANDS)
+    for token in filter(None, (part.strip() for part in notation.split(","))):
+        token, _, weight = token.partition(":")
+        token = token.strip()
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight in '{token}:{weight}'") from None
+        if weight < 0:
+            raise ValueError(f"Negative weight in '{token}'")
+
+        if token.lower() in ("any", "random"):
+            weights[:] = weight
+        elif len(token) == 4 and token[1] in "shdc":
+            weights[hand_index(token)] = weight
+        else:
+            for hand_class in token_classes(token):
+                weights[class_hands(hand_class)] = weight
+    return weights
+
+
+@lru_cache(maxsize=1024)
+def compile_range(notation):
+    """
+    Returns the HandRange of a range notation (memoized).
+    """
+    return HandRange(parse_range(notation))
+
+
+def as_range(hand_range):
+    """
+    Converts notation strings, HandRange objects or anything accepted by
+    range_equity.range_weights to a HandRange.
+    """
+    if isinstance(hand_range, HandRange):
+        return hand_range
+    if isinstance(hand_range, str):
+        return compile_range(hand_range)
+    from range_equity import range_weights
+    return HandRange(range_weights(hand_range))
@@ -4,7 +4,7 @@ import matplotlib.pyplot as plt
 # import json
 # import os
 
-from itertools import combinations, product, permutations, count
+from itertools import combinations
 from phevaluator import evaluate_cards
 from collections import defaultdict
 
@@ -13,32 +13,20 @@ from deck import Deck
 from hand import Hand
 from board import Board
 from db import DB, open_db
+from board_index import BOARD_PATTERNS, PatternBoards
+from instrumentation import Instrumentation
 
 # SUITS = ['s', 'h', 'd', 'c']
 # RANKS = []
-# BOARD_PATTERNS = [[5, 0, 0, 0], [4, 1, 0, 0]]
-BOARD_PATTERNS = [[5, 0, 0, 0], [4, 1, 0, 0], [3, 2, 0, 0], [3, 1, 1, 0], [2, 1, 1, 1], [2, 2, 1, 0]]
 
 # CONFIG_FILE = "config.json"
 
-def generate_boards_by_suit_distribution(deck, suit_counts):
+def generate_boards_by_suit_distribution(suit_counts):
     """
     Generates canonical list of boards based on number of cards of each suit.
     Returns a list of board strings (e.g., "AsKsQsJhTh").
     """
-
-    assert sum(suit_counts) == 5
-    assert len(suit_counts) == 4
-
-    suit_to_cards = {suit: [card for card in deck if card.suit == suit] for suit in SUITS}
-
-    suit_combos = [list(combinations(suit_to_cards[suit], count)) for suit, count in zip(SUITS, suit_counts) if count > 0]
-
-    raw_boards = product(*suit_combos)
-    # Return as string representation
-    boards = ["".join(card.card_string() for group in combo for card in group) for combo in raw_boards]
-
-    return boards
+    return PatternBoards(suit_counts).board_strs()
 
 
 def generate_hands_by_suit_distribution(suit_counts):
@@ -322,40 +310,48 @@ def plot_rank_distribution(distribution, bins=20, title=None):
 
     return
 
-def run_evaluation(db, hand_id_map, board_id_map):
+def run_evaluation(db, hand_id_map, board_id_map, profile=None, summary_path=None):
 
-    start_time = time.time()
-    BATCH_SIZE = 100000000  # Tune this value for your system
-
-    all_evaluations_to_insert = []
-    eval_time = 0
-    insert_time = 0
-
-    for board_str, board_id in board_id_map.items():
-        start_eval_time = time.time()
-        hand_values = evaluate_board(board_str, hand_id_map)
-        # print(f"Hand values in run_evaluation: {len(hand_values)}")
-        hand_rankings = rank_hands_for_board(hand_values)
-        # print(f"Hand rankings in run_evaluation: {len(hand_rankings)}")
-        end_eval_time = time.time()
-        eval_time += end_eval_time - start_eval_time
-
-        evaluations_for_board = [
-            (board_id, hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank)
-            for hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank in hand_rankings
-            # if hand_value != float('inf')
-        ]
-
-        all_evaluations_to_insert.extend(evaluations_for_board)
-
-    start_insert_time = time.time()
-    db.bulk_insert_evaluations(all_evaluations_to_insert)
-    end_insert_time = time.time()
-    insert_time = end_insert_time - start_insert_time
+    instr = Instrumentation(profile=profile, name="evaluation")
+    instr.start()
+    perf_counter = time.perf_counter
 
-    end_time = time.time()
+    try:
+        all_evaluations_to_insert = []
+
+        for board_str, board_id in board_id_map.items():
+            t0 = perf_counter()
+            hand_values = evaluate_board(board_str, hand_id_map)
+            # print(f"Hand values in run_evaluation: {len(hand_values)}")
+            t1 = perf_counter()
+            hand_rankings = rank_hands_for_board(hand_values)
+            # print(f"Hand rankings in run_evaluation: {len(hand_rankings)}")
+            t2 = perf_counter()
+
+            evaluations_for_board = [
+                (board_id, hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank)
+                for hand_id, hand_value, min_rank, max_rank, avg_rank, dense_rank in hand_rankings
+                # if hand_value != float('inf')
+            ]
+
+            all_evaluations_to_insert.extend(evaluations_for_board)
+            t3 = perf_counter()
+
+            instr.add_span("evaluate", t1 - t0)
+            instr.add_span("rank", t2 - t1)
+            instr.add_span("build_rows", t3 - t2)
+            instr.observe("boards", t3 - t0, board_str)
+            instr.incr("boards_evaluated")
+
+        db.bulk_insert_evaluations(all_evaluations_to_insert, instrumentation=instr)
+    finally:
+        # Ends the profiling session and records the summary even if a board or the insert fails.
+        instr.stop()
+        instr.write_summary(summary_path)
 
-    time_taken = end_time - start_time
+    time_taken = instr.summary()["elapsed"]
+    eval_time = instr.span_totals["evaluate"] + instr.span_totals["rank"]
+    insert_time = instr.span_totals["copy_serialize"] + instr.span_totals["copy"]
     print(f"Time taken: {time_taken}")
     print(f"Eval Time: {eval_time}")
     print(f"Insert Time: {insert_time}")
@@ -419,13 +415,10 @@ def test_database():
 
 
 def recreate_board_table(db):
-    my_deck = Deck()
-    deck_cards = my_deck.get_cards()
-
     db.truncate_table("boards")
     
     for pattern_num, pattern in enumerate(BOARD_PATTERNS):
-        boards = generate_boards_by_suit_distribution(deck_cards, pattern)
+        boards = generate_boards_by_suit_distribution(pattern)
         print(boards[0])
         # data = [(board.to_str(),) for board in boards]  # or hand.to_str() if defined
         print(len(boards))
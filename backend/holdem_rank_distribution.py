@@ -2,14 +2,19 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 import json
+import time
+from statistics import NormalDist
 
 from db import DB, open_db
+from chart_export import export_chart_shards
+from check_database import pattern_weights
 from deck import RANKS
+from hand_index import NUM_CARDS
+from range_equity import range_weights
+from value_table import evaluate_boards_values, rank_percentiles
 
-PATTERN_COUNTS = [4, 12, 12, 12, 4, 12]
 
-
-def create_rank_chart_data(db):
+def create_rank_chart_data(db, save_images=True, shards=True):
     """
     Create hand rank chart data for all hands.
     Calls plot_rank_distribution to return the chart
@@ -17,9 +22,12 @@ def create_rank_chart_data(db):
 
     Arguments:
         db: The evaluations database.
+        save_images: also save a PNG per hand (the UI only needs the data).
+        shards: also write the compressed per-hand shards to chart/shards.
     """    
     output_dir = "chart"
     os.makedirs(output_dir, exist_ok=True)
+    pattern_counts = pattern_weights(db)
 
 
     all_chart_data = {}
@@ -35,15 +43,17 @@ def create_rank_chart_data(db):
             else:
                 hand_str = f"{card1}{card2}"
 
-            chart_data, chart = plot_rank_distribution(db, hand_str) 
+            chart_data, chart = plot_rank_distribution(db, hand_str, pattern_counts)
 
             # Store data in dictionary
             all_chart_data[hand_str] = chart_data
 
             # Save chart image
-            chart_path = os.path.join(output_dir, f"{hand_str}.png")
-            chart.savefig(chart_path, dpi=300, bbox_inches='tight')
-            print(f"Saved chart for {hand_str} -> {chart_path}")
+            if save_images:
+                chart_path = os.path.join(output_dir, f"{hand_str}.png")
+                chart.savefig(chart_path, dpi=300, bbox_inches='tight')
+                print(f"Saved chart for {hand_str} -> {chart_path}")
+            chart.close()
 
 
     # Save all chart data to JSON
@@ -52,16 +62,20 @@ def create_rank_chart_data(db):
         json.dump(all_chart_data, f, indent=4)
     print(f"Saved chart data -> {json_path}")
 
+    if shards:
+        export_chart_shards(all_chart_data, os.path.join(output_dir, "shards"))
+
     return
 
 
-def plot_rank_distribution(db, hand_str):
+def plot_rank_distribution(db, hand_str, pattern_counts=None):
     """
     Create hand distribution plot for given hand.
 
     Arguments:
         db: The evaluations database.
         hand_str: The string representation of the hand.
+        pattern_counts: board weight per suit_pattern (default: pattern_weights(db)).
 
     Returns:
         List of the percentile frequencies for the hand.
@@ -70,6 +84,7 @@ def plot_rank_distribution(db, hand_str):
 
     num_bins = 100
     bin_edges = np.linspace(0, 1, num_bins + 1)
+    pattern_counts = pattern_weights(db) if pattern_counts is None else pattern_counts
 
     fig, ax = plt.subplots(figsize=(8, 3))
 
@@ -85,7 +100,7 @@ def plot_rank_distribution(db, hand_str):
     for row in rows:
         rmin = row[rank_min_idx]
         rmax = row[rank_max_idx]
-        suit_multiplier = PATTERN_COUNTS[int(row[suit_multiplier_idx])]
+        suit_multiplier = pattern_counts[int(row[suit_multiplier_idx])]
 
         # Handle zero-width ranges
         if rmax == rmin:
@@ -125,6 +140,200 @@ def plot_rank_distribution(db, hand_str):
 
 
 
+def rank_range_mass(rmin, rmax, num_bins=100):
+    """
+    Spreads each [rank_min, rank_max] range uniformly over the percentile bins,
+    exactly as plot_rank_distribution does row by row.
+
+    Arguments:
+        rmin, rmax: arrays of rank percentiles (same shape).
+        num_bins: the number of bins in the histogram.
+
+    Returns:
+        Array of shape rmin.shape + (num_bins,) with the fraction of each range in each bin.
+    """
+    rmin = np.asarray(rmin, dtype=np.float64)
+    rmax = np.asarray(rmax, dtype=np.float64)
+    bin_edges = np.linspace(0, 1, num_bins + 1)
+
+    width = rmax - rmin
+    point = width == 0
+    safe_width = np.where(point, 1.0, width)
+    cdf = np.clip((bin_edges - rmin[..., None]) / safe_width[..., None], 0.0, 1.0)
+    mass = np.diff(cdf, axis=-1)
+
+    # Zero-width ranges put their full weight into the single bin they fall into.
+    point_bins = np.minimum((rmin * num_bins).astype(np.int64), num_bins - 1)
+    point_mass = (np.arange(num_bins) == point_bins[..., None]).astype(np.float64)
+    return np.where(point[..., None], point_mass, mass)
+
+
+def bin_position_pairs(pair_weights, num_live=None, num_bins=100):
+    """
+    Weighted 100-bin histogram of [rank_min, rank_max] rank position pairs. Summing
+    the weights of each distinct pair first spreads every pair over the bins once.
+
+    Arguments:
+        pair_weights: square array; entry [i, j] is the weight of the positions i to j.
+        num_live: number of live hands the positions rank among (default: the array size).
+        num_bins: the number of bins in the histogram.
+
+    Returns:
+        Array of num_bins bin counts.
+    """
+    pair_weights = np.asarray(pair_weights, dtype=np.float64)
+    num_live = len(pair_weights) if num_live is None else num_live
+    rank_min, rank_max = np.nonzero(pair_weights)
+    denom = max(num_live - 1, 1)
+    return pair_weights[rank_min, rank_max] @ rank_range_mass(rank_min / denom, rank_max / denom, num_bins)
+
+
+def bin_rank_ranges(rmin, rmax, weights=None, num_bins=100, chunk_size=100000):
+    """
+    Weighted 100-bin histogram of [rank_min, rank_max] ranges (NaN rows are skipped).
+
+    Returns:
+        Array of num_bins bin counts.
+    """
+    rmin = np.asarray(rmin, dtype=np.float64).ravel()
+    rmax = np.asarray(rmax, dtype=np.float64).ravel()
+    weights = np.ones_like(rmin) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    keep = ~np.isnan(rmin)
+    rmin, rmax, weights = rmin[keep], rmax[keep], weights[keep]
+
+    bin_counts = np.zeros(num_bins)
+    for start in range(0, len(rmin), chunk_size):
+        stop = start + chunk_size
+        bin_counts += weights[start:stop] @ rank_range_mass(rmin[start:stop], rmax[start:stop], num_bins)
+    return bin_counts
+
+
+def sample_rank_distribution(hand_range, target_error=0.005, confidence=0.95, batch_size=200,
+                             min_boards=1000, max_boards=200000, board_filter=None, num_bins=100, seed=None):
+    """
+    Monte Carlo estimate of a hand's rank distribution from random boards.
+
+    Boards are drawn uniformly, every hand is evaluated with the batch evaluator and
+    ranked, and the hand's [rank_min, rank_max] ranges are folded into the same
+    100-bin histogram as plot_rank_distribution. No evaluations table is needed.
+
+    Arguments:
+        hand_range: a hand class ('AQo'), a hand ('AhQd'), or any range accepted by
+            range_equity.range_weights.
+        target_error: stop once every bin's confidence half-width is at most this.
+        confidence: confidence level of the per-bin intervals.
+        batch_size: boards drawn per iteration.
+        min_boards, max_boards: bounds on the number of boards evaluated.
+        board_filter: optional function taking an (n, 5) array of card indices and
+            returning a boolean mask of the boards to keep.
+        num_bins: the number of bins in the histogram.
+        seed: random seed for reproducible samples.
+
+    Returns:
+        Dictionary with the normalized bin frequencies, lower/upper confidence bounds,
+        half-widths, number of boards used and whether the target error was reached.
+    """
+    weights = range_weights(hand_range)
+    hands = np.flatnonzero(weights)
+    hand_weights = weights[hands]
+    if len(hands) == 0:
+        raise ValueError("Empty hand range")
+
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    # Running sums for the ratio estimator sum(y) / sum(n), where y is a board's
+    # weighted bin vector and n the live weight of the range on that board.
+    sum_y = np.zeros(num_bins)
+    sum_yy = np.zeros(num_bins)
+    sum_yn = np.zeros(num_bins)
+    sum_n = sum_nn = 0.0
+    num_boards = 0
+    draws = 0
+    half_width = np.full(num_bins, np.inf)
+    start_time = time.time()
+
+    while num_boards < max_boards:
+        boards = np.argsort(rng.random((batch_size, NUM_CARDS)), axis=1)[:, :5]
+        draws += batch_size
+        if board_filter is not None:
+            boards = boards[board_filter(boards)]
+            if len(boards) == 0:
+                if draws >= 100 * max_boards:
+                    break
+                continue
+
+        rmin, rmax, _, _ = rank_percentiles(evaluate_boards_values(boards))
+        rmin, rmax = rmin[:, hands], rmax[:, hands]
+        live_w = np.where(np.isnan(rmin), 0.0, hand_weights)
+        mass = rank_range_mass(np.nan_to_num(rmin), np.nan_to_num(rmax), num_bins)
+        y = np.einsum("bk,bkn->bn", live_w, mass)
+        n = live_w.sum(axis=1)
+
+        sum_y += y.sum(axis=0)
+        sum_yy += (y * y).sum(axis=0)
+        sum_yn += (y * n[:, None]).sum(axis=0)
+        sum_n += n.sum()
+        sum_nn += (n * n).sum()
+        num_boards += len(boards)
+
+        if num_boards >= max(min_boards, 2):
+            ratio = sum_y / sum_n
+            mean_n = sum_n / num_boards
+            residual = np.maximum(sum_yy - 2 * ratio * sum_yn + ratio ** 2 * sum_nn, 0.0)
+            variance = residual / (num_boards - 1) / (num_boards * mean_n ** 2)
+            half_width = z * np.sqrt(variance)
+            if half_width.max() <= target_error:
+                break
+
+    if sum_n == 0:
+        raise ValueError("No boards matched the filter")
+
+    bins = sum_y / sum_n
+    print(f"🎲 Sampled {num_boards:,} boards in {time.time() - start_time:.1f}s "
+          f"(max half-width {half_width.max():.4f})")
+    return {
+        "bins": bins.tolist(),
+        "lower": np.maximum(bins - half_width, 0.0).tolist(),
+        "upper": (bins + half_width).tolist(),
+        "half_width": half_width.tolist(),
+        "boards": num_boards,
+        "converged": bool(half_width.max() <= target_error),
+    }
+
+
+def plot_sampled_rank_distribution(hand_range, title=None, **kwargs):
+    """
+    Create hand distribution plot from sampled boards, with per-bin confidence intervals.
+
+    Arguments:
+        hand_range: hand class, hand or range (see sample_rank_distribution).
+        title: the title to be printed on the chart.
+        kwargs: passed to sample_rank_distribution.
+
+    Returns:
+        Dictionary returned by sample_rank_distribution.
+        Chart of the rank distribution for the hand.
+    """
+    result = sample_rank_distribution(hand_range, **kwargs)
+    num_bins = len(result["bins"])
+    bin_edges = np.linspace(0, 1, num_bins + 1)
+
+    fig, ax = plt.subplots(figsize=(8, 3))
+    ax.bar(bin_edges[:-1] * 100, result["bins"], width=100 / num_bins, edgecolor="black", align="edge",
+           yerr=result["half_width"], ecolor="gray", capsize=0)
+    ax.set_ylabel("Frequency (normalized)")
+    ax.set_title(title or f"Sampled rank distribution for {hand_range} ({result['boards']:,} boards)")
+    ax.set_xlim(0, 100)
+    ax.set_ylim(0, 0.20)
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+
+    ax.set_xlabel("Percentile (%)")
+    plt.tight_layout()
+
+    return result, plt
+
+
 def plot_rank_distribution_multi(db, hand_strs):
     """
     Plots up to 4 hands in separate subplots.
@@ -141,6 +350,7 @@ def plot_rank_distribution_multi(db, hand_strs):
         axes = [axes]  # make iterable if only one subplot
     
     # hand_id_map = db.get_hand_ids()
+    pattern_counts = pattern_weights(db)
 
     for ax, hand_str in zip(axes, hand_strs):
         # Get hand_id
@@ -161,7 +371,7 @@ def plot_rank_distribution_multi(db, hand_strs):
         for row in rows:
             rmin = row[rank_min_idx]
             rmax = row[rank_max_idx]
-            suit_multiplier = PATTERN_COUNTS[int(row[suit_multiplier_idx])]
+            suit_multiplier = pattern_counts[int(row[suit_multiplier_idx])]
             # print(f"Suit_multiplier {suit_multiplier}")
 
             # Handle zero-width ranges
@@ -209,6 +419,7 @@ def main():
 
     # create_rank_chart_data(db)
     # plot_rank_distribution(db, "32o")
+    # plot_sampled_rank_distribution("AQo", target_error=0.003)
     # plot_rank_distribution_multi(db, ["AQo"])
     plot_rank_distribution_multi(db, ["AQo", "JTs", "99"])
 
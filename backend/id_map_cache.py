@@ -0,0 +1,139 @@
+"""
+Local snapshot cache of the hands and boards id maps.
+
+The id columns of the hands and boards tables are cached as compact numpy
+arrays (ids, fixed-width strings and suit patterns) in CACHE_DIR/id_maps. Each
+snapshot is keyed by the database, the table's schema and an md5 of its
+contents computed server-side, so only a 32-character digest crosses the wire
+when the cache is current. Any insert, update, truncate or schema change gives
+a new key and the snapshot is re-fetched.
+"""
+import os
+import glob
+import hashlib
+import numpy as np
+
+from board_index import CACHE_DIR
+
+CACHE_VERSION = 1
+ID_MAP_DIR = os.path.join(CACHE_DIR, "id_maps")
+
+# Cached columns per table: id column, string column, optional extra column.
+TABLE_COLUMNS = {
+    "hands": ("hand_id", "hand_str", None),
+    "boards": ("board_id", "board_str", "suit_pattern"),
+}
+
+
+def _columns(table_name):
+    if table_name not in TABLE_COLUMNS:
+        raise ValueError("Invalid table name")
+    return TABLE_COLUMNS[table_name]
+
+
+def table_fingerprint(cursor, table_name):
+    """
+    Returns a hex digest of a table's schema and id map contents.
+    """
+    id_column, str_column, extra_column = _columns(table_name)
+    cursor.execute(
+        """
+        SELECT string_agg(column_name || ' ' || data_type, ',' ORDER BY ordinal_position)
+        FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = current_schema();
+        """,
+        (table_name,),
+    )
+    (schema,) = cursor.fetchone()
+
+    extra = f" || ' ' || COALESCE({extra_column}::text, '')" if extra_column else ""
+    cursor.execute(
+        f"SELECT COUNT(*), md5(string_agg({id_column}::text || ' ' || {str_column}{extra}, ',' "
+        f"ORDER BY {id_column})) FROM {table_name};"
+    )
+    count, content = cursor.fetchone()
+    key = f"v{CACHE_VERSION}|{table_name}|{schema}|{count}|{content}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def snapshot_path(db_key, table_name, fingerprint):
+    db_hash = hashlib.sha1(db_key.encode()).hexdigest()[:12]
+    return os.path.join(ID_MAP_DIR, f"{table_name}-{db_hash}-{fingerprint[:20]}.npz")
+
+
+def fetch_id_arrays(cursor, table_name):
+    """
+    Reads a table's id map from the database into arrays.
+
+    Returns:
+        Dictionary with 'ids' (int32), 'strs' (fixed-width bytes) and, for boards,
+        'suit_pattern' (int16, -1 for NULL).
+    """
+    id_column, str_column, extra_column = _columns(table_name)
+    columns = ", ".join(c for c in (id_column, str_column, extra_column) if c)
+    cursor.execute(f"SELECT {columns} FROM {table_name} ORDER BY {id_column};")
+    rows = cursor.fetchall()
+
+    arrays = {
+        "ids": np.array([row[0] for row in rows], dtype=np.int32),
+        "strs": np.array([row[1] for row in rows], dtype=np.bytes_),
+    }
+    if extra_column:
+        arrays[extra_column] = np.array([-1 if row[2] is None else row[2] for row in rows], dtype=np.int16)
+    return arrays
+
+
+def save_snapshot(path, arrays):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written through a handle with a non-.npz suffix, so the pruning below (run by
+    # concurrent workers too) never matches another process's in-flight file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+    # Older snapshots of the same table and database are stale now.
+    prefix = os.path.basename(path).rsplit("-", 1)[0]
+    for old_path in glob.glob(os.path.join(os.path.dirname(path), f"{prefix}-*.npz")):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass  # already pruned by another process
+
+
+def load_snapshot(path):
+    with np.load(path) as snapshot:
+        return {name: snapshot[name] for name in snapshot.files}
+
+
+def get_id_arrays(cursor, db_key, table_name, refresh=False):
+    """
+    Returns a table's id map arrays, from the local snapshot if it is current.
+
+    Arguments:
+        cursor: database cursor.
+        db_key: identifies the database (e.g. "host:port/dbname").
+        table_name: "hands" or "boards".
+        refresh: ignore any existing snapshot.
+
+    Returns:
+        (arrays, cached): the arrays from fetch_id_arrays() and whether they came from the cache.
+    """
+    path = snapshot_path(db_key, table_name, table_fingerprint(cursor, table_name))
+    if not refresh and os.path.exists(path):
+        try:
+            return load_snapshot(path), True
+        except (OSError, ValueError, KeyError):
+            pass
+    arrays = fetch_id_arrays(cursor, table_name)
+    save_snapshot(path, arrays)
+    return arrays, False
+
+
+def clear_id_map_cache():
+    """
+    Deletes every cached id map snapshot.
+    """
+    for path in glob.glob(os.path.join(ID_MAP_DIR, "*.npz")):
+        os.remove(path)
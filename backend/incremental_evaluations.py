@@ -0,0 +1,225 @@
+"""
+Incremental maintenance of the evaluations table.
+
+Instead of truncating and recomputing every pattern, only boards whose rows are
+missing, incomplete, or carry another evaluator_version are recomputed; their
+rows are replaced board by board in one transaction per batch. New rank method
+columns are added and backfilled the same way. Batches run on a worker pool in
+which every worker holds its own connection and attaches to the shared board
+and hand lookup arrays.
+"""
+import argparse
+import importlib
+import time
+import numpy as np
+
+from db import open_db
+from db_operations import EVALUATOR_VERSION
+from hand_index import NUM_HANDS, cards_from_str, hand_index
+from rank_table import LIVE_HANDS
+from shared_tables import SharedTables, get_shared
+from value_table import BLOCKED_VALUE, evaluate_boards_values, rank_percentiles
+
+
+def _rank_method(index):
+    return lambda values: rank_percentiles(values)[index]
+
+
+# Rank columns that can be (re)computed from a (B, 1326) batch of hand values.
+# Each function returns a (B, 1326) float array, NaN for blocked hands.
+RANK_METHODS = {
+    "rank_min": _rank_method(0),
+    "rank_max": _rank_method(1),
+    "rank_avg": _rank_method(2),
+    "rank_dense": _rank_method(3),
+}
+BUILTIN_RANK_METHODS = tuple(RANK_METHODS)
+
+
+def register_rank_method(column, compute):
+    """
+    Registers a new rank column so backfill_rank_column can populate it.
+
+    Arguments:
+        column: column name (lowercase identifier).
+        compute: function mapping (B, 1326) hand values to (B, 1326) floats.
+    """
+    RANK_METHODS[column] = compute
+
+
+def load_rank_method(spec):
+    """
+    Imports a rank method given as "module:function" (e.g. "my_ranks:rank_share").
+    """
+    module_name, _, function_name = spec.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Expected a rank method as 'module:function', got '{spec}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+_worker_db = None
+
+
+def _init_worker(rank_methods=None):
+    global _worker_db
+    _worker_db = open_db()
+    # Registered methods only exist in the parent; spawned workers get them here
+    # (module-level functions are pickled by reference and re-imported).
+    RANK_METHODS.update(rank_methods or {})
+
+
+def _lookup_tables(db):
+    """
+    Builds the board cards by board_id and hand id <-> hand index arrays.
+    """
+    hand_id_map = db.get_hand_ids()
+    board_id_map = db.get_board_ids()
+    hand_ids = np.zeros(NUM_HANDS, dtype=np.int32)
+    for hand_str, hand_id in hand_id_map.items():
+        hand_ids[hand_index(hand_str)] = hand_id
+    board_cards = np.zeros((max(board_id_map.values()) + 1, 5), dtype=np.uint8)
+    for board_str, board_id in board_id_map.items():
+        board_cards[board_id] = cards_from_str(board_str)
+    return {"board_cards": board_cards, "hand_ids": hand_ids}
+
+
+def evaluation_rows(board_ids, values, hand_ids, evaluator_version=EVALUATOR_VERSION):
+    """
+    Builds evaluations rows for a batch of boards.
+
+    Arguments:
+        board_ids: (B,) board ids.
+        values: (B, 1326) hand values from evaluate_boards_values.
+        hand_ids: hand_id of each hand index.
+        evaluator_version: value of the evaluator_version column.
+
+    Returns:
+        List of (board_id, hand_id, hand_value, rank_min, rank_max, rank_avg, rank_dense,
+        evaluator_version) tuples for the live hands.
+    """
+    ranks = rank_percentiles(values)
+    boards, hands = np.nonzero(values != BLOCKED_VALUE)
+    columns = [
+        np.asarray(board_ids)[boards].tolist(),
+        hand_ids[hands].tolist(),
+        values[boards, hands].tolist(),
+        *(rank[boards, hands].tolist() for rank in ranks),
+    ]
+    return [row + (evaluator_version,) for row in zip(*columns)]
+
+
+def _recompute_batch(board_ids):
+    values = evaluate_boards_values(get_shared("board_cards")[board_ids])
+    rows = evaluation_rows(board_ids, values, get_shared("hand_ids"))
+    _worker_db.replace_evaluations(board_ids.tolist(), rows)
+    return len(board_ids), len(rows)
+
+
+def recompute_stale_boards(db, processes=None, batch_size=256, dry_run=False):
+    """
+    Recomputes only the boards whose evaluations are missing, incomplete or stale.
+
+    Arguments:
+        db: The evaluations database.
+        processes: worker processes (default: all cores), each with its own connection.
+        batch_size: boards replaced per transaction.
+        dry_run: only report the stale boards.
+
+    Returns:
+        The list of stale board ids.
+    """
+    db.ensure_evaluator_version_column()
+    stale = db.get_stale_board_ids(EVALUATOR_VERSION, LIVE_HANDS)
+    if dry_run or not stale:
+        return stale
+
+    tables = _lookup_tables(db)
+    stale_ids = np.array(stale, dtype=np.int64)
+    batches = [stale_ids[i:i + batch_size] for i in range(0, len(stale_ids), batch_size)]
+
+    start_time = time.time()
+    boards_done = rows_done = 0
+    with SharedTables(tables) as shared:
+        with shared.pool(processes, initializer=_init_worker) as pool:
+            for done, (num_boards, num_rows) in enumerate(pool.imap_unordered(_recompute_batch, batches), 1):
+                boards_done += num_boards
+                rows_done += num_rows
+                if done % 10 == 0 or done == len(batches):
+                    print(f"♻️ Recomputed {boards_done:,}/{len(stale_ids):,} boards, {rows_done:,} rows "
+                          f"({time.time() - start_time:.1f}s)")
+    return stale
+
+
+def _backfill_batch(args):
+    column, board_ids = args
+    values = evaluate_boards_values(get_shared("board_cards")[board_ids])
+    column_values = RANK_METHODS[column](values)
+    boards, hands = np.nonzero(values != BLOCKED_VALUE)
+    data = list(zip(
+        np.asarray(board_ids)[boards].tolist(),
+        get_shared("hand_ids")[hands].tolist(),
+        column_values[boards, hands].tolist(),
+    ))
+    _worker_db.update_evaluation_column(column, data)
+    return len(board_ids)
+
+
+def backfill_rank_column(db, column, processes=None, batch_size=256):
+    """
+    Adds a rank column registered in RANK_METHODS and fills it for every board whose
+    rows still have it NULL.
+
+    Returns:
+        Number of boards backfilled.
+    """
+    if column not in RANK_METHODS:
+        raise ValueError(f"Unknown rank method '{column}'. Register it with register_rank_method() first.")
+    db.add_evaluation_column(column)
+    board_ids = np.array(db.get_board_ids_missing_column(column), dtype=np.int64)
+    print(f"🔎 {len(board_ids):,} boards need {column}")
+    if not len(board_ids):
+        return 0
+
+    tables = _lookup_tables(db)
+    tasks = [(column, board_ids[i:i + batch_size]) for i in range(0, len(board_ids), batch_size)]
+    rank_methods = {} if column in BUILTIN_RANK_METHODS else {column: RANK_METHODS[column]}
+    start_time = time.time()
+    boards_done = 0
+    with SharedTables(tables) as shared:
+        with shared.pool(processes, initializer=_init_worker, initargs=(rank_methods,)) as pool:
+            for done, num_boards in enumerate(pool.imap_unordered(_backfill_batch, tasks), 1):
+                boards_done += num_boards
+                if done % 10 == 0 or done == len(tasks):
+                    print(f"🧩 Backfilled {column} on {boards_done:,}/{len(board_ids):,} boards "
+                          f"({time.time() - start_time:.1f}s)")
+    return boards_done
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Recompute only missing or stale evaluations.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stale boards.")
+    parser.add_argument("--backfill", default=None, metavar="COLUMN",
+                        help="Add and backfill a rank column instead (built in: "
+                             f"{', '.join(BUILTIN_RANK_METHODS)}; others need --method).")
+    parser.add_argument("--method", default=None, metavar="MODULE:FUNCTION",
+                        help="Rank method of a new --backfill column: a function mapping (B, 1326) "
+                             "hand values to (B, 1326) floats, NaN for blocked hands.")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--batch-size", type=int, default=256, help="Boards per transaction.")
+    args = parser.parse_args()
+    if args.method:
+        if not args.backfill:
+            parser.error("--method needs --backfill COLUMN")
+        register_rank_method(args.backfill, load_rank_method(args.method))
+
+    db = open_db()
+    if args.backfill:
+        backfill_rank_column(db, args.backfill, processes=args.processes, batch_size=args.batch_size)
+    else:
+        recompute_stale_boards(db, processes=args.processes, batch_size=args.batch_size, dry_run=args.dry_run)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from heapq import heappush, heappushpop
+
+PROFILE_ENV_VAR = "POKER_PROFILE"
+PROFILE_MODES = {"cprofile", "tracemalloc", "all"}
+
+# Upper bucket edges in seconds for per-board latency histograms.
+LATENCY_BUCKETS = [0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram that also remembers the slowest samples.
+    """
+    __slots__ = ['buckets', 'counts', 'total', 'count', 'max', 'slowest', 'keep_slowest']
+
+    def __init__(self, buckets=LATENCY_BUCKETS, keep_slowest=10):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+
+    def record(self, seconds, label=None):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+        if label is not None and self.keep_slowest:
+            if len(self.slowest) < self.keep_slowest:
+                heappush(self.slowest, (seconds, label))
+            elif seconds > self.slowest[0][0]:
+                heappushpop(self.slowest, (seconds, label))
+
+    def quantile(self, q):
+        """
+        Approximate quantile, returned as the upper edge of the bucket containing it.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for edge, bucket_count in zip(self.buckets + [self.max], self.counts):
+            running += bucket_count
+            if running >= target:
+                return edge
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {f"le_{edge}": c for edge, c in zip(self.buckets, self.counts)} | {"le_inf": self.counts[-1]},
+            "slowest": [{"label": label, "seconds": s} for s, label in sorted(self.slowest, reverse=True)],
+        }
+
+
+class Instrumentation:
+    """
+    Collects named timing spans, per-board latency histograms and counters
+    for one evaluation run, with optional cProfile/tracemalloc capture.
+
+    Profiling is enabled by passing profile="cprofile", "tracemalloc" or "all",
+    or by setting the POKER_PROFILE environment variable to one of those values.
+    Pass profile=False to disable profiling regardless of the environment.
+
+    If a metrics registry (see metrics.py) is given, spans, counters and gauges
+    are also forwarded to it so long runs can be scraped while in progress.
+    """
+
+    def __init__(self, profile=None, name="evaluation", metrics=None):
+        self.name = name
+        self.metrics = metrics
+        self.span_totals = defaultdict(float)
+        self.span_counts = defaultdict(int)
+        self.histograms = defaultdict(LatencyHistogram)
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.start_time = time.time()
+        self.end_time = None
+
+        if profile is None:
+            profile = os.environ.get(PROFILE_ENV_VAR) or None
+        elif profile is False:
+            profile = None
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{profile}'. Expected one of {sorted(PROFILE_MODES)}")
+        self.profile = profile
+        self.profiler = None
+        self.profile_stats = None
+        self.memory_stats = None
+
+    # Spans and counters
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, seconds):
+        self.span_totals[name] += seconds
+        self.span_counts[name] += 1
+        if self.metrics is not None:
+            self.metrics.observe_span(name, seconds)
+
+    def observe(self, histogram, seconds, label=None):
+        self.histograms[histogram].record(seconds, label)
+
+    def incr(self, counter, amount=1, **labels):
+        self.counters[counter] += amount
+        if self.metrics is not None:
+            self.metrics.inc(counter, amount, **labels)
+
+    def set_gauge(self, gauge, value, **labels):
+        self.gauges[gauge] = value
+        if self.metrics is not None:
+            self.metrics.set(gauge, value, **labels)
+
+    # Profiling
+    def start(self):
+        if self.profile in ("cprofile", "all"):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if self.profile in ("tracemalloc", "all"):
+            tracemalloc.start()
+        return self
+
+    def stop(self):
+        self.end_time = time.time()
+        if self.profiler is not None:
+            self.profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(25)
+            self.profile_stats = stream.getvalue()
+        if self.profile in ("tracemalloc", "all") and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:15]
+            tracemalloc.stop()
+            self.memory_stats = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top": [str(stat) for stat in top],
+            }
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    # Reporting
+    def summary(self):
+        elapsed = (self.end_time or time.time()) - self.start_time
+        return {
+            "name": self.name,
+            "started": self.start_time,
+            "elapsed": elapsed,
+            "spans": {
+                name: {"total": total, "count": self.span_counts[name]}
+                for name, total in sorted(self.span_totals.items())
+            },
+            "histograms": {name: hist.to_dict() for name, hist in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(self.gauges.items())),
+            "profile": self.profile_stats,
+            "memory": self.memory_stats,
+        }
+
+    def write_summary(self, path=None):
+        """
+        Writes the run summary as JSON.
+
+        Arguments:
+            path: output file. Defaults to "<name>_summary.json" in the current directory.
+
+        Returns:
+            The path written.
+        """
+        path = path or f"{self.name}_summary.json"
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+        print(f"📊 Saved run summary -> {path}")
+        return path
+
+    def print_summary(self):
+        for name, total in sorted(self.span_totals.items(), key=lambda kv: -kv[1]):
+            print(f"{name}: {total:.3f}s over {self.span_counts[name]} calls")
+        for name, value in sorted(self.counters.items()):
+            print(f"{name}: {value:,}")
+
+
+class NullInstrumentation(Instrumentation):
+    """
+    Drop-in instrumentation that records nothing, used when callers pass none.
+    """
+
+    def __init__(self):
+        super().__init__(profile=False, name="null")
+
+    @contextmanager
+    def span(self, name):
+        yield
+
+    def add_span(self, name, seconds):
+        pass
+
+    def observe(self, histogram, seconds, label=None):
+        pass
+
+    def incr(self, counter, amount=1, **labels):
+        pass
+
+    def set_gauge(self, gauge, value, **labels):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
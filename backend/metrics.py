@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "poker"
+
+# Upper bucket edges in seconds for span latency histograms (COPY, per-board work).
+SPAN_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class PrometheusMetrics:
+    """
+    Thread-safe registry of live pipeline metrics rendered in the Prometheus
+    text exposition format.
+
+    Counters, gauges and span histograms are fed by Instrumentation (see
+    instrumentation.py) and can be exposed over a local HTTP endpoint or a
+    periodically rewritten textfile for the node exporter textfile collector.
+    """
+
+    def __init__(self, prefix=METRIC_PREFIX, span_buckets=SPAN_BUCKETS):
+        self.prefix = prefix
+        self.span_buckets = list(span_buckets)
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.span_counts = defaultdict(lambda: [0] * (len(self.span_buckets) + 1))
+        self.span_sums = defaultdict(float)
+        self.start_time = time.time()
+        self.last_progress = self.start_time
+        self.rate_samples = {}
+        self.server = None
+        self.writer_thread = None
+        self.textfile_path = None
+        self.stop_event = threading.Event()
+
+    # Recording
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += amount
+            self.last_progress = time.time()
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe_span(self, span, seconds):
+        with self.lock:
+            counts = self.span_counts[span]
+            for i, edge in enumerate(self.span_buckets):
+                if seconds <= edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.span_sums[span] += seconds
+
+    # Rendering
+    def render(self, consumer="default"):
+        """
+        Returns all metrics as a Prometheus text exposition string.
+
+        Arguments:
+            consumer: name of the reader ("http", "textfile", ...). The per-second
+                rates cover the time since this consumer's previous render, so an
+                HTTP scrape and the textfile writer do not reset each other's window.
+        """
+        now = time.time()
+        lines = []
+        with self.lock:
+            by_name = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                by_name[name].append((labels, value))
+
+            for name, samples in sorted(by_name.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(samples):
+                    lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+
+                # Per-second rate since the consumer's previous render, useful for rows/s
+                # dashboards without relying on the scraper's rate() window.
+                total = sum(value for _, value in samples)
+                prev_time, prev_total = self.rate_samples.get((consumer, name), (self.start_time, 0.0))
+                rate = (total - prev_total) / (now - prev_time) if now > prev_time else 0.0
+                self.rate_samples[(consumer, name)] = (now, total)
+                rate_metric = f"{self.prefix}_{name}_per_second"
+                lines.append(f"# TYPE {rate_metric} gauge")
+                lines.append(f"{rate_metric} {format_value(rate)}")
+
+            gauges_by_name = defaultdict(list)
+            for (name, labels), value in self.gauges.items():
+                gauges_by_name[name].append((labels, value))
+            for name, samples in sorted(gauges_by_name.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                for labels, value in sorted(samples):
+                    lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+
+            if self.span_counts:
+                metric = f"{self.prefix}_span_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for span, counts in sorted(self.span_counts.items()):
+                    cumulative = 0
+                    for edge, count in zip(self.span_buckets, counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{span="{span}",le="{edge}"}} {cumulative}')
+                    cumulative += counts[-1]
+                    lines.append(f'{metric}_bucket{{span="{span}",le="+Inf"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{span="{span}"}} {format_value(self.span_sums[span])}')
+                    lines.append(f'{metric}_count{{span="{span}"}} {cumulative}')
+
+            last_progress = self.last_progress
+
+        lines.append(f"# TYPE {self.prefix}_last_progress_timestamp_seconds gauge")
+        lines.append(f"{self.prefix}_last_progress_timestamp_seconds {format_value(last_progress)}")
+        lines.append(f"# TYPE {self.prefix}_start_timestamp_seconds gauge")
+        lines.append(f"{self.prefix}_start_timestamp_seconds {format_value(self.start_time)}")
+
+        rss = get_rss_bytes()
+        if rss is not None:
+            lines.append(f"# TYPE {self.prefix}_process_resident_memory_bytes gauge")
+            lines.append(f"{self.prefix}_process_resident_memory_bytes {rss}")
+
+        return "\n".join(lines) + "\n"
+
+    # Exporters
+    def serve_http(self, port=9108, host="127.0.0.1"):
+        """
+        Serves /metrics on a background thread.
+
+        Arguments:
+            port: TCP port to listen on.
+            host: interface to bind. Defaults to localhost only.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render(consumer="http").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                return
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        print(f"📈 Serving metrics on http://{host}:{port}/metrics")
+        return self.server
+
+    def write_textfile(self, path):
+        """
+        Atomically rewrites the metrics textfile (write to temp file, then rename).
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render(consumer="textfile"))
+        os.replace(tmp_path, path)
+
+    def start_textfile_writer(self, path, interval=15.0):
+        """
+        Rewrites the metrics textfile every `interval` seconds on a background thread.
+        """
+        def loop():
+            while not self.stop_event.wait(interval):
+                self.write_textfile(path)
+
+        self.write_textfile(path)
+        self.writer_thread = threading.Thread(target=loop, daemon=True)
+        self.writer_thread.start()
+        self.textfile_path = path
+        print(f"📈 Writing metrics to {path} every {interval}s")
+        return self.writer_thread
+
+    def close(self):
+        self.stop_event.set()
+        if self.writer_thread is not None:
+            self.writer_thread.join()
+            self.write_textfile(self.textfile_path)
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# Helper functions. (Not in class)
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def get_rss_bytes():
+    """
+    Returns the current resident set size of this process, or None if unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except (ImportError, OSError):
+        return None
@@ -0,0 +1,168 @@
+"""
+Equity against several random opponents.
+
+rank_avg is a hand's strength against one random hand. Against k opponents the
+hand wins only if every opponent holds a weaker hand. It splits the pot with the
+opponents it ties. For each board and hero hand, this module counts the
+opponent hands that are stronger, tied or weaker. Only opponents sharing no card
+with the hero are counted (990 on a river board). The counts start from the
+sorted rank positions ([rank_min, rank_max] in the rank table), which cover all
+1,081 live hands. The hands sharing a card with the hero are then subtracted.
+For each card, they are found by binary search among the 51 hands that hold
+it, so the whole (boards, 1,326) batch is vectorized.
+
+Card removal between opponents is approximated. The k opponents are drawn
+without replacement from the hero's compatible hands, ignoring that two
+opponents cannot share a card either. The pot share is then hypergeometric:
+
+    equity_k = sum_j C(tied, j) * C(weaker, k - j) / C(compatible, k) / (j + 1)
+
+For k = 1 this is exact. For k >= 2 it leaves out the opponent-opponent
+collisions. Against exact enumeration of two opponents on sampled boards, it
+stays within one percentage point and overstates the equity slightly on average.
+
+Multiway strengths are charted like rank percentiles (0 = strongest), as
+1 - equity_k, so ChartHistograms and the chart exports work unchanged for any
+player count.
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+from board_index import NUM_CANONICAL_BOARDS, PATTERN_MULTIPLICITIES, canonical_pattern
+from chart_histograms import ChartHistograms
+from hand_index import CARD_HANDS, HAND_CARDS, NUM_CARDS, NUM_HANDS
+from rank_table import load_rank_table
+from value_table import BLOCKED_VALUE, load_value_table, rank_positions, row_searchsorted
+
+MAX_OPPONENTS = 9
+_LOG_FACTORIAL = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, NUM_HANDS + 1)))))
+
+
+def _log_comb(n, k):
+    """
+    Log of C(n, k) for integer arrays, -inf where k > n.
+    """
+    valid = (k >= 0) & (k <= n)
+    n, k = np.where(valid, n, 0), np.where(valid, k, 0)
+    return np.where(valid, _LOG_FACTORIAL[n] - _LOG_FACTORIAL[k] - _LOG_FACTORIAL[n - k], -np.inf)
+
+
+def opponent_counts(values, positions=None):
+    """
+    Counts the opponent hands sharing no card with each hero hand, by strength.
+
+    Arguments:
+        values: (B, 1326) hand values, BLOCKED_VALUE for blocked hands.
+        positions: optional (B, 1326, 3) rank positions of values (from the rank table).
+
+    Returns:
+        (stronger, tied, weaker) int64 arrays shaped like values, -1 for blocked heroes.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    positions = rank_positions(values)[0] if positions is None else positions
+    positions = np.asarray(positions, dtype=np.int64)
+    num_boards = len(values)
+
+    # Sort each card's hand values per board and search the hero's value in the rows of
+    # both of its cards. The hero itself sits in both rows as a tie.
+    card_values = np.sort(values[:, CARD_HANDS], axis=2)
+    card_rows = card_values.reshape(num_boards * NUM_CARDS, CARD_HANDS.shape[1])
+    stronger = np.zeros(values.shape, dtype=np.int64)
+    not_weaker = np.zeros(values.shape, dtype=np.int64)
+    for card in (HAND_CARDS[:, 0], HAND_CARDS[:, 1]):
+        rows = np.arange(num_boards)[:, None] * NUM_CARDS + card[None, :]
+        below, at_or_below = row_searchsorted(card_rows, rows, values)
+        stronger += below
+        not_weaker += at_or_below
+
+    live = positions[..., 0] >= 0
+    num_live = live.sum(axis=1, keepdims=True)
+    # The live hands sharing a card with the hero are those in its two card rows, less itself twice.
+    card_live = (card_values != BLOCKED_VALUE).sum(axis=2)
+    compatible = num_live - 1 - (card_live[:, HAND_CARDS[:, 0]] + card_live[:, HAND_CARDS[:, 1]] - 2)
+
+    stronger_compatible = positions[..., 0] - stronger
+    tied_compatible = (positions[..., 1] - positions[..., 0]) - (not_weaker - stronger - 2)
+    weaker_compatible = compatible - stronger_compatible - tied_compatible
+    blocked = -np.ones_like(stronger)
+    return (np.where(live, stronger_compatible, blocked), np.where(live, tied_compatible, blocked),
+            np.where(live, weaker_compatible, blocked))
+
+
+def multiway_equity(values, num_opponents, positions=None):
+    """
+    Pot share of every hand against num_opponents random opponent hands.
+
+    Arguments:
+        values: (B, 1326) hand values, BLOCKED_VALUE for blocked hands.
+        num_opponents: number of opponents (1 to 9).
+        positions: optional (B, 1326, 3) rank positions of values.
+
+    Returns:
+        (B, 1326) float64 equities in [0, 1], NaN for blocked hands.
+    """
+    if not 1 <= num_opponents <= MAX_OPPONENTS:
+        raise ValueError(f"Expected 1 to {MAX_OPPONENTS} opponents, got {num_opponents}")
+    stronger, tied, weaker = opponent_counts(values, positions)
+    compatible = stronger + tied + weaker
+    log_total = _log_comb(compatible, num_opponents)
+    equity = np.zeros(values.shape)
+    with np.errstate(invalid="ignore"):  # blocked heroes, set to NaN below
+        for j in range(num_opponents + 1):
+            equity += np.exp(_log_comb(tied, j) + _log_comb(weaker, num_opponents - j) - log_total) / (j + 1)
+    equity[stronger < 0] = np.nan
+    return equity
+
+
+def multiway_percentiles(values, num_opponents, positions=None):
+    """
+    Multiway strength on the rank percentile scale (0 = strongest): 1 - multiway_equity.
+    """
+    return 1.0 - multiway_equity(values, num_opponents, positions)
+
+
+def multiway_histograms(num_opponents, num_bins=100, chunk_size=1024, value_table=None, rank_table=None):
+    """
+    Folds the multiway strength of every hand on every canonical board into chart
+    histograms, reading the value and rank tables instead of re-evaluating boards.
+
+    Returns:
+        ChartHistograms of 1 - equity against num_opponents opponents.
+    """
+    values_table = load_value_table() if value_table is None else value_table
+    positions_table = load_rank_table()[0] if rank_table is None else rank_table
+    weights = np.asarray(PATTERN_MULTIPLICITIES, dtype=np.float64)[canonical_pattern(np.arange(NUM_CANONICAL_BOARDS))]
+
+    histograms = ChartHistograms(num_bins=num_bins)
+    start_time = time.time()
+    for start in range(0, NUM_CANONICAL_BOARDS, chunk_size):
+        stop = min(start + chunk_size, NUM_CANONICAL_BOARDS)
+        strength = multiway_percentiles(values_table[start:stop], num_opponents, positions_table[start:stop])
+        histograms.add_board_points(strength, weights[start:stop])
+        if (start // chunk_size) % 50 == 49 or stop == NUM_CANONICAL_BOARDS:
+            print(f"👥 {stop:,}/{NUM_CANONICAL_BOARDS:,} boards against {num_opponents} opponents "
+                  f"({time.time() - start_time:.1f}s)")
+    return histograms
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Chart data for equity against several random opponents.")
+    parser.add_argument("--opponents", type=int, nargs="+", default=[2],
+                        help=f"Opponent counts (1-{MAX_OPPONENTS}); one chart per count.")
+    parser.add_argument("--chart-dir", default="chart",
+                        help="Charts are written to <chart-dir>/<players>way/chart_data.json (with shards/).")
+    args = parser.parse_args()
+
+    for num_opponents in args.opponents:
+        histograms = multiway_histograms(num_opponents)
+        histograms.write_chart_data(os.path.join(args.chart_dir, f"{num_opponents + 1}way", "chart_data.json"))
+
+    # values = load_value_table()[:4]
+    # print(multiway_equity(values, 3)[0, :10])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+In-process percentile lookups keyed by (board, hand).
+
+Replaces the evaluations table query by (board_id, hand_id): the board is
+reduced to its colex index, the precomputed canonical map gives the canonical
+board row and suit permutation, and the hand's rank positions are read from the
+memory-mapped rank table. No database round trip or id resolution is needed.
+"""
+import time
+import numpy as np
+
+from board_index import BINOM, BOARD_SIZE, NUM_BOARDS, colex_indices, get_board_masks, get_canonical_map
+from hand_index import CARD_INDEX, HAND_MASKS, HAND_PAIR_INDEX, HAND_PERM, NUM_HANDS, hand_index
+from rank_table import LIVE_HANDS, RANK_METHODS, load_rank_table, positions_to_percentiles
+from value_table import load_value_table
+
+_COLEX = BINOM.tolist()
+
+
+def board_colex_index(board):
+    """
+    Returns the colex index of a board given as a string ("AsKsQsJhTh"), card
+    indices, or an existing colex index.
+    """
+    if isinstance(board, (int, np.integer)):
+        if not 0 <= board < NUM_BOARDS:
+            raise ValueError(f"Board index {board} out of range [0, {NUM_BOARDS})")
+        return int(board)
+    if isinstance(board, str):
+        try:
+            cards = [CARD_INDEX[board[i:i + 2]] for i in range(0, len(board), 2)]
+        except KeyError as e:
+            raise ValueError(f"Invalid card {e.args[0]} in '{board}'") from None
+    else:
+        cards = [int(c) for c in board]
+    if len(cards) != BOARD_SIZE or len(set(cards)) != BOARD_SIZE:
+        raise ValueError(f"Invalid board '{board}'")
+    cards.sort()
+    return _COLEX[cards[0]][1] + _COLEX[cards[1]][2] + _COLEX[cards[2]][3] + _COLEX[cards[3]][4] + _COLEX[cards[4]][5]
+
+
+def _hand(hand):
+    if isinstance(hand, (int, np.integer)):
+        if not 0 <= hand < NUM_HANDS:
+            raise ValueError(f"Hand index {hand} out of range [0, {NUM_HANDS})")
+        return int(hand)
+    if len(hand) == 4 and hand[:2] in CARD_INDEX and hand[2:] in CARD_INDEX:
+        h = int(HAND_PAIR_INDEX[CARD_INDEX[hand[:2]], CARD_INDEX[hand[2:]]])
+        if h >= 0:
+            return h
+    return hand_index(hand)
+
+
+class PercentileLookup:
+    """
+    Memory-mapped (board, hand) -> percentile lookups.
+
+    Arguments:
+        rank_table_path, value_table_path: table locations (default: the cache directory).
+        build: build missing tables instead of raising FileNotFoundError.
+    """
+
+    def __init__(self, rank_table_path=None, value_table_path=None, build=True):
+        self.rank_table, self.unique_counts = load_rank_table(rank_table_path, build=build)
+        self.value_table = load_value_table(value_table_path, build=build)
+        self.rows, self.perms = get_canonical_map()
+        self.board_masks = get_board_masks()
+        self._denom = LIVE_HANDS - 1
+
+    def board_id(self, board):
+        """
+        Returns the boards table id of a board's canonical board.
+        """
+        return int(self.rows[board_colex_index(board)]) + 1
+
+    def lookup(self, board, hand):
+        """
+        Looks up one hand on one board.
+
+        Arguments:
+            board: board string, card indices, or colex index.
+            hand: hand string ("AhKh", either card order) or hand index.
+
+        Returns:
+            Dictionary with the same columns as the evaluations table (board_id and
+            hand_id of the canonical board and hand, hand_value, rank_min, rank_max,
+            rank_avg, rank_dense), or None if the hand shares a card with the board.
+        """
+        b = board_colex_index(board)
+        h = _hand(hand)
+        if HAND_MASKS[h] & self.board_masks[b]:
+            return None
+
+        row = int(self.rows[b])
+        canonical_hand = int(HAND_PERM[self.perms[b], h])
+        rank_min, rank_max, dense = self.rank_table[row, canonical_hand].tolist()
+        denom = self._denom
+        return {
+            "board_id": row + 1,
+            "hand_id": canonical_hand + 1,
+            "hand_value": int(self.value_table[row, canonical_hand]),
+            "rank_min": rank_min / denom,
+            "rank_max": rank_max / denom,
+            "rank_avg": (rank_min + rank_max) / 2 / denom,
+            "rank_dense": dense / max(int(self.unique_counts[row]) - 1, 1),
+        }
+
+    def lookup_batch(self, boards, hands):
+        """
+        Vectorized lookups.
+
+        Arguments:
+            boards: colex indices, or an (n, 5) array of card indices.
+            hands: hand indices, broadcastable against the boards.
+
+        Returns:
+            Dictionary of hand_value and the four rank columns as arrays; blocked hands
+            get NaN ranks and a hand_value of -1.
+        """
+        boards = np.asarray(boards)
+        if boards.ndim == 2 and boards.shape[1] == BOARD_SIZE:
+            boards = colex_indices(boards)
+        if boards.size and (boards.min() < 0 or boards.max() >= NUM_BOARDS):
+            raise ValueError("Board index out of range")
+        hands = np.asarray(hands)
+        if hands.size and (hands.min() < 0 or hands.max() >= NUM_HANDS):
+            raise ValueError("Hand index out of range")
+
+        rows = self.rows[boards]
+        canonical_hands = HAND_PERM[self.perms[boards], hands]
+        rows, canonical_hands = np.broadcast_arrays(rows, canonical_hands)
+        percentiles = positions_to_percentiles(self.rank_table[rows, canonical_hands], self.unique_counts[rows])
+
+        blocked = np.isnan(percentiles["rank_min"])
+        hand_value = self.value_table[rows, canonical_hands].astype(np.int32)
+        hand_value[blocked] = -1
+        return {"hand_value": hand_value, **{method: percentiles[method] for method in RANK_METHODS}}
+
+
+def benchmark(num_lookups=1000000, seed=0):
+    """
+    Times single and batched lookups on random (board, hand) pairs.
+    """
+    lookup = PercentileLookup()
+    rng = np.random.default_rng(seed)
+    boards = rng.integers(0, NUM_BOARDS, num_lookups)
+    hands = rng.integers(0, NUM_HANDS, num_lookups)
+
+    start_time = time.perf_counter()
+    lookup.lookup_batch(boards, hands)
+    elapsed = time.perf_counter() - start_time
+    print(f"⚡ {num_lookups:,} batched lookups in {elapsed:.3f}s")
+
+    singles = 10000
+    start_time = time.perf_counter()
+    for b, h in zip(boards[:singles].tolist(), hands[:singles].tolist()):
+        lookup.lookup(b, h)
+    elapsed = time.perf_counter() - start_time
+    print(f"⚡ single lookup: {elapsed / singles * 1e6:.1f}µs")
+
+
+def main():
+
+    lookup = PercentileLookup()
+    print(lookup.lookup("AsKsQsJhTh", "AhAd"))
+    # benchmark()
+
+
+if __name__ == "__main__":
+    main()
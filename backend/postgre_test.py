@@ -1,18 +1,17 @@
 import psycopg2
 
-DB_NAME = "postgres"
-USER = "postgres"
-PASSWORD = "goose000000"
-HOST = "localhost"
-PORT = "5432"
+from db import CONFIG_FILE, load_db_config
+
+# Connection settings come from config.json (see db.open_db), never from this file.
+config = load_db_config(CONFIG_FILE)
 
 try:
     conn = psycopg2.connect(
-        dbname = DB_NAME,
-        user = USER,
-        password = PASSWORD,
-        host = HOST,
-        port = PORT
+        dbname = config["dbname"],
+        user = config["user"],
+        password = config["password"],
+        host = config.get("host", "localhost"),
+        port = config.get("port", 5432)
     )
     conn.autocommit = True
 
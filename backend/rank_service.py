@@ -0,0 +1,480 @@
+"""
+Local HTTP service for rank distributions.
+
+Serves the 100-bin rank distribution of any hand class, single hand or weighted
+range over an asyncio server (standard library only). Distributions come from a
+source of per-hand histogram counts: a merged ChartHistograms shard (.npz, see
+chart_histograms.py) or the evaluations table through the DB layer. Responses
+are kept in a size-bounded LRU cache together with their gzip encoding and an
+ETag, so repeated queries cost a dictionary lookup, and concurrent identical
+misses share one computation.
+
+Endpoints:
+    GET /distribution?hand=AKs            hand class, or a hand like AhKd
+    GET /distribution?range=AJs+,77+,KQo:0.5  range notation (see hand_range.py)
+    GET /distribution?hand=AQo&dead=KhKd  with dead cards removed from boards and opponents
+                                          (503 until the value and rank tables are built)
+    GET /top?board=AsKsQsJhTh&n=20       strongest hands on a board
+    GET /top?board=AsKsQsJhTh&hand=9h8h  hands beating a hand and its dense rank
+                                          (503 until the order, rank and value tables are built)
+    GET /stats                            cache and latency statistics (JSON)
+    GET /metrics                          the same in Prometheus text format
+    GET /health
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from chart_histograms import ChartHistograms
+from check_database import pattern_weights
+from dead_card_distribution import dead_card_distribution
+from hand_index import HAND_INDEX, HAND_MASKS, NUM_HANDS, card_str, cards_from_str, cards_mask
+from hand_order import dense_rank, hands_beating, top_hands
+from holdem_rank_distribution import bin_rank_ranges
+from instrumentation import LatencyHistogram
+from metrics import CONTENT_TYPE, PrometheusMetrics
+from range_equity import range_weights
+from rank_table import load_rank_table
+from value_table import load_value_table
+
+# Upper bucket edges in seconds for request latencies; cache hits take microseconds.
+SERVICE_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0]
+MIN_GZIP_BYTES = 256
+REQUEST_HEAD_LIMIT = 16384
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its entries in bytes.
+
+    Arguments:
+        max_bytes: evict least recently used entries beyond this size.
+        max_entries: optional bound on the number of entries.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """
+        Stores value, evicting least recently used entries. Values larger than the
+        whole cache are not stored.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes or (self.max_entries and len(self.entries) > self.max_entries):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class HistogramSource:
+    """
+    Per-hand histogram counts from a ChartHistograms (built offline or loaded from a shard).
+    """
+    name = "histograms"
+
+    def __init__(self, histograms):
+        histograms.flush()
+        self.counts = histograms.counts
+        self.num_bins = histograms.num_bins
+
+    @classmethod
+    def from_shard(cls, path):
+        return cls(ChartHistograms.load(path))
+
+    def hand_counts(self, hands):
+        return self.counts[hands]
+
+
+class DatabaseSource:
+    """
+    Per-hand histogram counts binned from the evaluations table, weighted by the
+    suit pattern multiplicities like plot_rank_distribution.
+    """
+    name = "database"
+
+    def __init__(self, db, num_bins=100):
+        self.db = db
+        self.num_bins = num_bins
+        self.hand_ids = np.zeros(NUM_HANDS, dtype=np.int64)
+        for hand_str, hand_id in db.get_hand_ids().items():
+            self.hand_ids[HAND_INDEX[hand_str]] = hand_id
+        # Checks the suit_pattern numbering before trusting the pattern weights.
+        self.pattern_weights = np.asarray(pattern_weights(db), dtype=np.float64)
+        self.lock = threading.Lock()
+
+    def hand_counts(self, hands):
+        hands = np.asarray(hands)
+        position = {int(hand_id): i for i, hand_id in enumerate(self.hand_ids[hands])}
+        with self.lock:
+            rows = np.array(list(self.db.stream_rank_ranges(position)), dtype=np.float64).reshape(-1, 4)
+        rows = rows[~np.isnan(rows[:, 1])]
+        counts = np.zeros((len(hands), self.num_bins))
+        weights = self.pattern_weights[rows[:, 3].astype(np.int64)]
+        owner = np.array([position[int(hand_id)] for hand_id in rows[:, 0]], dtype=np.int64)
+        for i in range(len(hands)):
+            selected = owner == i
+            counts[i] = bin_rank_ranges(rows[selected, 1], rows[selected, 2], weights[selected], self.num_bins)
+        return counts
+
+
+class RequestError(ValueError):
+    pass
+
+
+def parse_query(query_string):
+    """
+    Converts the query string of /distribution into a 1,326 weight vector.
+
+    Arguments:
+        query_string: e.g. "hand=AKs" or "range=AJs+,77+,A5s-A2s:0.5,AhKd".
+
+    Returns:
+        float64 array of hand weights.
+    """
+    # '+' is kept literally (not decoded to a space) so "AJs+" needs no escaping.
+    params = parse_qs(query_string.replace("+", "%2B"))
+    items = {}
+    for value in params.get("hand", []) + params.get("range", []):
+        for item in filter(None, (part.strip() for part in value.split(","))):
+            hand, _, weight = item.partition(":")
+            try:
+                items[hand] = float(weight) if weight else 1.0
+            except ValueError:
+                raise RequestError(f"Invalid weight in '{item}'") from None
+    if not items:
+        raise RequestError("Expected a 'hand' or 'range' parameter")
+    try:
+        weights = range_weights(items)
+    except (ValueError, KeyError) as e:
+        raise RequestError(str(e).strip("'\"")) from None
+    if (weights < 0).any() or not weights.any():
+        raise RequestError("Range weights must be non-negative and not all zero")
+    return weights
+
+
+def parse_dead_cards(query_string):
+    """
+    Returns the sorted card indices of the optional 'dead' parameter (e.g. dead=KhKd7c).
+    """
+    cards = "".join(parse_qs(query_string).get("dead", [])).replace(",", "").replace(" ", "")
+    try:
+        indices = cards_from_str(cards) if cards else []
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+    if len(set(indices)) != len(indices) or len(indices) > 10:
+        raise RequestError("Dead cards must be distinct (at most 10)")
+    return tuple(sorted(indices))
+
+
+class RankDistributionService:
+    """
+    Computes, caches and serves rank distributions.
+
+    Arguments:
+        source: HistogramSource or DatabaseSource.
+        cache_bytes: size of the response cache.
+        workers: threads computing cache misses.
+    """
+
+    def __init__(self, source, cache_bytes=64 * 2**20, workers=4):
+        self.source = source
+        self.cache = LRUCache(cache_bytes)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="rank-service")
+        self.inflight = {}
+        self.latency = {"hit": LatencyHistogram(SERVICE_BUCKETS), "miss": LatencyHistogram(SERVICE_BUCKETS)}
+        self.compute_latency = LatencyHistogram(SERVICE_BUCKETS)
+        self.metrics = PrometheusMetrics()
+        self.requests = 0
+        self.start_time = time.time()
+
+    def compute(self, weights, dead=()):
+        """
+        Builds the JSON response entry of one distribution. With dead cards it is
+        computed from the value and rank tables (see dead_card_distribution.py),
+        raising FileNotFoundError when they have not been built.
+
+        Returns:
+            (etag, body, gzip_body).
+        """
+        start_time = time.perf_counter()
+        if dead:
+            weights = np.where((HAND_MASKS & cards_mask(dead)) != 0, 0.0, weights)
+            hands = np.flatnonzero(weights)
+            frequencies = np.zeros(100)
+            if len(hands):
+                # Never build the tables inside a request; missing tables are answered with 503.
+                tables = {"value_table": load_value_table(build=False), "rank_table": load_rank_table(build=False)[0]}
+                frequencies = np.array(dead_card_distribution(weights, dead, **tables)["bins"])
+        else:
+            hands = np.flatnonzero(weights)
+            counts = weights[hands] @ self.source.hand_counts(hands)
+            total = counts.sum()
+            frequencies = counts / total if total > 0 else counts
+        body = json.dumps({
+            "hands": int(len(hands)),
+            "weight": float(weights.sum()),
+            "dead": "".join(card_str(c) for c in dead),
+            "source": "tables" if dead else self.source.name,
+            "bins": np.round(frequencies, 9).tolist(),
+        }, separators=(",", ":")).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        gzip_body = gzip.compress(body, mtime=0) if len(body) >= MIN_GZIP_BYTES else None
+        self.compute_latency.record(time.perf_counter() - start_time, label=f"{len(hands)} hands")
+        return etag, body, gzip_body
+
+    async def distribution(self, weights, dead=()):
+        """
+        Returns (entry, cached) for a weight vector and dead cards, sharing concurrent misses.
+        """
+        key = hashlib.sha1(weights.tobytes() + bytes(dead)).digest()
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry, True
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self.compute, weights, dead)
+            self.inflight[key] = future
+            try:
+                entry = await future
+            finally:
+                del self.inflight[key]
+            self.cache.put(key, entry, len(entry[1]) + len(entry[2] or b""))
+            return entry, False
+        return await future, False
+
+    async def respond(self, method, target, headers):
+        """
+        Routes one request. Unexpected errors become a JSON 500 response instead of
+        dropping the connection.
+
+        Returns:
+            (status, headers dict, body bytes).
+        """
+        try:
+            return await self._route(method, target, headers)
+        except Exception as e:
+            print(f"❌ {method} {target} failed: {e!r}")
+            return 500, {"Content-Type": "application/json"}, b'{"error":"internal server error"}'
+
+    async def _route(self, method, target, headers):
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, b""
+        url = urlsplit(target)
+        if url.path == "/distribution":
+            return await self._respond_distribution(url.query, headers)
+        if url.path == "/top":
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._respond_top, url.query)
+        if url.path == "/stats":
+            return 200, {"Content-Type": "application/json"}, json.dumps(self.stats(), indent=4).encode()
+        if url.path == "/metrics":
+            return 200, {"Content-Type": CONTENT_TYPE}, self.render_metrics().encode()
+        if url.path == "/health":
+            return 200, {"Content-Type": "application/json"}, b'{"ok":true}'
+        return 404, {"Content-Type": "application/json"}, b'{"error":"not found"}'
+
+    async def _respond_distribution(self, query_string, headers):
+        try:
+            weights = parse_query(query_string)
+            dead = parse_dead_cards(query_string)
+        except RequestError as e:
+            return 400, {"Content-Type": "application/json"}, json.dumps({"error": str(e)}).encode()
+
+        try:
+            (etag, body, gzip_body), cached = await self.distribution(weights, dead)
+        except FileNotFoundError as e:
+            return _unavailable(e)
+        self.metrics.inc("service_cache_lookups", result="hit" if cached else "miss")
+        response_headers = {"ETag": etag, "Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding",
+                            "X-Cache": "HIT" if cached else "MISS"}
+        if etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+            return 304, response_headers, b""
+        response_headers["Content-Type"] = "application/json"
+        if gzip_body is not None and "gzip" in headers.get("accept-encoding", ""):
+            response_headers["Content-Encoding"] = "gzip"
+            body = gzip_body
+        return 200, response_headers, body
+
+    def _respond_top(self, query_string):
+        # Runs on the executor: the first lookup on a board pages in table rows.
+        params = parse_qs(query_string)
+        if "board" not in params:
+            return 400, {"Content-Type": "application/json"}, b'{"error":"Expected a \'board\' parameter"}'
+        try:
+            board = params["board"][0]
+            if "hand" in params:
+                hand = params["hand"][0]
+                body = {"board": board, "hand": hand, "beaten_by": hands_beating(board, hand, build=False),
+                        "dense_rank": dense_rank(board, hand, build=False)}
+            else:
+                body = {"board": board, "hands": top_hands(board, int(params.get("n", ["20"])[0]), build=False)}
+        except ValueError as e:
+            return 400, {"Content-Type": "application/json"}, json.dumps({"error": str(e)}).encode()
+        except FileNotFoundError as e:
+            return _unavailable(e)
+        return 200, {"Content-Type": "application/json"}, json.dumps(body, separators=(",", ":")).encode()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves HTTP/1.1 requests (with keep-alive) on one connection.
+        """
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=30)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    break
+                start_time = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if int(headers.get("content-length", 0) or 0) or "transfer-encoding" in headers:
+                    method, keep_alive = "BODY", False
+
+                status, response_headers, body = await self.respond(method, target, headers)
+                response_headers["Content-Length"] = str(len(body))
+                response_headers["Access-Control-Allow-Origin"] = "*"
+                response_headers["Connection"] = "keep-alive" if keep_alive else "close"
+                head_lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+                head_lines += [f"{name}: {value}" for name, value in response_headers.items()]
+                writer.write(("\r\n".join(head_lines) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+
+                self.requests += 1
+                self.metrics.inc("service_requests", status=status)
+                if "X-Cache" in response_headers:
+                    kind = "hit" if response_headers["X-Cache"] == "HIT" else "miss"
+                    self.latency[kind].record(time.perf_counter() - start_time, label=target)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    def stats(self):
+        return {
+            "source": self.source.name,
+            "uptime_seconds": round(time.time() - self.start_time, 1),
+            "requests": self.requests,
+            "inflight": len(self.inflight),
+            "cache": self.cache.stats(),
+            "latency": {kind: histogram.to_dict() for kind, histogram in self.latency.items()},
+            "compute": self.compute_latency.to_dict(),
+        }
+
+    def render_metrics(self):
+        cache = self.cache.stats()
+        for name in ("entries", "bytes", "max_bytes", "evictions", "hit_rate"):
+            self.metrics.set(f"service_cache_{name}", cache[name])
+        for kind, histogram in self.latency.items():
+            for q in (0.5, 0.9, 0.99):
+                self.metrics.set("service_latency_seconds", histogram.quantile(q), cache=kind, quantile=q)
+        return self.metrics.render(consumer="http")
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=REQUEST_HEAD_LIMIT)
+        print(f"🌐 Serving rank distributions on http://{host}:{port}/distribution (source: {self.source.name})")
+        async with server:
+            await server.serve_forever()
+
+
+def _unavailable(error):
+    """
+    Response for lookups whose tables have not been built yet.
+    """
+    return 503, {"Content-Type": "application/json"}, json.dumps({"error": str(error)}).encode()
+
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Serve rank distributions over HTTP.")
+    parser.add_argument("--histograms", default=None, help="Merged ChartHistograms shard (.npz) to serve from.")
+    parser.add_argument("--db", action="store_true", help="Serve from the evaluations table instead.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port.")
+    parser.add_argument("--cache-mb", type=float, default=64, help="Size of the response cache in MiB.")
+    parser.add_argument("--workers", type=int, default=4, help="Threads computing cache misses.")
+    args = parser.parse_args()
+
+    if args.db:
+        from db import open_db
+        source = DatabaseSource(open_db())
+    elif args.histograms:
+        source = HistogramSource.from_shard(args.histograms)
+    else:
+        parser.error("Give --histograms or --db")
+
+    service = RankDistributionService(source, cache_bytes=int(args.cache_mb * 2**20), workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Memoized per-board rankings.
+
+The rank table is a (331,682 x 1,326 x 3) int16 array holding, for every hand on
+every canonical board, the rank positions used by the evaluations table:
+[rank_min, rank_max, rank_dense] as 0-based positions (-1 for blocked hands).
+Percentiles are position / 1080 for rank_min/rank_max/rank_avg (every complete
+board leaves 1,081 live hands) and position / (unique values - 1) for rank_dense.
+"""
+import os
+import time
+import numpy as np
+from functools import lru_cache
+from math import comb
+
+from board_index import CACHE_DIR, NUM_CANONICAL_BOARDS, get_canonical_map
+from hand_index import HAND_PERM, NUM_CARDS, NUM_HANDS
+from value_table import RANK_DTYPE, load_value_table, rank_positions
+
+RANK_TABLE_FILE = "rank_table.npy"
+UNIQUE_COUNTS_FILE = "rank_unique_counts.npy"
+
+LIVE_HANDS = comb(NUM_CARDS - 5, 2)
+RANK_METHODS = ("rank_min", "rank_max", "rank_avg", "rank_dense")
+
+
+def rank_table_path():
+    return os.path.join(CACHE_DIR, RANK_TABLE_FILE)
+
+
+def build_rank_table(path=None, chunk_size=4096):
+    """
+    Ranks every hand on every canonical board from the value table and saves the result.
+
+    Returns:
+        (rank_table, unique_counts), memory-mapped read-only.
+    """
+    path = path or rank_table_path()
+    counts_path = os.path.join(os.path.dirname(os.path.abspath(path)), UNIQUE_COUNTS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+
+    values_table = load_value_table()
+    table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=RANK_DTYPE, shape=(NUM_CANONICAL_BOARDS, NUM_HANDS, 3))
+    unique_counts = np.empty(NUM_CANONICAL_BOARDS, dtype=RANK_DTYPE)
+
+    start_time = time.time()
+    for start in range(0, NUM_CANONICAL_BOARDS, chunk_size):
+        stop = min(start + chunk_size, NUM_CANONICAL_BOARDS)
+        table[start:stop], unique_counts[start:stop] = rank_positions(values_table[start:stop])
+        if (start // chunk_size) % 20 == 19 or stop == NUM_CANONICAL_BOARDS:
+            print(f"📐 Ranked {stop:,}/{NUM_CANONICAL_BOARDS:,} boards ({time.time() - start_time:.1f}s)")
+
+    table.flush()
+    del table
+    np.save(counts_path, unique_counts)
+    os.replace(tmp_path, path)
+    print(f"✅ Saved rank table -> {path}")
+    load_rank_table.cache_clear()
+    return load_rank_table(path)
+
+
+@lru_cache(maxsize=None)
+def load_rank_table(path=None, build=True):
+    """
+    Returns (rank_table, unique_counts), building the rank table first if needed.
+    """
+    path = path or rank_table_path()
+    counts_path = os.path.join(os.path.dirname(os.path.abspath(path)), UNIQUE_COUNTS_FILE)
+    if not os.path.exists(path) or not os.path.exists(counts_path):
+        if not build:
+            raise FileNotFoundError(f"Rank table '{path}' not found. Run build_rank_table() first.")
+        return build_rank_table(path)
+    return np.load(path, mmap_mode="r"), np.load(counts_path)
+
+
+def positions_to_percentiles(positions, unique_counts):
+    """
+    Converts [min, max, dense] positions to the four percentile columns.
+
+    Arguments:
+        positions: (..., 3) rank positions.
+        unique_counts: distinct values on each position's board, broadcastable to positions[..., 0].
+
+    Returns:
+        Dictionary of rank_min, rank_max, rank_avg and rank_dense arrays, NaN for blocked hands.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    blocked = positions[..., 0] < 0
+    denom = LIVE_HANDS - 1
+    denom_dense = np.maximum(np.asarray(unique_counts, dtype=np.float64) - 1, 1)
+    percentiles = {
+        "rank_min": positions[..., 0] / denom,
+        "rank_max": positions[..., 1] / denom,
+        "rank_avg": (positions[..., 0] + positions[..., 1]) / 2 / denom,
+        "rank_dense": positions[..., 2] / denom_dense,
+    }
+    for values in percentiles.values():
+        values[blocked] = np.nan
+    return percentiles
+
+
+def board_rank_positions(boards, hands, table=None):
+    """
+    Reads rank positions on actual boards (colex indices) through the canonical map.
+
+    Arguments:
+        boards: colex board indices.
+        hands: hand indices, broadcastable against boards.
+        table: optional (rank_table, unique_counts) pair.
+
+    Returns:
+        (positions, unique_counts): (..., 3) positions and the matching unique counts.
+    """
+    rank_table, unique_counts = load_rank_table() if table is None else table
+    rows, perms = get_canonical_map()
+    boards = np.asarray(boards)
+    board_rows = rows[boards]
+    canonical_hands = HAND_PERM[perms[boards], hands]
+    return rank_table[board_rows, canonical_hands], unique_counts[board_rows]
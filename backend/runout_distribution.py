@@ -0,0 +1,290 @@
+"""
+Flop- and turn-conditioned rank distributions.
+
+A partial board (3 or 4 cards) is completed with every turn/river runout and the
+hand's river percentiles are read from the rank table, which memoizes the
+ranking of every canonical river board. The resulting distributions use the
+same rank_min/rank_max/rank_avg/rank_dense percentiles as the evaluations table.
+
+The 22,100 flops reduce to 1,755 canonical flops by suit isomorphism. Their
+per-hand distributions can be precomputed in parallel into a compact uint16
+table (build_flop_table) and read back instantly (lookup_flop_distribution).
+Turns have only 46 runouts and are computed on demand.
+"""
+import os
+import time
+import numpy as np
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+from multiprocessing import Pool
+
+from board_index import BINOM, CACHE_DIR, colex_indices
+from hand_index import (
+    CARD_PERM, HAND_MASKS, HAND_PERM, NUM_CARDS, NUM_HANDS,
+    cards_from_str, cards_mask, hand_index,
+)
+from holdem_rank_distribution import bin_rank_ranges
+from rank_table import RANK_METHODS, board_rank_positions, load_rank_table, positions_to_percentiles, rank_table_path
+
+FLOP_SIZE = 3
+NUM_FLOPS = comb(NUM_CARDS, FLOP_SIZE)
+FLOP_TABLE_FILE = "flop_distributions.npy"
+FLOP_TABLE_DTYPE = np.uint16
+FLOP_TABLE_SCALE = np.iinfo(FLOP_TABLE_DTYPE).max
+
+# Distribution stored in the flop table: each runout's [rank_min, rank_max] range
+# spread over the bins, as plot_rank_distribution does.
+SPREAD = "spread"
+
+
+def _to_cards(board):
+    cards = cards_from_str(board) if isinstance(board, str) else [int(c) for c in board]
+    if len(cards) not in (3, 4):
+        raise ValueError(f"Expected a 3- or 4-card board, got {len(cards)} cards")
+    if len(set(cards)) != len(cards):
+        raise ValueError("Board contains duplicate cards")
+    return cards
+
+
+def _to_hand(hand):
+    return hand_index(hand) if isinstance(hand, str) else int(hand)
+
+
+def runout_boards(board):
+    """
+    Enumerates every river board that completes a partial board.
+
+    Arguments:
+        board: 3 or 4 cards, as a string ("AhKd7c") or card indices.
+
+    Returns:
+        (boards, runouts): colex indices of the completed boards and the added cards.
+    """
+    cards = _to_cards(board)
+    remaining = [c for c in range(NUM_CARDS) if c not in cards]
+    runouts = np.array(list(combinations(remaining, 5 - len(cards))), dtype=np.int64)
+    full = np.concatenate([np.broadcast_to(cards, (len(runouts), len(cards))), runouts], axis=1)
+    return colex_indices(full), runouts
+
+
+def runout_percentiles(board, hands, table=None):
+    """
+    River percentiles of hands on every runout of a partial board.
+
+    Arguments:
+        board: 3 or 4 cards, as a string or card indices.
+        hands: a hand ("AhQd"), a hand index, or an array of hand indices.
+        table: optional (rank_table, unique_counts) pair.
+
+    Returns:
+        Dictionary with the colex 'boards' and (runouts, hands) arrays of rank_min,
+        rank_max, rank_avg and rank_dense, NaN where a hand collides with the runout.
+    """
+    boards, _ = runout_boards(board)
+    single = isinstance(hands, (str, int, np.integer))
+    hands = np.atleast_1d(_to_hand(hands) if single else np.asarray(hands))
+    positions, unique_counts = board_rank_positions(boards[:, None], hands[None, :], table=table)
+    percentiles = positions_to_percentiles(positions, unique_counts)
+    if single:
+        percentiles = {method: values[:, 0] for method, values in percentiles.items()}
+    percentiles["boards"] = boards
+    return percentiles
+
+
+def runout_histograms(percentiles, num_bins=100):
+    """
+    Folds (runouts, hands) percentiles into per-hand histograms.
+
+    Arguments:
+        percentiles: dictionary from runout_percentiles() for an array of hands.
+        num_bins: the number of bins.
+
+    Returns:
+        Dictionary mapping 'spread' and each rank method to a (hands, num_bins) array of
+        probabilities. 'spread' spreads each [rank_min, rank_max] range uniformly over
+        its bins; the rank methods are point histograms. Hands blocked by the board
+        have all-zero rows.
+    """
+    rmin, rmax = percentiles["rank_min"], percentiles["rank_max"]
+    num_hands = rmin.shape[1]
+    histograms = {SPREAD: np.zeros((num_hands, num_bins))}
+    for h in range(num_hands):
+        histograms[SPREAD][h] = bin_rank_ranges(rmin[:, h], rmax[:, h], num_bins=num_bins)
+
+    for method in RANK_METHODS:
+        values = percentiles[method]
+        live = ~np.isnan(values)
+        bins = np.minimum((np.where(live, values, 0) * num_bins).astype(np.int64), num_bins - 1)
+        counts = np.zeros((num_hands, num_bins))
+        np.add.at(counts, (np.broadcast_to(np.arange(num_hands), bins.shape)[live], bins[live]), 1)
+        histograms[method] = counts
+
+    for method, counts in histograms.items():
+        totals = counts.sum(axis=1, keepdims=True)
+        histograms[method] = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+    return histograms
+
+
+def runout_distribution(board, hand, num_bins=100, table=None):
+    """
+    Distribution of a hand's river percentile given a flop or turn.
+
+    Arguments:
+        board: 3 or 4 cards, as a string ("AhKd7c") or card indices.
+        hand: hand string or hand index; must not share a card with the board.
+        num_bins: the number of bins.
+        table: optional (rank_table, unique_counts) pair.
+
+    Returns:
+        Dictionary with 'spread' and each rank method's num_bins probabilities, the
+        expected percentiles ('mean_<method>') and the number of 'runouts'.
+    """
+    hand = _to_hand(hand)
+    if HAND_MASKS[hand] & cards_mask(_to_cards(board)):
+        raise ValueError("Hand shares a card with the board")
+    percentiles = runout_percentiles(board, np.array([hand]), table=table)
+    live = ~np.isnan(percentiles["rank_min"][:, 0])
+
+    result = {method: values[0] for method, values in runout_histograms(percentiles, num_bins).items()}
+    for method in RANK_METHODS:
+        result[f"mean_{method}"] = float(percentiles[method][live, 0].mean())
+    result["runouts"] = int(live.sum())
+    return result
+
+
+# Canonical flops
+def _flop_indices(flop_cards):
+    sorted_cards = np.sort(np.asarray(flop_cards, dtype=np.int64), axis=-1)
+    return BINOM[sorted_cards, np.arange(1, FLOP_SIZE + 1)].sum(axis=-1)
+
+
+@lru_cache(maxsize=None)
+def get_flop_map():
+    """
+    Maps every flop onto its canonical flop.
+
+    Returns:
+        canonical_flops: (1755, 3) card indices of the canonical flops.
+        rows: canonical row of each flop, indexed by the flop's colex index.
+        perms: index of the suit permutation taking each flop onto its canonical flop.
+    """
+    flops = np.array(list(combinations(range(NUM_CARDS), FLOP_SIZE)), dtype=np.int64)
+    flops = flops[np.argsort(_flop_indices(flops))]
+
+    # The canonical flop is the suit relabelling with the smallest colex index.
+    relabelled = _flop_indices(CARD_PERM[:, flops].astype(np.int64))  # (permutations, flops)
+    perms = np.argmin(relabelled, axis=0).astype(np.uint8)
+    canonical_index = relabelled[perms, np.arange(NUM_FLOPS)]
+    canonical, rows = np.unique(canonical_index, return_inverse=True)
+    return flops[canonical], rows.astype(np.int16), perms
+
+
+def flop_table_path():
+    return os.path.join(CACHE_DIR, FLOP_TABLE_FILE)
+
+
+_worker_table = None
+
+
+def _init_worker(table_path):
+    global _worker_table
+    _worker_table = load_rank_table(table_path, build=False)
+
+
+def _flop_histograms(args):
+    row, flop, num_bins = args
+    percentiles = runout_percentiles(flop, np.arange(NUM_HANDS), table=_worker_table)
+    histogram = runout_histograms(percentiles, num_bins)[SPREAD]
+    return row, np.rint(histogram * FLOP_TABLE_SCALE).astype(FLOP_TABLE_DTYPE)
+
+
+def build_flop_table(path=None, processes=None, num_bins=100, table_path=None):
+    """
+    Precomputes the spread distribution of every hand on every canonical flop.
+
+    Arguments:
+        path: output .npy file. Defaults to cache/flop_distributions.npy.
+        processes: worker processes (default: all cores).
+        num_bins: the number of bins.
+        table_path: rank table location.
+
+    Returns:
+        The (1755, 1326, num_bins) uint16 table, memory-mapped read-only. Each row holds
+        probabilities scaled by 65,535; hands blocked by the flop are all zero.
+    """
+    path = path or flop_table_path()
+    table_path = table_path or rank_table_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+
+    load_rank_table(table_path)  # make sure the rank table exists before forking
+    canonical_flops, _, _ = get_flop_map()
+    table = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=FLOP_TABLE_DTYPE, shape=(len(canonical_flops), NUM_HANDS, num_bins)
+    )
+    tasks = [(row, flop, num_bins) for row, flop in enumerate(canonical_flops)]
+
+    start_time = time.time()
+    with Pool(processes, initializer=_init_worker, initargs=(table_path,)) as pool:
+        for done, (row, histogram) in enumerate(pool.imap_unordered(_flop_histograms, tasks), 1):
+            table[row] = histogram
+            if done % 50 == 0 or done == len(tasks):
+                print(f"🃏 {done:,}/{len(tasks):,} flops ({time.time() - start_time:.1f}s)")
+
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+    print(f"✅ Saved flop distributions -> {path}")
+    load_flop_table.cache_clear()
+    return load_flop_table(path)
+
+
+@lru_cache(maxsize=None)
+def load_flop_table(path=None, build=True):
+    """
+    Returns the memory-mapped flop distribution table, building it first if needed.
+    """
+    path = path or flop_table_path()
+    if not os.path.exists(path):
+        if not build:
+            raise FileNotFoundError(f"Flop table '{path}' not found. Run build_flop_table() first.")
+        return build_flop_table(path)
+    return np.load(path, mmap_mode="r")
+
+
+def lookup_flop_distribution(flop, hand, table=None):
+    """
+    Reads a hand's precomputed spread distribution on a flop.
+
+    Arguments:
+        flop: 3 cards, as a string ("AhKd7c") or card indices.
+        hand: hand string or hand index.
+        table: optional preloaded flop table.
+
+    Returns:
+        float64 array of bin probabilities.
+    """
+    cards = _to_cards(flop)
+    if len(cards) != FLOP_SIZE:
+        raise ValueError("Precomputed distributions only exist for flops; use runout_distribution() for turns")
+    hand = _to_hand(hand)
+    if HAND_MASKS[hand] & cards_mask(cards):
+        raise ValueError("Hand shares a card with the board")
+
+    table = load_flop_table() if table is None else table
+    _, rows, perms = get_flop_map()
+    flop_index = int(_flop_indices(cards))
+    return table[rows[flop_index], HAND_PERM[perms[flop_index], hand]] / FLOP_TABLE_SCALE
+
+
+def main():
+
+    print(runout_distribution("AhKd7c", "QsQd")["mean_rank_avg"])
+    print(runout_distribution("AhKd7c2s", "AsQd")["mean_rank_avg"])
+    # build_flop_table()
+    # print(lookup_flop_distribution("AhKd7c", "QsQd"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Read-only lookup tables shared between worker processes.
+
+The parent process places numpy arrays in multiprocessing.shared_memory blocks
+once; workers attach to them by name and get zero-copy views. Large tables that
+already live in .npy files (value and rank tables, board caches) are instead
+memory-mapped, so every worker shares them through the page cache.
+
+phevaluator's own lookup tables are not managed here. The native build keeps them
+in the read-only data of its extension module, which the OS already maps once for
+all processes. A pure-Python phevaluator instead loads them as Python lists in
+every worker. Forked workers start out sharing those pages, but reference counting
+gradually copies them, so each worker pays for its own copy.
+
+Typical use:
+
+    with SharedTables({"board_cards": cards}) as tables:
+        with tables.pool(processes) as pool:
+            pool.map(work, chunks)   # workers call get_shared("board_cards")
+"""
+import sys
+import numpy as np
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+# Arrays attached in this process by table name and by block name, and the blocks
+# keeping them alive. Forked workers inherit the parent's views.
+_attached = {}
+_attached_by_block = {}
+_attached_blocks = []
+
+
+class SharedTables:
+    """
+    Owner of a set of named read-only arrays in shared memory.
+
+    Arguments:
+        arrays: optional dict of name -> array to publish immediately.
+    """
+
+    def __init__(self, arrays=None):
+        self._blocks = []
+        self.handles = {}
+        for name, array in (arrays or {}).items():
+            self.add(name, array)
+
+    def add(self, name, array):
+        """
+        Copies an array into a new shared memory block.
+
+        Returns:
+            The shared view of the array.
+        """
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        shared.flags.writeable = False
+        self.handles[name] = (block.name, array.shape, array.dtype.str)
+        _attached[name] = _attached_by_block[block.name] = shared
+        return shared
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self._blocks)
+
+    def pool(self, processes=None, initializer=None, initargs=()):
+        """
+        Returns a Pool whose workers attach to these tables before running initializer.
+        """
+        return Pool(processes, initializer=_init_worker, initargs=(self.handles, initializer, initargs))
+
+    def close(self):
+        """
+        Releases the shared memory blocks. Views handed out by add() become invalid.
+        """
+        for name, (block_name, _, _) in self.handles.items():
+            _attached.pop(name, None)
+            _attached_by_block.pop(block_name, None)
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self.handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def attach_tables(handles):
+    """
+    Attaches to tables published by SharedTables (in a worker process).
+
+    Arguments:
+        handles: SharedTables.handles of the parent.
+
+    Returns:
+        Dict of name -> read-only array backed by the shared block.
+    """
+    arrays = {}
+    for name, (block_name, shape, dtype) in handles.items():
+        if block_name in _attached_by_block:
+            _attached[name] = arrays[name] = _attached_by_block[block_name]
+            continue
+        block = _open_block(block_name)
+        _attached_blocks.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _attached[name] = arrays[name] = _attached_by_block[block_name] = array
+    return arrays
+
+
+def _open_block(block_name):
+    # Only the owning process may unlink a block; attaching workers must not track it.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=block_name, track=False)
+    block = shared_memory.SharedMemory(name=block_name)
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def get_shared(name):
+    """
+    Returns an attached shared array by name.
+    """
+    try:
+        return _attached[name]
+    except KeyError:
+        raise KeyError(f"Shared table '{name}' is not attached in this process") from None
+
+
+def _init_worker(handles, initializer, initargs):
+    attach_tables(handles)
+    if initializer is not None:
+        initializer(*initargs)
+
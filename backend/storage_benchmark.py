@@ -0,0 +1,155 @@
+"""
+Benchmark of the storage backends on the pipeline's own workload.
+
+Loads the hands and boards tables and the evaluations of a sample of boards
+from every suit pattern, then times the aggregate queries the pipeline runs:
+
+    count          get_evaluations_count()
+    board_counts   rows per board (verify_evaluations.count_rows)
+    stale_boards   get_stale_board_ids() for incremental maintenance
+    suitedness     get_evaluations_for_suitedness("AKs") (rank distributions)
+    rank_ranges    stream_rank_ranges() of one hand class (rank_service)
+    pattern_avg    get_pattern_averages(): average rank per suit pattern and hand class
+
+Each query is run several times and the best time is reported, so runs on
+different backends or machines can be compared. The sample loaded is the same
+for every backend: the first boards_per_pattern canonical boards of each pattern.
+
+Recorded SQLite and PostgreSQL results are summarized in the embedded_db
+docstring.
+
+The benchmark truncates and refills the tables of the database it runs on. The
+SQLite backend therefore defaults to its own cache/benchmark.sqlite3 file; the
+PostgreSQL backend uses the database of config.json.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from board_index import BOARD_PATTERNS, CACHE_DIR, PatternBoards
+from db import BACKENDS, EVALUATION_COLUMNS, VERSIONED_EVALUATION_COLUMNS, open_db
+from db_operations import EVALUATOR_VERSION, create_boards_table, create_hands_table
+from embedded_db import SQLiteDB
+from evaluation_shards import evaluation_columns
+from rank_table import LIVE_HANDS
+from verify_evaluations import count_rows
+
+BENCHMARK_DB_FILE = "benchmark.sqlite3"
+BENCHMARK_HAND_CLASS = "AKs"
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def load_sample(db, boards_per_pattern=500, chunk_size=100):
+    """
+    Recreates the tables and loads the evaluations of boards_per_pattern boards per pattern.
+
+    Returns:
+        Dictionary of load timings and row counts.
+    """
+    db.init_schema()
+    db.truncate_table("evaluations")
+    _, hands_seconds = _timed(lambda: create_hands_table(db))
+    _, boards_seconds = _timed(lambda: create_boards_table(db))
+    db.ensure_evaluator_version_column()
+
+    rows_loaded = 0
+    evaluate_seconds = insert_seconds = 0.0
+    for pattern in range(len(BOARD_PATTERNS)):
+        boards = PatternBoards(pattern)
+        indices = np.arange(min(boards_per_pattern, len(boards)))
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start:start + chunk_size]
+            columns, seconds = _timed(lambda: evaluation_columns(boards.offset + chunk + 1, boards.cards(chunk)))
+            evaluate_seconds += seconds
+            rows = [
+                row + (EVALUATOR_VERSION,)
+                for row in zip(*(columns[name].tolist() for name in EVALUATION_COLUMNS))
+            ]
+            _, seconds = _timed(lambda: db.bulk_insert_evaluations(rows, columns=VERSIONED_EVALUATION_COLUMNS))
+            insert_seconds += seconds
+            rows_loaded += len(rows)
+
+    return {
+        "hands_seconds": hands_seconds,
+        "boards_seconds": boards_seconds,
+        "evaluate_seconds": evaluate_seconds,
+        "insert_seconds": insert_seconds,
+        "rows": rows_loaded,
+        "rows_per_second": rows_loaded / insert_seconds if insert_seconds else 0.0,
+    }
+
+
+def benchmark_queries(db, repeat=3):
+    """
+    Times the aggregate queries of the pipeline.
+
+    Returns:
+        Dictionary of query name -> {"seconds": best time, "rows": result rows}.
+    """
+    hand_ids = [hand_id for hand_str, hand_id in db.get_hand_ids().items()
+                if hand_str[0] == BENCHMARK_HAND_CLASS[0] and hand_str[2] == BENCHMARK_HAND_CLASS[1]
+                and hand_str[1] == hand_str[3]]
+    queries = {
+        "count": lambda: [db.get_evaluations_count()],
+        "board_counts": lambda: list(count_rows(db).items()),
+        "stale_boards": lambda: db.get_stale_board_ids(EVALUATOR_VERSION, LIVE_HANDS),
+        "suitedness": lambda: db.get_evaluations_for_suitedness(BENCHMARK_HAND_CLASS),
+        "rank_ranges": lambda: list(db.stream_rank_ranges(hand_ids)),
+        "pattern_avg": db.get_pattern_averages,
+    }
+
+    results = {}
+    for name, query in queries.items():
+        times = []
+        for _ in range(repeat):
+            rows, seconds = _timed(query)
+            times.append(seconds)
+        results[name] = {"seconds": min(times), "rows": len(rows)}
+        print(f"⏱️ {name:<13} {min(times) * 1000:10.1f} ms  ({len(rows):,} rows)")
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark loading and aggregate queries of a storage backend.")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite",
+                        help="Backend to benchmark. Its tables are truncated and refilled.")
+    parser.add_argument("--path", default=None,
+                        help=f"SQLite database file (default: <cache>/{BENCHMARK_DB_FILE}).")
+    parser.add_argument("--boards-per-pattern", type=int, default=500, help="Boards loaded from each suit pattern.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the best time is reported.")
+    parser.add_argument("--skip-load", action="store_true", help="Query the data already in the database.")
+    parser.add_argument("--report", default=None, help="Optional JSON report path.")
+    args = parser.parse_args()
+
+    if args.backend == "sqlite":
+        db = SQLiteDB(args.path or os.path.join(CACHE_DIR, BENCHMARK_DB_FILE))
+    else:
+        db = open_db(backend=args.backend)
+
+    report = {"backend": args.backend}
+    if not args.skip_load:
+        report["load"] = load_sample(db, boards_per_pattern=args.boards_per_pattern)
+        load = report["load"]
+        print(f"📥 Loaded {load['rows']:,} evaluations in {load['insert_seconds']:.1f}s "
+              f"({load['rows_per_second']:,.0f} rows/s)")
+    report["queries"] = benchmark_queries(db, repeat=args.repeat)
+    db.close()
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved benchmark report -> {args.report}")
+
+    # python storage_benchmark.py --backend postgres --boards-per-pattern 500 --report postgres.json
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import pytest
+
+from board_index import BOARD_PATTERNS, PatternBoards
+from check_database import board_suit_shape, check_suit_pattern_counts, pattern_weights
+from embedded_db import SQLiteDB
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDB(str(tmp_path / "boards.sqlite3"))
+    db.init_schema()
+    yield db
+    db.close()
+
+
+def _load_boards(db, numbering):
+    for suit_pattern, pattern in enumerate(numbering):
+        db.bulk_insert_boards(PatternBoards(BOARD_PATTERNS.index(pattern)).board_strs()[:20], suit_pattern)
+
+
+def test_board_suit_shape():
+    assert board_suit_shape("AsKsQsJhTh") == (3, 2, 0, 0)
+    assert board_suit_shape("2c3d4h5s6s") == (2, 1, 1, 1)
+
+
+def test_matching_numbering_is_trusted(db):
+    _load_boards(db, BOARD_PATTERNS)
+    assert check_suit_pattern_counts(db) == {}
+    assert list(pattern_weights(db)) == [4, 12, 12, 12, 12, 4]
+
+
+def test_legacy_numbering_is_rejected(db):
+    # holdem_evaluations.recreate_board_table used to number the last two patterns the other way round.
+    legacy = BOARD_PATTERNS[:4] + [BOARD_PATTERNS[5], BOARD_PATTERNS[4]]
+    _load_boards(db, legacy)
+    assert set(check_suit_pattern_counts(db)) == {4, 5}
+    with pytest.raises(ValueError):
+        pattern_weights(db)
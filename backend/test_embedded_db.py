@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from db import StorageBackend
+from db_operations import generate_hands
+from embedded_db import SQLiteDB
+from hand_index import cards_from_str
+from incremental_evaluations import evaluation_rows
+from value_table import evaluate_boards_values
+
+BOARDS_BY_PATTERN = {0: ["AsKsQsJhTh", "2c3d4h5s7s"], 3: ["9h9d9c2s2h", "AcKdQh7s5c", "8s8h3d3c2h"]}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDB(str(tmp_path / "evaluations.sqlite3"))
+    db.init_schema()
+    hand_id_map = db.copy_hands(generate_hands(), first_id=1)
+    hand_ids = np.array(list(hand_id_map.values()))
+    for suit_pattern, boards in BOARDS_BY_PATTERN.items():
+        board_id_map = db.bulk_insert_boards(boards, suit_pattern)
+        board_ids = np.array([board_id_map[board] for board in boards])
+        values = evaluate_boards_values(np.array([cards_from_str(board) for board in boards]))
+        db.bulk_insert_evaluations(evaluation_rows(board_ids, values, hand_ids))
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("chunk_boards", [1, 2, 32])
+def test_pattern_averages_match_join_query(db, chunk_boards):
+    expected = StorageBackend.get_pattern_averages(db)
+    result = db.get_pattern_averages(chunk_boards=chunk_boards)
+
+    assert len(result) == 2 * 169
+    assert [row[:3] for row in result] == [row[:3] for row in expected]
+    np.testing.assert_allclose([row[3] for row in result], [row[3] for row in expected])
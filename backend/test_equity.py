@@ -0,0 +1,50 @@
+import pytest
+
+from equity import HEADS_UP_RUNOUTS, hand_vs_hand, load_preflop_hand_table, preflop_hand_counts, preflop_hand_equity
+from value_table import load_value_table
+
+# (wins, ties) of the first hand over all 1,712,304 runouts, from brute-force phevaluator
+# enumeration (range_equity.brute_force_range_vs_range).
+MATCHUPS = {
+    ("AsKd", "AcKh"): (37210, 1637884),
+    ("AhAd", "KsKc"): (1388072, 6538),
+    ("AhKh", "QsQd"): (787966, 6732),
+    ("7h2c", "8d9d"): (462647, 48508),
+}
+
+
+# The exact tables take hours to build on one core, so these tests only run where
+# they have been built (equity.build_preflop_hand_table, value_table.build_value_table).
+@pytest.fixture(scope="module")
+def counts():
+    try:
+        return load_preflop_hand_table(build=False)
+    except FileNotFoundError as e:
+        pytest.skip(str(e))
+
+
+@pytest.fixture(scope="module")
+def value_table():
+    try:
+        return load_value_table(build=False)
+    except FileNotFoundError as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize("hand1, hand2", list(MATCHUPS))
+def test_preflop_table_matches_brute_force(counts, hand1, hand2):
+    wins, ties = MATCHUPS[hand1, hand2]
+    assert preflop_hand_counts(hand1, hand2, counts) == (wins, ties, HEADS_UP_RUNOUTS)
+    # The reverse matchup is looked up through the other hand's class.
+    assert preflop_hand_counts(hand2, hand1, counts) == (HEADS_UP_RUNOUTS - wins - ties, ties, HEADS_UP_RUNOUTS)
+
+
+@pytest.mark.parametrize("hand1, hand2", list(MATCHUPS))
+def test_preflop_table_matches_value_table(counts, value_table, hand1, hand2):
+    assert preflop_hand_equity(hand1, hand2, counts) == hand_vs_hand(hand1, hand2, value_table)
+
+
+def test_same_ranks_split_evenly(counts):
+    result = preflop_hand_equity("AsKd", "AcKh", counts)
+    assert result["equity"] == 0.5
+    assert result["win"] == result["lose"]
@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+
+from board_index import PATTERN_SIZES, PatternBoards
+from embedded_db import SQLiteDB
+from evaluation_shards import COLUMN_DTYPES, MANIFEST_FILE, concatenate_artifacts, load_artifacts
+
+
+def _board_ids(pattern):
+    offset = PatternBoards(pattern).offset
+    return [offset + 1, offset + PATTERN_SIZES[pattern]]
+
+
+def _artifact(path, pattern, board_ids):
+    os.makedirs(path)
+    columns = {name: np.zeros(len(board_ids), dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+    columns["board_id"][:] = board_ids
+    columns["hand_id"][:] = 7
+    np.savez(os.path.join(path, "part.npz"), **columns)
+    manifest = {"shard_index": 0, "patterns": [pattern], "evaluator_version": 1, "columns": {}, "boards": 1,
+                "rows": len(board_ids), "parts": [{"file": "part.npz", "pattern": pattern, "first_board_id": 0}]}
+    return [(str(path), manifest)]
+
+
+def _stored(db):
+    db.cursor.execute("SELECT board_id, hand_id FROM evaluations ORDER BY board_id;")
+    return db.cursor.fetchall()
+
+
+def test_load_keeps_other_patterns(tmp_path):
+    db = SQLiteDB(str(tmp_path / "evaluations.sqlite3"))
+    db.init_schema()
+    kept = _board_ids(1)
+    db.bulk_insert_evaluations([(board_id, 1, 0, 0.0, 0.0, 0.0, 0.0) for board_id in _board_ids(0) + kept])
+
+    new = _board_ids(0)[:1]
+    load_artifacts(db, _artifact(tmp_path / "pattern-0", 0, new))
+    assert _stored(db) == [(new[0], 7)] + [(board_id, 1) for board_id in kept]
+    db.close()
+
+
+def test_concatenate_replaces_manifest(tmp_path):
+    artifacts = _artifact(tmp_path / "pattern-0", 0, _board_ids(0))
+    out_path = str(tmp_path / "combined")
+    concatenate_artifacts(artifacts, out_path)
+    concatenate_artifacts(artifacts, out_path)
+    assert sorted(os.listdir(out_path)) == [MANIFEST_FILE, "shard-001-part.npz"]
+    with open(os.path.join(out_path, MANIFEST_FILE)) as f:
+        assert json.load(f)["rows"] == 2
@@ -0,0 +1,22 @@
+import json
+import tracemalloc
+
+import pytest
+
+from db_operations import generate_hands
+from holdem_evaluations import run_evaluation
+
+
+class FailingDB:
+    def bulk_insert_evaluations(self, data, instrumentation=None):
+        raise RuntimeError("insert failed")
+
+
+def test_failed_run_stops_profiling_and_writes_summary(tmp_path):
+    hand_id_map = {hand_str: hand_id for hand_id, hand_str in enumerate(generate_hands(), 1)}
+    summary_path = tmp_path / "summary.json"
+    with pytest.raises(RuntimeError, match="insert failed"):
+        run_evaluation(FailingDB(), hand_id_map, {"AsKsQsJhTh": 1}, profile="all", summary_path=str(summary_path))
+    assert not tracemalloc.is_tracing()
+    with open(summary_path) as f:
+        assert json.load(f)["counters"]["boards_evaluated"] == 1
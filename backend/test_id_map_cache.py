@@ -0,0 +1,25 @@
+import numpy as np
+
+from id_map_cache import load_snapshot, save_snapshot
+
+
+def _arrays(n):
+    return {"ids": np.arange(1, n + 1, dtype=np.int32), "strs": np.array(["x"] * n, dtype=np.bytes_)}
+
+
+def test_new_snapshot_prunes_stale_ones(tmp_path):
+    old = str(tmp_path / "hands-abc-000.npz")
+    new = str(tmp_path / "hands-abc-111.npz")
+    save_snapshot(old, _arrays(2))
+    save_snapshot(new, _arrays(3))
+    assert not (tmp_path / "hands-abc-000.npz").exists()
+    assert len(load_snapshot(new)["ids"]) == 3
+
+
+def test_pruning_skips_in_flight_files(tmp_path):
+    # Another worker's temp file for the same table must survive until it is renamed.
+    in_flight = tmp_path / "hands-abc-222.npz.4242.tmp"
+    in_flight.write_bytes(b"partial")
+    save_snapshot(str(tmp_path / "hands-abc-111.npz"), _arrays(3))
+    assert in_flight.exists()
+    assert [p.name for p in tmp_path.glob("*.npz")] == ["hands-abc-111.npz"]
@@ -0,0 +1,60 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from db_operations import generate_hands
+from embedded_db import SQLiteDB
+from incremental_evaluations import (
+    RANK_METHODS, backfill_rank_column, evaluation_rows, load_rank_method, register_rank_method,
+)
+from value_table import evaluate_boards_values
+from hand_index import cards_from_str
+
+BOARDS = ["AsKsQsJhTh", "2c3d4h5s7s", "9h9d9c2s2h"]
+
+
+def value_share(values):
+    """
+    Custom rank method for the tests: hand value scaled to [0, 1].
+    """
+    return np.where(values < 32767, values / 7462.0, np.nan)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "evaluations.sqlite3")
+    monkeypatch.setenv("POKER_DB_BACKEND", "sqlite")
+    monkeypatch.setenv("POKER_DB_PATH", path)
+    db = SQLiteDB(path)
+    db.init_schema()
+    hand_id_map = db.copy_hands(generate_hands(), first_id=1)
+    board_id_map = db.bulk_insert_boards(BOARDS, 0)
+    board_ids = np.array([board_id_map[board] for board in BOARDS])
+    values = evaluate_boards_values(np.array([cards_from_str(board) for board in BOARDS]))
+    hand_ids = np.array(list(hand_id_map.values()))
+    db.bulk_insert_evaluations(evaluation_rows(board_ids, values, hand_ids))
+    db.close()
+    yield path
+    RANK_METHODS.pop("rank_share", None)
+
+
+def test_load_rank_method():
+    assert load_rank_method("test_incremental_evaluations:value_share") is value_share
+    with pytest.raises(ValueError):
+        load_rank_method("value_share")
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_backfill_registered_method_reaches_workers(db_path, start_method, monkeypatch):
+    context = multiprocessing.get_context(start_method)
+    monkeypatch.setattr("shared_tables.Pool", context.Pool)
+    register_rank_method("rank_share", load_rank_method("test_incremental_evaluations:value_share"))
+
+    db = SQLiteDB(db_path)
+    assert backfill_rank_column(db, "rank_share", processes=1) == len(BOARDS)
+    assert db.get_board_ids_missing_column("rank_share") == []
+    db.cursor.execute("SELECT hand_value, rank_share FROM evaluations;")
+    rows = np.array(db.cursor.fetchall())
+    db.close()
+    np.testing.assert_allclose(rows[:, 1], rows[:, 0] / 7462.0)
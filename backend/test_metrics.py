@@ -0,0 +1,32 @@
+import time
+
+from metrics import PrometheusMetrics
+
+
+def _rate(text, name):
+    for line in text.splitlines():
+        if line.startswith(f"poker_{name}_per_second "):
+            return float(line.split()[1])
+    raise AssertionError(f"no rate for {name}")
+
+
+def test_consumers_keep_separate_rate_windows():
+    metrics = PrometheusMetrics()
+    metrics.inc("rows_written", 1000)
+    time.sleep(0.01)
+
+    assert _rate(metrics.render(consumer="http"), "rows_written") > 0
+    # The HTTP scrape must not reset the textfile writer's window.
+    assert _rate(metrics.render(consumer="textfile"), "rows_written") > 0
+    # Without new rows, each consumer's next window is empty.
+    assert _rate(metrics.render(consumer="http"), "rows_written") == 0
+    assert _rate(metrics.render(consumer="textfile"), "rows_written") == 0
+
+
+def test_counters_render_totals():
+    metrics = PrometheusMetrics()
+    metrics.inc("boards_evaluated", 3, pattern="p0")
+    metrics.inc("boards_evaluated", 2, pattern="p1")
+    text = metrics.render()
+    assert 'poker_boards_evaluated_total{pattern="p0"} 3' in text
+    assert 'poker_boards_evaluated_total{pattern="p1"} 2' in text
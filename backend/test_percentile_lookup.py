@@ -0,0 +1,16 @@
+import pytest
+
+from board_index import NUM_BOARDS
+from percentile_lookup import board_colex_index
+
+
+def test_board_colex_index():
+    assert board_colex_index(7) == 7
+    assert board_colex_index("2c3c4c5c6c") == board_colex_index([19, 15, 11, 7, 3]) == 13182
+    assert board_colex_index([0, 1, 2, 3, 4]) == 0
+
+
+@pytest.mark.parametrize("board", [-1, NUM_BOARDS, "AsKsQsJh", "AsAsQsJhTh", "AsKsQsJhTx"])
+def test_board_colex_index_rejects_invalid_boards(board):
+    with pytest.raises(ValueError):
+        board_colex_index(board)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from board_index import NUM_BOARDS
+from range_equity import brute_force_range_vs_range, range_vs_range
+
+# Fixed board sample, so failures reproduce.
+BOARDS = np.random.default_rng(29).choice(NUM_BOARDS, size=40, replace=False)
+
+
+@pytest.mark.parametrize("hero, villain", [
+    ("AJs+, 77+", "KQo, 22-55"),
+    ("AhKh", "QQ"),
+])
+def test_range_vs_range_matches_brute_force(hero, villain):
+    exact = range_vs_range(hero, villain, boards=BOARDS)
+    reference = brute_force_range_vs_range(hero, villain, BOARDS)
+    for key in ("win", "tie", "lose", "equity"):
+        assert exact[key] == pytest.approx(reference[key], abs=1e-12)
+
+
+def test_range_vs_range_is_symmetric():
+    forward = range_vs_range("AJs+, 77+", "KQo, 22-55", boards=BOARDS)
+    backward = range_vs_range("KQo, 22-55", "AJs+, 77+", boards=BOARDS)
+    assert forward["win"] == pytest.approx(backward["lose"], abs=1e-12)
+    assert forward["tie"] == pytest.approx(backward["tie"], abs=1e-12)
@@ -0,0 +1,120 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from board_index import get_canonical_board_cards, get_canonical_map
+from chart_histograms import ChartHistograms
+from db_operations import generate_hands
+from embedded_db import SQLiteDB
+from hand_index import NUM_HANDS, cards_from_str, hand_index
+from hand_order import ORDER_DTYPE
+from incremental_evaluations import evaluation_rows
+from percentile_lookup import board_colex_index
+from rank_service import DatabaseSource, HistogramSource, RankDistributionService
+from rank_table import LIVE_HANDS
+from value_table import evaluate_boards_values, rank_positions
+
+
+class FailingSource(HistogramSource):
+    def hand_counts(self, hands):
+        raise RuntimeError("storage unavailable")
+
+
+async def _get(service, target):
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.split(b"\r\n")[0].decode(), body
+
+
+def _service(source_class=HistogramSource):
+    histograms = ChartHistograms()
+    histograms.counts[:] = np.random.default_rng(41).random(histograms.counts.shape)
+    return RankDistributionService(source_class(histograms), workers=1)
+
+
+def test_distribution():
+    status, body = asyncio.run(_get(_service(), "/distribution?hand=AKs"))
+    assert status == "HTTP/1.1 200 OK"
+    assert b'"hands":4' in body
+
+
+def test_unexpected_error_returns_json_500():
+    service = _service(FailingSource)
+    status, body = asyncio.run(_get(service, "/distribution?hand=AKs"))
+    assert status == "HTTP/1.1 500 Internal Server Error"
+    assert body == b'{"error":"internal server error"}'
+    assert 'service_requests_total{status="500"} 1' in service.render_metrics()
+
+
+def test_dead_cards_without_tables_return_503(tmp_path, monkeypatch):
+    monkeypatch.setattr("value_table.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("rank_table.CACHE_DIR", str(tmp_path))
+    status, body = asyncio.run(_get(_service(), "/distribution?hand=AQo&dead=KhKd"))
+    assert status == "HTTP/1.1 503 Service Unavailable"
+    assert b"not found" in body
+    assert not list(tmp_path.iterdir())
+
+
+def test_top_rejects_non_positive_n():
+    status, body = asyncio.run(_get(_service(), "/top?board=AsKsQsJhTh&n=0"))
+    assert status == "HTTP/1.1 400 Bad Request"
+    assert b"n=0" in body
+
+
+def test_top_without_tables_returns_503(tmp_path, monkeypatch):
+    monkeypatch.setattr("hand_order.CACHE_DIR", str(tmp_path))
+    status, _ = asyncio.run(_get(_service(), "/top?board=AsKsQsJhTh&n=5"))
+    assert status == "HTTP/1.1 503 Service Unavailable"
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.fixture
+def one_board_tables(monkeypatch):
+    """
+    Value, rank and order tables holding only the canonical row of AsKsQsJhTh.
+    Every row of the broadcast tables is that board, so no full table is built.
+    """
+    row = int(get_canonical_map()[0][board_colex_index("AsKsQsJhTh")])
+    values = evaluate_boards_values(get_canonical_board_cards()[row:row + 1])
+    positions, unique_counts = rank_positions(values)
+    order = np.argsort(values, axis=1, kind="stable")[:, :LIVE_HANDS].astype(ORDER_DTYPE)
+    tables = {
+        "value": np.broadcast_to(values, (row + 1, NUM_HANDS)),
+        "rank": (np.broadcast_to(positions, (row + 1, NUM_HANDS, 3)), np.broadcast_to(unique_counts, (row + 1,))),
+        "order": np.broadcast_to(order, (row + 1, LIVE_HANDS)),
+    }
+    monkeypatch.setattr("hand_order.load_value_table", lambda path=None, build=True: tables["value"])
+    monkeypatch.setattr("hand_order.load_rank_table", lambda path=None, build=True: tables["rank"])
+    monkeypatch.setattr("hand_order.load_order_table", lambda path=None, build=True: tables["order"])
+    return tables
+
+
+def test_top_hands(one_board_tables):
+    status, body = asyncio.run(_get(_service(), "/top?board=AsKsQsJhTh&n=2"))
+    assert status == "HTTP/1.1 200 OK"
+    assert body.startswith(b'{"board":"AsKsQsJhTh","hands":[{"hand":"JsTs","value":1,')
+
+
+def test_database_source_from_executor_threads(tmp_path):
+    db = SQLiteDB(str(tmp_path / "evaluations.sqlite3"))
+    db.init_schema()
+    hand_id_map = db.copy_hands(generate_hands(), first_id=1)
+    boards = {"AsKsQsJhTh": 2, "2c3d4h5s7s": 5}
+    board_ids = [db.bulk_insert_boards([board], pattern)[board] for board, pattern in boards.items()]
+    values = evaluate_boards_values(np.array([cards_from_str(board) for board in boards]))
+    db.bulk_insert_evaluations(evaluation_rows(np.array(board_ids), values, np.array(list(hand_id_map.values()))))
+
+    source = DatabaseSource(db)
+    with ThreadPoolExecutor(2) as executor:
+        counts = executor.submit(source.hand_counts, [hand_index("AhAd"), hand_index("AsAd")]).result()
+    db.close()
+    # Pattern weights: 12 for AsKsQsJhTh ([3, 2, 0, 0]), 4 for 2c3d4h5s7s; As is on the first board.
+    np.testing.assert_allclose(counts.sum(axis=1), [16.0, 4.0])
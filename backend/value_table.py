@@ -0,0 +1,223 @@
+"""
+Batch hand evaluation and the per-board hand value table.
+
+The value table is a (331,682 x 1,326) int16 array holding the phevaluator
+value of every hand on every canonical board (lower is stronger, as in the
+evaluations.hand_value column). Hands that share a card with the board hold
+BLOCKED_VALUE. Values on any of the 2,598,960 actual boards are read through
+the canonical board map and the matching suit permutation of the hand index.
+"""
+import os
+import time
+import numpy as np
+from multiprocessing import Pool
+from phevaluator import evaluate_cards
+
+from board_index import (
+    CACHE_DIR, NUM_CANONICAL_BOARDS, get_canonical_board_cards, get_canonical_map,
+)
+from hand_index import CARD_TO_PHEVAL, HAND_CARDS, HAND_MASKS, HAND_PERM, NUM_HANDS, cards_mask
+
+VALUE_DTYPE = np.int16
+BLOCKED_VALUE = np.iinfo(VALUE_DTYPE).max
+RANK_DTYPE = np.int16
+VALUE_TABLE_FILE = "value_table.npy"
+# Larger than any hand value, used to lay out many rows in one sorted array.
+_ROW_STRIDE = int(BLOCKED_VALUE) + 1
+
+_HAND_PHEVAL = [(int(CARD_TO_PHEVAL[c1]), int(CARD_TO_PHEVAL[c2])) for c1, c2 in HAND_CARDS]
+
+
+def evaluate_board_values(board_cards):
+    """
+    Evaluates all 1,326 hands on one board.
+
+    Arguments:
+        board_cards: 5 card indices.
+
+    Returns:
+        int16 array of hand values indexed by hand index, BLOCKED_VALUE where the
+        hand shares a card with the board.
+    """
+    b1, b2, b3, b4, b5 = (int(CARD_TO_PHEVAL[c]) for c in board_cards)
+    live = np.flatnonzero((HAND_MASKS & cards_mask(board_cards)) == 0)
+    hand_pheval = _HAND_PHEVAL
+    values = np.full(NUM_HANDS, BLOCKED_VALUE, dtype=VALUE_DTYPE)
+    values[live] = [evaluate_cards(*hand_pheval[h], b1, b2, b3, b4, b5) for h in live]
+    return values
+
+
+def evaluate_boards_values(boards_cards):
+    """
+    Evaluates all hands on each of several boards.
+
+    Returns:
+        (n, 1326) int16 array.
+    """
+    out = np.empty((len(boards_cards), NUM_HANDS), dtype=VALUE_DTYPE)
+    for i, board_cards in enumerate(boards_cards):
+        out[i] = evaluate_board_values(board_cards)
+    return out
+
+
+def rank_positions(values):
+    """
+    Rank positions for a batch of boards.
+
+    Arguments:
+        values: (B, 1326) hand values, BLOCKED_VALUE for blocked hands.
+
+    Returns:
+        positions: (B, 1326, 3) int16 array of [min, max, dense] positions, -1 if blocked.
+        unique_counts: (B,) number of distinct live hand values per board.
+    """
+    batch = np.asarray(values, dtype=np.int64)
+    num_boards = batch.shape[0]
+    live = batch != BLOCKED_VALUE
+
+    offsets = (np.arange(num_boards, dtype=np.int64) * (int(BLOCKED_VALUE) + 1))[:, None]
+    keyed = batch + offsets
+    sorted_keys = np.sort(keyed, axis=1)
+    flat_sorted = sorted_keys.ravel()
+    row_start = np.arange(num_boards)[:, None] * NUM_HANDS
+    left = np.searchsorted(flat_sorted, keyed, side="left") - row_start
+    right = np.searchsorted(flat_sorted, keyed, side="right") - row_start
+
+    is_new = np.ones_like(sorted_keys, dtype=bool)
+    is_new[:, 1:] = sorted_keys[:, 1:] != sorted_keys[:, :-1]
+    distinct_before = np.cumsum(is_new, axis=1) - 1
+    num_live = live.sum(axis=1)
+    unique_counts = distinct_before[np.arange(num_boards), np.maximum(num_live - 1, 0)] + 1
+
+    positions = np.stack([left, right - 1, np.take_along_axis(distinct_before, left, axis=1)], axis=2)
+    positions[~live] = -1
+    return positions.astype(RANK_DTYPE), unique_counts.astype(RANK_DTYPE)
+
+
+def row_searchsorted(sorted_values, query_rows, query_values):
+    """
+    Searches many independently sorted rows of hand values with one searchsorted call.
+
+    Arguments:
+        sorted_values: (R, n) hand values, each row sorted ascending.
+        query_rows: int array giving the row of each query.
+        query_values: hand values to search, shaped like query_rows.
+
+    Returns:
+        (below, at_or_below): number of values in each query's row strictly less than
+        and less than or equal to its value.
+    """
+    num_rows, n = sorted_values.shape
+    # Rows are offset by a stride above any hand value, so the batch is one sorted array.
+    offsets = np.arange(num_rows, dtype=np.int64) * _ROW_STRIDE
+    keys = (sorted_values.astype(np.int64) + offsets[:, None]).ravel()
+    query_rows = np.asarray(query_rows, dtype=np.int64)
+    queries = np.asarray(query_values, dtype=np.int64) + offsets[query_rows]
+    row_starts = query_rows * n
+    return (np.searchsorted(keys, queries, side="left") - row_starts,
+            np.searchsorted(keys, queries, side="right") - row_starts)
+
+
+def rank_percentiles(values):
+    """
+    Vectorized equivalent of rank_hands_for_board.
+
+    Arguments:
+        values: hand values indexed by hand index, either one board (1326,) or a
+            batch of boards (B, 1326). BLOCKED_VALUE marks blocked hands.
+
+    Returns:
+        (rank_min, rank_max, rank_avg, rank_dense) float64 arrays shaped like values,
+        NaN for blocked hands. 0 is the strongest hand on the board.
+    """
+    values = np.asarray(values)
+    batch = np.atleast_2d(values)
+    positions, unique_counts = rank_positions(batch)
+    positions = positions.astype(np.float64)
+    num_live = (batch != BLOCKED_VALUE).sum(axis=1, keepdims=True)
+    denom = np.maximum(num_live - 1, 1)
+    denom_dense = np.maximum(unique_counts.astype(np.float64) - 1, 1)[:, None]
+
+    rank_min = positions[..., 0] / denom
+    rank_max = positions[..., 1] / denom
+    rank_avg = (rank_min + rank_max) / 2
+    rank_dense = positions[..., 2] / denom_dense
+
+    ranks = []
+    for rank in (rank_min, rank_max, rank_avg, rank_dense):
+        rank[batch == BLOCKED_VALUE] = np.nan
+        ranks.append(rank.reshape(values.shape))
+    return tuple(ranks)
+
+
+def _evaluate_rows(bounds):
+    start, stop = bounds
+    return start, evaluate_boards_values(get_canonical_board_cards()[start:stop])
+
+
+def value_table_path():
+    return os.path.join(CACHE_DIR, VALUE_TABLE_FILE)
+
+
+def build_value_table(path=None, processes=None, chunk_size=1024):
+    """
+    Evaluates every hand on every canonical board and saves the value table.
+
+    Arguments:
+        path: output .npy file. Defaults to cache/value_table.npy.
+        processes: worker processes (default: all cores).
+        chunk_size: canonical boards per task.
+
+    Returns:
+        The value table, memory-mapped read-only.
+    """
+    path = path or value_table_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+
+    start_time = time.time()
+    get_canonical_board_cards()  # build the board cache once before forking
+    table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=VALUE_DTYPE, shape=(NUM_CANONICAL_BOARDS, NUM_HANDS))
+    bounds = [(i, min(i + chunk_size, NUM_CANONICAL_BOARDS)) for i in range(0, NUM_CANONICAL_BOARDS, chunk_size)]
+
+    with Pool(processes) as pool:
+        for done, (start, values) in enumerate(pool.imap_unordered(_evaluate_rows, bounds), 1):
+            table[start:start + len(values)] = values
+            if done % 50 == 0 or done == len(bounds):
+                print(f"🧮 Evaluated {min(done * chunk_size, NUM_CANONICAL_BOARDS):,}/{NUM_CANONICAL_BOARDS:,} boards "
+                      f"({time.time() - start_time:.1f}s)")
+
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+    print(f"✅ Saved value table -> {path}")
+    return np.load(path, mmap_mode="r")
+
+
+def load_value_table(path=None, build=True):
+    """
+    Returns the memory-mapped value table, building it first if it does not exist.
+    """
+    path = path or value_table_path()
+    if not os.path.exists(path):
+        if not build:
+            raise FileNotFoundError(f"Value table '{path}' not found. Run build_value_table() first.")
+        return build_value_table(path)
+    return np.load(path, mmap_mode="r")
+
+
+def board_hand_values(table, boards, hands):
+    """
+    Reads hand values on actual boards through the canonical map.
+
+    Arguments:
+        table: value table from load_value_table().
+        boards: colex board indices (array).
+        hands: hand indices, broadcastable against boards.
+
+    Returns:
+        int16 array of values with the broadcast shape of boards and hands.
+    """
+    rows, perms = get_canonical_map()
+    boards = np.asarray(boards)
+    return table[rows[boards], HAND_PERM[perms[boards], hands]]
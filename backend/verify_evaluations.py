@@ -0,0 +1,240 @@
+"""
+Verification of the stored evaluations table.
+
+Row counts are checked for every board (1,081 rows each) and every suit
+pattern with one streamed GROUP BY. A sample of boards (or every board) is then
+re-evaluated in parallel: each worker opens its own connection, streams the
+stored rows of a chunk of boards through a server-side cursor, recomputes hand
+values and percentiles with the batch evaluator and compares them. Results are
+written to a JSON discrepancy report.
+"""
+import argparse
+import json
+import time
+import numpy as np
+
+from board_index import BOARD_PATTERNS, PATTERN_SIZES
+from db import open_db
+from hand_index import NUM_HANDS, cards_from_str, hand_index
+from rank_table import LIVE_HANDS
+from shared_tables import SharedTables, get_shared
+from value_table import evaluate_boards_values, rank_percentiles
+
+COLUMNS = ("hand_value", "rank_min", "rank_max", "rank_avg", "rank_dense")
+MAX_REPORTED = 1000
+
+_worker_db = None
+
+
+def _init_worker():
+    global _worker_db
+    _worker_db = open_db()
+
+
+def count_rows(db):
+    """
+    Streams the number of stored rows of every board.
+
+    Returns:
+        dict mapping board_id to row count.
+    """
+    query = "SELECT board_id, COUNT(*) FROM evaluations GROUP BY board_id;"
+    return {board_id: count for board_id, count in db.stream_query(query, name="verify_counts")}
+
+
+def check_counts(row_counts, board_ids, board_patterns):
+    """
+    Compares stored row counts with the expected 1,081 per board and per pattern.
+
+    Arguments:
+        row_counts: dict from count_rows().
+        board_ids: array of all board ids in the boards table.
+        board_patterns: suit pattern of each board id.
+
+    Returns:
+        Dictionary with per-pattern totals and the boards whose counts are wrong.
+    """
+    counts = np.array([row_counts.get(int(b), 0) for b in board_ids], dtype=np.int64)
+    wrong = counts != LIVE_HANDS
+    unknown = sorted(set(row_counts) - set(board_ids.tolist()))
+
+    patterns = []
+    for p, pattern in enumerate(BOARD_PATTERNS):
+        selected = board_patterns == p
+        patterns.append({
+            "pattern": p,
+            "suit_counts": pattern,
+            "boards": int(selected.sum()),
+            "expected_boards": PATTERN_SIZES[p],
+            "rows": int(counts[selected].sum()),
+            "expected_rows": PATTERN_SIZES[p] * LIVE_HANDS,
+            "boards_with_wrong_count": int((wrong & selected).sum()),
+        })
+    return {
+        "patterns": patterns,
+        "boards_missing": int((counts == 0).sum()),
+        "boards_with_wrong_count": int(wrong.sum()),
+        "wrong_counts": [
+            {"board_id": int(b), "rows": int(c)} for b, c in zip(board_ids[wrong][:MAX_REPORTED], counts[wrong][:MAX_REPORTED])
+        ],
+        "unknown_board_ids": unknown[:MAX_REPORTED],
+    }
+
+
+def _verify_chunk(args):
+    board_ids, tolerance = args
+    board_cards = get_shared("board_cards")[board_ids]
+    hand_by_id = get_shared("hand_by_id")
+
+    values = evaluate_boards_values(board_cards)
+    expected = dict(zip(COLUMNS, (values,) + rank_percentiles(values)))
+
+    rows = list(_worker_db.stream_query(
+        "SELECT board_id, hand_id, hand_value, rank_min, rank_max, rank_avg, rank_dense "
+        "FROM evaluations WHERE board_id = ANY(%s);",
+        (board_ids.tolist(),), name="verify_rows",
+    ))
+    result = {"boards": len(board_ids), "rows": len(rows), "mismatches": 0, "discrepancies": []}
+    if not rows:
+        return result
+
+    stored = np.array(rows, dtype=np.float64)
+    position = {int(b): i for i, b in enumerate(board_ids)}
+    board_pos = np.array([position[int(b)] for b in stored[:, 0]])
+    hand_ids = stored[:, 1].astype(np.int64)
+    hands = hand_by_id[np.clip(hand_ids, 0, len(hand_by_id) - 1)]
+    unknown_hand = (hands < 0) | (hand_ids >= len(hand_by_id))
+    hands = np.where(unknown_hand, 0, hands)
+
+    bad = unknown_hand.copy()
+    reasons = np.where(unknown_hand, "unknown hand_id", "")
+    for j, column in enumerate(COLUMNS):
+        want = expected[column][board_pos, hands].astype(np.float64)
+        got = stored[:, 2 + j]
+        mismatch = ~unknown_hand & ~(np.abs(got - want) <= tolerance)
+        bad |= mismatch
+        reasons = np.where(mismatch & (reasons == ""), column, reasons)
+    result["mismatches"] = int(bad.sum())
+
+    for i in np.flatnonzero(bad)[:MAX_REPORTED]:
+        entry = {"board_id": int(stored[i, 0]), "hand_id": int(hand_ids[i]), "column": str(reasons[i])}
+        if not unknown_hand[i]:
+            entry["stored"] = {c: float(stored[i, 2 + j]) for j, c in enumerate(COLUMNS)}
+            entry["expected"] = {c: float(expected[c][board_pos[i], hands[i]]) for c in COLUMNS}
+        result["discrepancies"].append(entry)
+    return result
+
+
+def verify_evaluations(db, sample=1000, processes=None, chunk_size=64, tolerance=1e-9, seed=None,
+                       report_path="verification_report.json"):
+    """
+    Audits the evaluations table.
+
+    Arguments:
+        db: The evaluations database.
+        sample: number of boards to re-evaluate, stratified by suit pattern; None for all boards.
+        processes: worker processes (default: all cores), each with its own connection.
+        chunk_size: boards per worker task.
+        tolerance: allowed absolute difference of the stored percentiles.
+        seed: random seed for the board sample.
+        report_path: where to write the JSON report (None to skip).
+
+    Returns:
+        The report dictionary.
+    """
+    start_time = time.time()
+    hand_id_map = db.get_hand_ids()
+    board_id_map = db.get_board_ids()
+
+    hand_by_id = np.full(max(hand_id_map.values()) + 1, -1, dtype=np.int16)
+    for hand_str, hand_id in hand_id_map.items():
+        hand_by_id[hand_id] = hand_index(hand_str)
+    board_ids = np.array(sorted(board_id_map.values()), dtype=np.int64)
+    board_cards = np.zeros((board_ids[-1] + 1, 5), dtype=np.uint8)
+    for board_str, board_id in board_id_map.items():
+        board_cards[board_id] = cards_from_str(board_str)
+    board_patterns = np.full(board_ids[-1] + 1, -1, dtype=np.int16)
+    for p in range(len(BOARD_PATTERNS)):
+        board_patterns[list(db.get_board_ids(p).values())] = p
+
+    print("🔎 Counting stored rows per board")
+    counts_report = check_counts(count_rows(db), board_ids, board_patterns[board_ids])
+
+    # Sample proportionally to the pattern sizes so every pattern is represented.
+    if sample is None or sample >= len(board_ids):
+        selected = board_ids
+    else:
+        rng = np.random.default_rng(seed)
+        selected = []
+        for p in range(len(BOARD_PATTERNS)):
+            in_pattern = board_ids[board_patterns[board_ids] == p]
+            take = min(len(in_pattern), max(1, round(sample * len(in_pattern) / len(board_ids))))
+            selected.append(rng.choice(in_pattern, take, replace=False))
+        selected = np.sort(np.concatenate(selected))
+    tasks = [(selected[i:i + chunk_size], tolerance) for i in range(0, len(selected), chunk_size)]
+
+    print(f"🔬 Re-evaluating {len(selected):,} boards in {len(tasks):,} chunks")
+    totals = {"boards": 0, "rows": 0, "mismatches": 0}
+    discrepancies = []
+    with SharedTables({"board_cards": board_cards, "hand_by_id": hand_by_id}) as tables:
+        with tables.pool(processes, initializer=_init_worker) as pool:
+            for done, result in enumerate(pool.imap_unordered(_verify_chunk, tasks), 1):
+                for key in totals:
+                    totals[key] += result[key]
+                discrepancies.extend(result["discrepancies"][:MAX_REPORTED - len(discrepancies)])
+                if done % 20 == 0 or done == len(tasks):
+                    print(f"🔬 {done:,}/{len(tasks):,} chunks, {totals['mismatches']:,} mismatches "
+                          f"({time.time() - start_time:.1f}s)")
+
+    report = {
+        "ok": counts_report["boards_with_wrong_count"] == 0 and not counts_report["unknown_board_ids"]
+              and totals["mismatches"] == 0 and len(hand_id_map) == NUM_HANDS,
+        "hands": len(hand_id_map),
+        "counts": counts_report,
+        "recomputed": {**totals, "exhaustive": len(selected) == len(board_ids), "tolerance": tolerance},
+        "discrepancies": discrepancies,
+        "seconds": round(time.time() - start_time, 1),
+    }
+    if report_path is not None:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"📝 Saved verification report -> {report_path}")
+    print_report(report)
+    return report
+
+
+def print_report(report):
+    status = "✅ Evaluations verified" if report["ok"] else "❌ Evaluations have problems"
+    print(status)
+    for pattern in report["counts"]["patterns"]:
+        print(f"  pattern {pattern['pattern']} {pattern['suit_counts']}: {pattern['boards']:,}/"
+              f"{pattern['expected_boards']:,} boards, {pattern['rows']:,}/{pattern['expected_rows']:,} rows")
+    print(f"  boards with wrong row count: {report['counts']['boards_with_wrong_count']:,} "
+          f"({report['counts']['boards_missing']:,} missing)")
+    recomputed = report["recomputed"]
+    print(f"  re-evaluated {recomputed['boards']:,} boards / {recomputed['rows']:,} rows: "
+          f"{recomputed['mismatches']:,} mismatches")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Verify the stored evaluations against the evaluator.")
+    parser.add_argument("--sample", type=int, default=1000, help="Boards to re-evaluate (stratified by pattern).")
+    parser.add_argument("--all", action="store_true", help="Re-evaluate every board.")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Boards per worker task.")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="Allowed percentile difference.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the sample.")
+    parser.add_argument("--report", default="verification_report.json", help="Path of the JSON report.")
+    args = parser.parse_args()
+
+    db = open_db()
+    report = verify_evaluations(db, sample=None if args.all else args.sample, processes=args.processes,
+                                chunk_size=args.chunk_size, tolerance=args.tolerance, seed=args.seed,
+                                report_path=args.report)
+    db.close()
+    raise SystemExit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ const HAND_GRID = createHandGrid();
 
 const displayModes = ['Compare', 'Range'];
 const chartTypes = ['Rank Frequencies', 'Cumulative Rank Frequencies'];
+const SHARDS_PATH = '/charts/shards';
 const colors = ['#8884d8', '#82ca9d', '#ffc658', '#ff7c7c', '#8dd1e1', '#d084d0', '#ffb347', '#87ceeb'];
 
 const PokerHandAnalyzer = () => {
@@ -40,11 +41,22 @@ const PokerHandAnalyzer = () => {
   const [dataLoaded, setDataLoaded] = useState(false);
   const [dataError, setDataError] = useState(null);
 
-  // Load actual hand data from JSON file
+  const [manifest, setManifest] = useState(null);
+
+  // Load the shard manifest; hand data is fetched per hand when selected.
+  // Falls back to the single chart_data.json when no shards are published.
   useEffect(() => {
     const loadData = async () => {
       try {
         setDataError(null);
+        const manifestResponse = await fetch(`${SHARDS_PATH}/manifest.json`);
+        if (manifestResponse.ok) {
+          const data = await manifestResponse.json();
+          setManifest(data);
+          setDataLoaded(true);
+          console.log('Chart manifest loaded successfully', Object.keys(data.hands).length, 'hands');
+          return;
+        }
         const response = await fetch('/charts/chart_data.json');
         if (!response.ok) {
           throw new Error(`Failed to load chart data: ${response.status}`);
@@ -61,6 +73,36 @@ const PokerHandAnalyzer = () => {
     loadData();
   }, []);
 
+  // Fetch the shards of newly selected hands
+  useEffect(() => {
+    if (!manifest) return;
+    const missing = selectedHands.filter(hand => !handData[hand] && manifest.hands[hand]);
+    if (!missing.length) return;
+
+    let cancelled = false;
+    const loadShards = async () => {
+      try {
+        const shards = await Promise.all(missing.map(async hand => {
+          const entry = manifest.hands[hand];
+          const response = await fetch(`${SHARDS_PATH}/${entry.file}?v=${entry.hash}`);
+          if (!response.ok) {
+            throw new Error(`Failed to load chart data for ${hand}: ${response.status}`);
+          }
+          const shard = await response.json();
+          return [hand, shard.bins.map(count => count / shard.scale)];
+        }));
+        if (!cancelled) {
+          setHandData(prev => ({ ...prev, ...Object.fromEntries(shards) }));
+        }
+      } catch (error) {
+        console.error('Error loading hand data:', error);
+        if (!cancelled) setDataError(error.message);
+      }
+    };
+    loadShards();
+    return () => { cancelled = true; };
+  }, [selectedHands, manifest, handData]);
+
   const toggleHandSelection = (hand) => {
     setSelectedHands(prev => {
       if (prev.includes(hand)) {